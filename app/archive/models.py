@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+from ..persistence.models import TaskStatus, TaskType, WorkflowRunStatus, WorkflowStepType
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ----------------------------
+# Archive tier (cold history)
+# ----------------------------
+# Same columns as the live tables plus archived_at.
+# archive_id is a surrogate key and the original id a plain indexed column:
+# before migration 5 (AUTOINCREMENT) live ids could be reused, so older
+# archives may hold the same id more than once.
+class TaskArchive(SQLModel, table=True):
+    archive_id: Optional[int] = Field(default=None, primary_key=True)
+    archived_at: datetime = Field(default_factory=utc_now, index=True)
+
+    id: int = Field(index=True)
+    created_at: datetime = Field(index=True)
+    updated_at: datetime = Field(index=True)
+
+    status: TaskStatus = Field(index=True)
+    task_type: TaskType = Field(index=True)
+
+    title: str
+    notes: Optional[str] = None
+
+    target_kind: str = Field(default="POI")
+    target_ref: str = Field(default="")
+
+    release_at: Optional[datetime] = None
+    assigned_robot_id: Optional[str] = Field(default=None, index=True)
+    created_by: Optional[str] = None
+
+
+class WorkflowRunArchive(SQLModel, table=True):
+    archive_id: Optional[int] = Field(default=None, primary_key=True)
+    archived_at: datetime = Field(default_factory=utc_now, index=True)
+
+    id: int = Field(index=True)
+    created_at: datetime
+    updated_at: datetime
+
+    task_id: int = Field(index=True)
+    robot_id: str = Field(index=True)
+
+    status: WorkflowRunStatus = Field(index=True)
+
+    current_step_index: int = 0
+    total_steps: int = 0
+
+    current_vendor_task_id: Optional[str] = None
+    last_error: Optional[str] = None
+
+
+class WorkflowStepArchive(SQLModel, table=True):
+    archive_id: Optional[int] = Field(default=None, primary_key=True)
+    archived_at: datetime = Field(default_factory=utc_now, index=True)
+
+    id: int
+    run_id: int = Field(index=True)
+    step_index: int
+
+    step_type: WorkflowStepType
+    step_code: str = ""
+
+    area_id: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    yaw: Optional[float] = None
+    stop_radius: float = 1.0
+
+    wait_seconds: Optional[int] = None
+
+    completed_at: Optional[datetime] = None
+    decision: Optional[str] = None
+    decision_payload: Optional[str] = None
+
+    label: Optional[str] = None
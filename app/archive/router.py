@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from ..auth_roles.deps import require_role
+from ..persistence.db import get_session, run_in_db
+from ..persistence.models import TaskStatus
+from ..realtime_bus.bus import publish_event_nowait
+from .runner import archive_now
+from .service import ArchiveService
+
+
+router = APIRouter(prefix="/archive", tags=["archive"])
+
+
+@router.get("/tasks", dependencies=[Depends(require_role("monitor"))])
+def list_archived_tasks(
+    status: Optional[TaskStatus] = None,
+    task_type: Optional[str] = None,
+    robot_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 200,
+    offset: int = 0,
+    session: Session = Depends(get_session),
+):
+    svc = ArchiveService(session)
+    return svc.list_tasks(status=status, task_type=task_type, robot_id=robot_id, since=since, until=until, limit=limit, offset=offset)
+
+
+@router.get("/tasks/{task_id}", dependencies=[Depends(require_role("monitor"))])
+def archived_task_history(task_id: int, session: Session = Depends(get_session)):
+    svc = ArchiveService(session)
+    row = svc.get_task_history(task_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Task not found in archive")
+    return row
+
+
+@router.get("/stats", dependencies=[Depends(require_role("monitor"))])
+def archive_stats(session: Session = Depends(get_session)):
+    svc = ArchiveService(session)
+    return svc.stats()
+
+
+@router.post("/run", dependencies=[Depends(require_role("admin"))])
+async def run_archive_now():
+    res = await run_in_db(archive_now)
+    if res.get("tasks"):
+        publish_event_nowait("archive.completed", res, source="archive")
+    return {"ok": True, **res}
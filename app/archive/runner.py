@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, Optional
+
+from sqlmodel import Session
+
+from ..persistence.db import engine, run_in_db
+from ..realtime_bus.bus import publish_event
+from .service import ArchiveService
+
+
+log = logging.getLogger("archive")
+
+
+def archive_settings() -> Dict[str, float]:
+    return {
+        "after_hours": float(os.getenv("ARCHIVE_AFTER_HOURS", "168")),
+        "batch_size": int(os.getenv("ARCHIVE_BATCH_SIZE", "500")),
+        "max_batches": int(os.getenv("ARCHIVE_MAX_BATCHES", "100")),
+    }
+
+
+def archive_now() -> Dict[str, int]:
+    """
+    One archiving pass with its own session (blocking; call via run_in_db).
+    """
+    cfg = archive_settings()
+    with Session(engine) as session:
+        svc = ArchiveService(session)
+        return svc.archive_older_than(
+            timedelta(hours=cfg["after_hours"]),
+            batch_size=int(cfg["batch_size"]),
+            max_batches=int(cfg["max_batches"]),
+        )
+
+
+class ArchiveRunner:
+    """
+    Background loop that moves finished history into the archive tables.
+
+    Disabled by default. Enable with:
+      ARCHIVE_ENABLED=1
+
+    Tuning:
+      ARCHIVE_INTERVAL_S, ARCHIVE_AFTER_HOURS, ARCHIVE_BATCH_SIZE, ARCHIVE_MAX_BATCHES
+    """
+    def __init__(self) -> None:
+        self.enabled = os.getenv("ARCHIVE_ENABLED", "0") == "1"
+        self.interval_s = max(10.0, float(os.getenv("ARCHIVE_INTERVAL_S", "600")))
+
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("ARCHIVE disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._loop())
+        log.info("ARCHIVE enabled interval=%.0fs settings=%s", self.interval_s, archive_settings())
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    async def _loop(self) -> None:
+        await asyncio.sleep(5.0)  # let startup traffic settle
+        while not self._stop.is_set():
+            try:
+                res = await run_in_db(archive_now)
+                if res.get("tasks"):
+                    log.info("archived %s", res)
+                    await publish_event("archive.completed", res, source="archive")
+            except Exception as e:
+                log.warning("archive error: %s", e)
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, delete, exists, func, insert, literal
+from sqlmodel import Session, select
+
+from ..persistence.models import Task, TaskStatus, WorkflowRun, WorkflowRunStatus, WorkflowStep
+from ..priority_manager.models import TaskPriorityOverride
+from .models import TaskArchive, WorkflowRunArchive, WorkflowStepArchive
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+TERMINAL_TASK = (TaskStatus.DONE, TaskStatus.CANCELED)
+
+
+def _copy_rows(session: Session, live: Any, archive: Any, where: Any, now: datetime) -> int:
+    """
+    INSERT INTO <archive> (cols..., archived_at) SELECT cols..., :now FROM <live> WHERE ...
+    Only columns the archive table has are copied (derived live-only columns such as Task.rank_key are dropped).
+    """
+    cols = [c.name for c in live.__table__.columns if c.name in archive.__table__.c]
+    src = select(*[live.__table__.c[c] for c in cols], literal(now, type_=DateTime)).where(where)
+    res = session.exec(insert(archive.__table__).from_select(cols + ["archived_at"], src))
+    return int(getattr(res, "rowcount", 0) or 0)
+
+
+class ArchiveService:
+    """
+    Moves finished history (DONE/CANCELED tasks + their terminal runs/steps)
+    into the *archive tables, in batched transactions.
+    """
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def archive_batch(self, cutoff: datetime, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Archive up to batch_size tasks last updated before cutoff (one transaction).
+        Tasks that still have a RUNNING workflow stay live.
+        """
+        running = select(WorkflowRun.id).where(
+            WorkflowRun.task_id == Task.id,
+            WorkflowRun.status == WorkflowRunStatus.RUNNING,
+        )
+        stmt = (
+            select(Task.id)
+            .where(Task.status.in_(TERMINAL_TASK))
+            .where(Task.updated_at < cutoff)
+            .where(~exists(running))
+            .order_by(Task.id.asc())
+            .limit(max(1, int(batch_size)))
+        )
+        task_ids = list(self.session.exec(stmt).all())
+        if not task_ids:
+            return {"tasks": 0, "runs": 0, "steps": 0}
+
+        run_ids = list(self.session.exec(select(WorkflowRun.id).where(WorkflowRun.task_id.in_(task_ids))).all())
+        now = utc_now()
+
+        try:
+            steps = 0
+            if run_ids:
+                steps = _copy_rows(self.session, WorkflowStep, WorkflowStepArchive, WorkflowStep.run_id.in_(run_ids), now)
+                _copy_rows(self.session, WorkflowRun, WorkflowRunArchive, WorkflowRun.id.in_(run_ids), now)
+            tasks = _copy_rows(self.session, Task, TaskArchive, Task.id.in_(task_ids), now)
+
+            if run_ids:
+                self.session.exec(delete(WorkflowStep).where(WorkflowStep.run_id.in_(run_ids)))
+                self.session.exec(delete(WorkflowRun).where(WorkflowRun.id.in_(run_ids)))
+            self.session.exec(delete(TaskPriorityOverride).where(TaskPriorityOverride.task_id.in_(task_ids)))
+            self.session.exec(delete(Task).where(Task.id.in_(task_ids)))
+
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        return {"tasks": tasks, "runs": len(run_ids), "steps": steps}
+
+    def archive_older_than(self, horizon: timedelta, batch_size: int = 500, max_batches: int = 100) -> Dict[str, int]:
+        cutoff = utc_now() - horizon
+        total = {"tasks": 0, "runs": 0, "steps": 0, "batches": 0}
+        for _ in range(max(1, int(max_batches))):
+            res = self.archive_batch(cutoff, batch_size=batch_size)
+            if not res["tasks"]:
+                break
+            total["batches"] += 1
+            for k in ("tasks", "runs", "steps"):
+                total[k] += res[k]
+            if res["tasks"] < batch_size:
+                break
+        return total
+
+    # ----------------------------
+    # History queries
+    # ----------------------------
+    def list_tasks(
+        self,
+        status: Optional[TaskStatus] = None,
+        task_type: Optional[str] = None,
+        robot_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 200,
+        offset: int = 0,
+    ) -> List[TaskArchive]:
+        stmt = select(TaskArchive)
+        if status is not None:
+            stmt = stmt.where(TaskArchive.status == status)
+        if task_type:
+            stmt = stmt.where(TaskArchive.task_type == task_type.strip().upper())
+        if robot_id:
+            stmt = stmt.where(TaskArchive.assigned_robot_id == robot_id)
+        if since is not None:
+            stmt = stmt.where(TaskArchive.updated_at >= since)
+        if until is not None:
+            stmt = stmt.where(TaskArchive.updated_at < until)
+        stmt = stmt.order_by(TaskArchive.updated_at.desc()).offset(offset).limit(limit)
+        return list(self.session.exec(stmt).all())
+
+    def get_task_history(self, task_id: int) -> Optional[Dict[str, Any]]:
+        task = self.session.exec(
+            select(TaskArchive).where(TaskArchive.id == task_id).order_by(TaskArchive.archived_at.desc())
+        ).first()
+        if task is None:
+            return None
+
+        runs = list(
+            self.session.exec(
+                select(WorkflowRunArchive)
+                .where(WorkflowRunArchive.task_id == task_id)
+                .order_by(WorkflowRunArchive.created_at.asc())
+            ).all()
+        )
+        run_ids = [r.id for r in runs]
+        steps_by_run: Dict[int, List[WorkflowStepArchive]] = {}
+        if run_ids:
+            steps = self.session.exec(
+                select(WorkflowStepArchive)
+                .where(WorkflowStepArchive.run_id.in_(run_ids))
+                .order_by(WorkflowStepArchive.run_id.asc(), WorkflowStepArchive.step_index.asc())
+            ).all()
+            for s in steps:
+                steps_by_run.setdefault(s.run_id, []).append(s)
+
+        return {
+            "task": task,
+            "runs": [{"run": r, "steps": steps_by_run.get(r.id, [])} for r in runs],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        by_status = dict(
+            self.session.exec(select(TaskArchive.status, func.count()).group_by(TaskArchive.status)).all()
+        )
+        return {
+            "tasks": int(self.session.exec(select(func.count()).select_from(TaskArchive)).one()),
+            "runs": int(self.session.exec(select(func.count()).select_from(WorkflowRunArchive)).one()),
+            "steps": int(self.session.exec(select(func.count()).select_from(WorkflowStepArchive)).one()),
+            "tasks_by_status": {getattr(k, "value", str(k)): int(v) for k, v in by_status.items()},
+            "oldest_archived_at": self.session.exec(select(func.min(TaskArchive.archived_at))).one(),
+        }
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import event, exists, or_, update
+from sqlalchemy.orm import Session as SASession, aliased
+from sqlmodel import Session, select
+
+from ..persistence.db import engine, run_in_db
+from ..persistence.models import Task, TaskStatus, WorkflowRun, WorkflowRunStatus
+from ..queue_manager.service import QueueManagerService
+
+
+log = logging.getLogger("busy-index")
+
+# (robot_id, run_id) called after a robot's RUNNING run was committed as finished
+RunFinishedListener = Callable[[str, Optional[int]], None]
+
+_PENDING_KEY = "busy_index_pending"
+_REBUILD_KEY = "busy_index_rebuild"
+
+
+class BusyRobotIndex:
+    """
+    In-process map robot_id -> RUNNING run_id.
+
+    Built from the DB at startup, then kept current from WorkflowRun lifecycle
+    changes (start / finish / fail / cancel) seen by ORM session events and
+    applied only after the transaction commits. Set-based UPDATE/DELETE on
+    WorkflowRun (e.g. /controls/reset) trigger a rebuild instead.
+    A periodic reconciliation against the DB repairs any drift.
+
+    Until the first rebuild, `ready` is False and callers query the DB.
+
+    A robot inside `handoff()` (its run being replaced by another, e.g. a
+    pre-positioning move preempted by real work) finishes without notifying
+    listeners; they only hear about it if no new run started by the end.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self.ready = False
+        self.rebuilds = 0
+        self.drift_repairs = 0
+        self._listeners: List[RunFinishedListener] = []
+        # robot_id -> a finish was suppressed during the handoff
+        self._handoff: Dict[str, bool] = {}
+
+    def add_listener(self, fn: RunFinishedListener) -> None:
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: RunFinishedListener) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def _notify_finished(self, robot_id: str, run_id: Optional[int]) -> None:
+        for fn in list(self._listeners):
+            try:
+                fn(robot_id, run_id)
+            except Exception as e:
+                log.warning("busy index listener error: %s", e)
+
+    # ---- reads ----
+    def is_busy(self, robot_id: str) -> bool:
+        return robot_id in self._running
+
+    def run_for(self, robot_id: str) -> Optional[int]:
+        return self._running.get(robot_id)
+
+    def busy_robot_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._running)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            running = dict(self._running)
+        return {"ready": self.ready, "running": running, "rebuilds": self.rebuilds, "drift_repairs": self.drift_repairs}
+
+    # ---- writes ----
+    def mark_running(self, robot_id: str, run_id: int) -> None:
+        with self._lock:
+            self._running[robot_id] = int(run_id)
+
+    def mark_finished(self, robot_id: str, run_id: Optional[int] = None) -> bool:
+        with self._lock:
+            if robot_id not in self._running:
+                return False
+            if run_id is not None and self._running.get(robot_id) != int(run_id):
+                return False
+            self._running.pop(robot_id, None)
+            quiet = robot_id in self._handoff
+            if quiet:
+                self._handoff[robot_id] = True
+        if not quiet:
+            self._notify_finished(robot_id, run_id)
+        return True
+
+    @contextmanager
+    def handoff(self, robot_id: str) -> Iterator[None]:
+        with self._lock:
+            self._handoff[robot_id] = False
+        try:
+            yield
+        finally:
+            with self._lock:
+                suppressed = self._handoff.pop(robot_id, False)
+                free = robot_id not in self._running
+            if suppressed and free:
+                self._notify_finished(robot_id, None)
+
+    @staticmethod
+    def load_running(session: Session) -> Dict[str, int]:
+        stmt = (
+            select(WorkflowRun.robot_id, WorkflowRun.id)
+            .where(WorkflowRun.status == WorkflowRunStatus.RUNNING)
+            .order_by(WorkflowRun.id.asc())
+        )
+        # Latest RUNNING run wins if a robot somehow has several
+        return {str(rid): int(run_id) for rid, run_id in session.exec(stmt).all()}
+
+    def rebuild(self, eng: Any = None) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """
+        Replace the map with the DB truth. Returns drift {robot: (index, db)}.
+        """
+        with Session(eng or engine) as session:
+            fresh = self.load_running(session)
+        with self._lock:
+            drift = {
+                rid: (self._running.get(rid), fresh.get(rid))
+                for rid in set(self._running) | set(fresh)
+                if self._running.get(rid) != fresh.get(rid)
+            }
+            self._running = fresh
+            was_ready = self.ready
+            self.ready = True
+            self.rebuilds += 1
+            if drift and was_ready:
+                self.drift_repairs += 1
+        return drift if was_ready else {}
+
+
+busy_index = BusyRobotIndex()
+
+
+def robot_free_clause(robot_id: str, except_created_by: Optional[str] = None):
+    """
+    Claim guard for UPDATE ... Task: the robot has no RUNNING run and no ASSIGNED
+    task still waiting for its run (claimed, start_run not done yet). Checked in
+    the claim statement itself, so it holds even when the busy index lags.
+    Work created by `except_created_by` (pre-positioning moves) doesn't count.
+    """
+    other = aliased(Task)
+    run_task = aliased(Task)
+    running = (
+        exists()
+        .where(WorkflowRun.robot_id == robot_id)
+        .where(WorkflowRun.status == WorkflowRunStatus.RUNNING)
+    )
+    claimed = (
+        exists()
+        .where(other.assigned_robot_id == robot_id)
+        .where(other.status == TaskStatus.ASSIGNED)
+        .where(~exists().where(WorkflowRun.task_id == other.id))
+    )
+    if except_created_by is not None:
+        running = running.where(WorkflowRun.task_id == run_task.id).where(
+            or_(run_task.created_by.is_(None), run_task.created_by != except_created_by)
+        )
+        claimed = claimed.where(or_(other.created_by.is_(None), other.created_by != except_created_by))
+    return ~running & ~claimed
+
+
+def claim_task_stmt(task_id: int, robot_id: str, now: datetime, except_created_by: Optional[str] = None):
+    """
+    Guarded claim: READY + unassigned + claimable by the robot + robot free
+    (robot_free_clause). rowcount 1 means the robot got the task.
+    """
+    return (
+        update(Task)
+        .where(Task.id == task_id)
+        .where(Task.status == TaskStatus.READY)
+        .where(Task.assigned_robot_id.is_(None))
+        .where(QueueManagerService._claimable_by(robot_id))
+        .where(robot_free_clause(robot_id, except_created_by=except_created_by))
+        .values(status=TaskStatus.ASSIGNED, assigned_robot_id=robot_id, reserved_robot_id=None, updated_at=now)
+    )
+
+
+# ----------------------------
+# ORM lifecycle hooks (all sessions)
+# ----------------------------
+@event.listens_for(SASession, "after_flush")
+def _collect_run_changes(session: SASession, _ctx: Any) -> None:
+    pending: List[Tuple[str, str, Optional[int]]] = session.info.setdefault(_PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, WorkflowRun) and obj.robot_id:
+            op = "run" if obj.status == WorkflowRunStatus.RUNNING else "done"
+            pending.append((op, obj.robot_id, obj.id))
+    for obj in session.deleted:
+        if isinstance(obj, WorkflowRun) and obj.robot_id:
+            pending.append(("done", obj.robot_id, obj.id))
+
+
+@event.listens_for(SASession, "do_orm_execute")
+def _watch_bulk_run_writes(state: Any) -> None:
+    if not (state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is not None and mapper.class_ is WorkflowRun:
+        state.session.info[_REBUILD_KEY] = True
+
+
+@event.listens_for(SASession, "after_commit")
+def _apply_run_changes(session: SASession) -> None:
+    pending = session.info.pop(_PENDING_KEY, None) or []
+    rebuild = session.info.pop(_REBUILD_KEY, False)
+    if not busy_index.ready:
+        return
+    for op, robot_id, run_id in pending:
+        if op == "run" and run_id is not None:
+            busy_index.mark_running(robot_id, run_id)
+        else:
+            busy_index.mark_finished(robot_id, run_id)
+    if rebuild:
+        try:
+            busy_index.rebuild()
+        except Exception as e:
+            log.warning("busy index rebuild after bulk write failed: %s", e)
+
+
+@event.listens_for(SASession, "after_rollback")
+def _drop_run_changes(session: SASession) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_REBUILD_KEY, None)
+
+
+class BusyIndexReconciler:
+    """
+    Builds the busy index at startup and re-checks it against the DB
+    every BUSY_INDEX_RECONCILE_S seconds (default 60).
+    """
+    def __init__(self) -> None:
+        self.interval_s = max(5.0, float(os.getenv("BUSY_INDEX_RECONCILE_S", "60")))
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+    async def start(self) -> None:
+        await run_in_db(busy_index.rebuild)
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._loop())
+        log.info("BUSY_INDEX ready robots_running=%s reconcile=%.0fs", len(busy_index.busy_robot_ids()), self.interval_s)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop.is_set():
+                break
+            try:
+                drift = await run_in_db(busy_index.rebuild)
+                if drift:
+                    log.warning("busy index drift repaired: %s", drift)
+            except Exception as e:
+                log.warning("busy index reconcile error: %s", e)
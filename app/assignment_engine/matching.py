@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Optional: SciPy's C implementation of the same assignment problem
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_lsa  # type: ignore
+except Exception:
+    _scipy_lsa = None
+
+
+POLICY_PRIORITY = "priority"
+POLICY_MIN_COST = "min_cost"
+POLICIES = (POLICY_PRIORITY, POLICY_MIN_COST)
+
+# Cost of a robot/task pair the robot can't serve (capabilities); never matched
+INFEASIBLE_COST = 1e9
+
+# Largest matrix (rows * cols) the pure-Python Hungarian solves when SciPy is
+# missing; about 25 robots x 100 tasks stays in the tens of milliseconds.
+# Bigger matrices fall back to greedy cheapest-pair matching.
+DEFAULT_PYTHON_MAX_CELLS = 2500
+
+
+def python_max_cells() -> int:
+    return max(1, int(os.getenv("ASSIGN_MATCH_MAX_CELLS", str(DEFAULT_PYTHON_MAX_CELLS))))
+
+
+def default_policy() -> str:
+    p = os.getenv("ASSIGN_POLICY", POLICY_PRIORITY).strip().lower()
+    return p if p in POLICIES else POLICY_PRIORITY
+
+
+@dataclass
+class MatchingWeights:
+    """
+    cost(robot, task) = distance * w_distance * (1 + w_battery * (1 - battery))
+                        - w_priority * effective_priority
+
+    Low-battery robots pay more per meter (so they get the short trips);
+    the priority term decides which tasks win when tasks outnumber robots.
+    """
+    w_distance: float = 1.0
+    w_battery: float = 1.0
+    w_priority: float = 1.0
+    unknown_distance: float = 10.0
+    window: int = 4
+
+    @classmethod
+    def from_env(cls) -> "MatchingWeights":
+        return cls(
+            w_distance=float(os.getenv("ASSIGN_W_DISTANCE", "1.0")),
+            w_battery=float(os.getenv("ASSIGN_W_BATTERY", "1.0")),
+            w_priority=float(os.getenv("ASSIGN_W_PRIORITY", "1.0")),
+            unknown_distance=float(os.getenv("ASSIGN_UNKNOWN_DISTANCE_M", "10.0")),
+            window=max(1, int(os.getenv("ASSIGN_MATCH_WINDOW", "4"))),
+        )
+
+
+@dataclass
+class RobotSlot:
+    robot_id: str
+    x: Optional[float] = None
+    y: Optional[float] = None
+    battery: Optional[float] = None  # 0..1
+
+
+@dataclass
+class TaskSlot:
+    task_id: int
+    priority: float
+    x: Optional[float] = None
+    y: Optional[float] = None
+    task_type: Optional[str] = None
+
+
+# ----------------------------
+# State parsing (vendor payloads differ by firmware)
+# ----------------------------
+def _as_dict(state: Any) -> Dict[str, Any]:
+    if state is None:
+        return {}
+    if hasattr(state, "model_dump"):
+        state = state.model_dump()
+    elif hasattr(state, "dict"):
+        state = state.dict()
+    return state if isinstance(state, dict) else {}
+
+
+def _first_number(d: Dict[str, Any], *keys: str) -> Optional[float]:
+    for k in keys:
+        v = d.get(k)
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+    return None
+
+
+def robot_slot_from_state(robot_id: str, state: Any) -> RobotSlot:
+    d = _as_dict(state)
+    x = _first_number(d, "x")
+    y = _first_number(d, "y")
+    if x is None or y is None:
+        for key in ("coordinate", "position", "pose"):
+            v = d.get(key)
+            if isinstance(v, (list, tuple)) and len(v) >= 2:
+                x, y = float(v[0]), float(v[1])
+                break
+            if isinstance(v, dict):
+                x, y = _first_number(v, "x"), _first_number(v, "y")
+                if x is not None and y is not None:
+                    break
+
+    battery = _first_number(d, "battery", "batteryLevel", "battery_level", "power", "batteryPercent")
+    if battery is not None and battery > 1.0:
+        battery = battery / 100.0
+    if battery is not None:
+        battery = min(1.0, max(0.0, battery))
+    return RobotSlot(robot_id=robot_id, x=x, y=y, battery=battery)
+
+
+# ----------------------------
+# Cost matrix + solver
+# ----------------------------
+def build_cost_matrix(
+    robots: Sequence[RobotSlot],
+    tasks: Sequence[TaskSlot],
+    weights: MatchingWeights,
+    can_serve: Optional[Callable[[str, Optional[str]], bool]] = None,
+) -> List[List[float]]:
+    matrix: List[List[float]] = []
+    for r in robots:
+        battery = 1.0 if r.battery is None else r.battery
+        per_meter = weights.w_distance * (1.0 + weights.w_battery * (1.0 - battery))
+        row: List[float] = []
+        for t in tasks:
+            if can_serve is not None and not can_serve(r.robot_id, t.task_type):
+                row.append(INFEASIBLE_COST)
+                continue
+            if None in (r.x, r.y, t.x, t.y):
+                dist = weights.unknown_distance
+            else:
+                dist = math.hypot(r.x - t.x, r.y - t.y)
+            row.append(dist * per_meter - weights.w_priority * t.priority)
+        matrix.append(row)
+    return matrix
+
+
+def _hungarian(cost: List[List[float]]) -> List[Tuple[int, int]]:
+    """
+    Shortest-augmenting-path Hungarian with potentials, rows <= cols.
+    O(rows^2 * cols); every row gets exactly one distinct column.
+    """
+    n = len(cost)
+    m = len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                cur = row[j - 1] - ui0 - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                if minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    return sorted((p[j] - 1, j - 1) for j in range(1, m + 1) if p[j])
+
+
+def _greedy(cost: List[List[float]]) -> List[Tuple[int, int]]:
+    """
+    Cheapest remaining pair first. O(rows * cols * log); not optimal, but
+    bounded, for matrices too large for the pure-Python Hungarian.
+    """
+    cells = sorted((c, i, j) for i, row in enumerate(cost) for j, c in enumerate(row))
+    used_r: Set[int] = set()
+    used_c: Set[int] = set()
+    out: List[Tuple[int, int]] = []
+    want = min(len(cost), len(cost[0]))
+    for _, i, j in cells:
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        out.append((i, j))
+        if len(out) == want:
+            break
+    return sorted(out)
+
+
+def solve_assignment(cost: List[List[float]], backend: str = "auto") -> List[Tuple[int, int]]:
+    """
+    Min-cost assignment of rows (robots) to columns (tasks).
+    Returns (row, col) pairs; min(rows, cols) of them.
+    backend: "auto" (SciPy if installed; else the Python Hungarian up to
+    ASSIGN_MATCH_MAX_CELLS cells, greedy above), "scipy", "python" or "greedy".
+    """
+    if not cost or not cost[0]:
+        return []
+    if backend == "scipy" or (backend == "auto" and _scipy_lsa is not None):
+        if _scipy_lsa is None:
+            raise RuntimeError("scipy is not installed")
+        rows, cols = _scipy_lsa(cost)
+        return sorted(zip((int(r) for r in rows), (int(c) for c in cols)))
+    if backend == "greedy" or (backend == "auto" and len(cost) * len(cost[0]) > python_max_cells()):
+        return _greedy(cost)
+
+    if len(cost) <= len(cost[0]):
+        return _hungarian(cost)
+    transposed = [list(col) for col in zip(*cost)]
+    return sorted((r, c) for c, r in _hungarian(transposed))
+
+
+def preference_lists(
+    robots: Sequence[RobotSlot],
+    tasks: Sequence[TaskSlot],
+    cost: List[List[float]],
+    pairs: List[Tuple[int, int]],
+) -> List[Tuple[str, List[int]]]:
+    """
+    Per matched robot: its matched task first, then the remaining tasks by cost
+    (fallbacks if the claim on the matched task loses a race). Pairs the robot
+    can't serve (INFEASIBLE_COST) are left out.
+    """
+    out: List[Tuple[str, List[int]]] = []
+    for r, c in pairs:
+        if cost[r][c] >= INFEASIBLE_COST:
+            continue
+        order = sorted((j for j in range(len(tasks)) if cost[r][j] < INFEASIBLE_COST), key=lambda j: cost[r][j])
+        out.append((robots[r].robot_id, [tasks[c].task_id] + [tasks[j].task_id for j in order if j != c]))
+    return out
+
+
+def backend_name(cells: int = 0) -> str:
+    if _scipy_lsa is not None:
+        return "scipy"
+    return "greedy" if cells > python_max_cells() else "python"
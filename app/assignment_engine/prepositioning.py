@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import literal
+from sqlmodel import Session, select
+
+from ..common.single_flight import tick_flight
+from ..persistence.db import engine, run_in_db
+from ..persistence.models import Task, TaskStatus, TaskType, WorkflowRun, WorkflowRunStatus
+from ..poi_mapping.service import PoiMappingService
+from ..queue_manager.service import QueueManagerService
+from ..realtime_bus.bus import publish_event
+from ..robot_api.service import RobotAPIService
+from ..workflow_engine.service import WorkflowEngineService
+from ..workflow_engine.vendor_task_client import AutoXingTaskClient
+from .busy_index import busy_index, robot_free_clause
+from .matching import RobotSlot, robot_slot_from_state
+from .robots import get_robot_ids
+
+
+log = logging.getLogger("prepositioning")
+
+# Task.created_by of pre-positioning moves (NAVIGATE tasks, never queued)
+PREPOSITION_CREATOR = "prepositioner"
+
+# Where a robot should wait for an upcoming task of each type (None = the task's own target)
+STAGING_POINTS: Dict[str, Optional[Tuple[str, str]]] = {
+    TaskType.DELIVERY.value: ("KITCHEN", "main"),
+    TaskType.ORDERING.value: None,
+    TaskType.CLEANUP.value: None,
+    TaskType.BILLING.value: None,
+    TaskType.NAVIGATE.value: None,
+}
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def preposition_settings() -> Dict[str, Any]:
+    return {
+        "enabled": os.getenv("PREPOSITION_ENABLED", "0") == "1",
+        "interval_s": max(2.0, float(os.getenv("PREPOSITION_INTERVAL_S", "15"))),
+        "horizon_s": max(0.0, float(os.getenv("PREPOSITION_HORIZON_S", "300"))),
+        "cadence_s": max(0.0, float(os.getenv("PREPOSITION_CADENCE_S", "900"))),
+        "min_battery": min(1.0, max(0.0, float(os.getenv("PREPOSITION_MIN_BATTERY", "0.5")))),
+        "near_m": max(0.0, float(os.getenv("PREPOSITION_NEAR_M", "2.0"))),
+        "max_moves": max(0, int(os.getenv("PREPOSITION_MAX_MOVES", "2"))),
+    }
+
+
+@dataclass
+class DemandPoint:
+    kind: str
+    ref: str
+    count: int
+    due_in_s: float
+    x: Optional[float] = None
+    y: Optional[float] = None
+
+
+def _type_name(v: Any) -> str:
+    return str(getattr(v, "value", v) or "").upper()
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def plan_moves(
+    robots: Sequence[RobotSlot],
+    points: Sequence[DemandPoint],
+    near_m: float,
+    max_moves: int,
+    covered: Optional[Dict[Tuple[str, str], int]] = None,
+) -> List[Tuple[str, DemandPoint]]:
+    """
+    Soonest / busiest demand first: each point wants up to `count` robots nearby.
+    Robots already within near_m (or moves already heading there) count toward it;
+    the rest is filled with the nearest idle robot. Unknown positions go last.
+    """
+    covered = dict(covered or {})
+    free = list(robots)
+    for p in points:
+        if p.x is None or p.y is None:
+            continue
+        for r in list(free):
+            if r.x is not None and r.y is not None and math.hypot(r.x - p.x, r.y - p.y) <= near_m:
+                covered[(p.kind, p.ref)] = covered.get((p.kind, p.ref), 0) + 1
+                free.remove(r)
+
+    moves: List[Tuple[str, DemandPoint]] = []
+    for p in sorted(points, key=lambda d: (d.due_in_s, -d.count)):
+        if p.x is None or p.y is None:
+            continue
+        want = p.count - covered.get((p.kind, p.ref), 0)
+        while want > 0 and free and len(moves) < max_moves:
+            r = min(free, key=lambda s: math.inf if s.x is None or s.y is None else math.hypot(s.x - p.x, s.y - p.y))
+            free.remove(r)
+            moves.append((r.robot_id, p))
+            want -= 1
+    return moves
+
+
+class PrepositionService:
+    """
+    Pre-positioning moves: idle robots sent (plain NAVIGATE workflow) to where
+    upcoming work will start. Moves are ASSIGNED NAVIGATE tasks created by
+    PREPOSITION_CREATOR, so they never enter the READY queue, and are canceled
+    when the robot gets a real assignment (assign_many).
+    """
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def demand(self, horizon_s: float, cadence_s: float) -> List[DemandPoint]:
+        """
+        Upcoming demand per staging point:
+          - PENDING tasks released within horizon_s
+          - ORDERING done within cadence_s with no DELIVERY for that table since
+            (the restaurant cycle: ORDERING -> DELIVERY -> CLEANUP)
+        """
+        now = utc_now()
+        points: Dict[Tuple[str, str], DemandPoint] = {}
+
+        def add(kind: str, ref: str, due_in_s: float) -> None:
+            key = (PoiMappingService.norm_kind(kind), PoiMappingService.norm_ref(ref))
+            p = points.get(key)
+            if p is None:
+                points[key] = DemandPoint(kind=key[0], ref=key[1], count=1, due_in_s=due_in_s)
+            else:
+                p.count += 1
+                p.due_in_s = min(p.due_in_s, due_in_s)
+
+        def stage(task_type: Any, kind: str, ref: str, due_in_s: float) -> None:
+            t = _type_name(task_type)
+            if t not in STAGING_POINTS:
+                return
+            point = STAGING_POINTS[t] or (kind, ref)
+            add(point[0], point[1], due_in_s)
+
+        pending = self.session.exec(
+            select(Task.task_type, Task.target_kind, Task.target_ref, Task.release_at)
+            .where(Task.status == TaskStatus.PENDING)
+            .where(Task.release_at.is_not(None))
+            .where(Task.release_at <= now + timedelta(seconds=horizon_s))
+        ).all()
+        for task_type, kind, ref, release_at in pending:
+            stage(task_type, kind, ref, max(0.0, (_aware(release_at) - now).total_seconds()))
+
+        if cadence_s > 0:
+            since = now - timedelta(seconds=cadence_s)
+            ordered = self.session.exec(
+                select(Task.target_kind, Task.target_ref, Task.updated_at)
+                .where(Task.task_type == TaskType.ORDERING)
+                .where(Task.status == TaskStatus.DONE)
+                .where(Task.updated_at >= since)
+            ).all()
+            delivered = self.session.exec(
+                select(Task.target_kind, Task.target_ref, Task.created_at)
+                .where(Task.task_type == TaskType.DELIVERY)
+                .where(Task.created_at >= since)
+            ).all()
+            last_delivery: Dict[Tuple[str, str], datetime] = {}
+            for kind, ref, created_at in delivered:
+                key = (PoiMappingService.norm_kind(kind), PoiMappingService.norm_ref(ref))
+                last_delivery[key] = max(_aware(created_at), last_delivery.get(key, _aware(created_at)))
+            for kind, ref, done_at in ordered:
+                key = (PoiMappingService.norm_kind(kind), PoiMappingService.norm_ref(ref))
+                if key in last_delivery and last_delivery[key] >= _aware(done_at):
+                    continue
+                stage(TaskType.DELIVERY, kind, ref, 0.0)
+
+        out = list(points.values())
+        coords = PoiMappingService(self.session).target_coords({p.kind for p in out})
+        for p in out:
+            xy = coords.get((p.kind, p.ref))
+            if xy:
+                p.x, p.y = xy
+        return out
+
+    def active_moves(self) -> Dict[str, Dict[str, Any]]:
+        stmt = (
+            select(WorkflowRun.robot_id, WorkflowRun.id, Task.id, Task.target_kind, Task.target_ref, WorkflowRun.current_vendor_task_id)
+            .join(Task, Task.id == WorkflowRun.task_id)
+            .where(WorkflowRun.status == WorkflowRunStatus.RUNNING)
+            .where(Task.created_by == PREPOSITION_CREATOR)
+        )
+        return {
+            str(rid): {"run_id": run_id, "task_id": task_id, "target": (kind, ref), "vendor_task_id": vendor_id}
+            for rid, run_id, task_id, kind, ref, vendor_id in self.session.exec(stmt).all()
+        }
+
+    def create_move(self, robot_id: str, kind: str, ref: str) -> Optional[int]:
+        """
+        ASSIGNED NAVIGATE task for the robot, or None if it already has a run or
+        a claimed task (same guard as the assignment claims).
+        """
+        if self.session.exec(select(literal(1)).where(robot_free_clause(robot_id))).first() is None:
+            return None
+        task = Task(
+            title=f"Pre-position {kind} {ref}",
+            task_type=TaskType.NAVIGATE,
+            status=TaskStatus.ASSIGNED,
+            target_kind=kind,
+            target_ref=ref,
+            assigned_robot_id=robot_id,
+            created_by=PREPOSITION_CREATOR,
+        )
+        self.session.add(task)
+        self.session.commit()
+        self.session.refresh(task)
+        return int(task.id)
+
+    def cancel_move(self, robot_id: str, reason: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel the robot's running move (run + its NAVIGATE task). Returns the move or None.
+        """
+        move = self.active_moves().get(robot_id)
+        if move is None:
+            return None
+        now = utc_now()
+        run = self.session.get(WorkflowRun, move["run_id"])
+        task = self.session.get(Task, move["task_id"])
+        if run is not None:
+            run.status = WorkflowRunStatus.CANCELED
+            run.last_error = (run.last_error or "") + f"\n[CANCELED] {reason}"
+            run.updated_at = now
+            self.session.add(run)
+        if task is not None:
+            task.status = TaskStatus.CANCELED
+            task.notes = (task.notes or "") + f"\n[CANCELED] {reason}"
+            task.updated_at = now
+            self.session.add(task)
+        self.session.commit()
+        return move
+
+    def drop_move(self, task_id: int, reason: str) -> None:
+        # Move that never started: cancel it (unassign would put it in the READY queue)
+        task = self.session.get(Task, task_id)
+        if task is not None and task.status == TaskStatus.ASSIGNED:
+            task.status = TaskStatus.CANCELED
+            task.notes = (task.notes or "") + f"\n[CANCELED] {reason}"
+            task.updated_at = utc_now()
+            self.session.add(task)
+            self.session.commit()
+
+
+async def preempt_move(session: Session, task_client: Any, robot_id: str, reason: str) -> Optional[Dict[str, Any]]:
+    """
+    Cancel a robot's pre-positioning move so it can take real work: DB first,
+    then a best-effort vendor cancel of the in-flight navigation. Callers that
+    start the replacement run wrap both in `busy_index.handoff(robot_id)`.
+    """
+    move = await run_in_db(PrepositionService(session).cancel_move, robot_id, reason)
+    if move is None:
+        return None
+    vendor_id = move.get("vendor_task_id")
+    if vendor_id and hasattr(task_client, "task_cancel"):
+        try:
+            await task_client.task_cancel(vendor_id)
+        except Exception as e:
+            log.warning("vendor cancel failed robot=%s vendor_task=%s: %s", robot_id, vendor_id, e)
+    return move
+
+
+class PrepositionRunner:
+    """
+    Every PREPOSITION_INTERVAL_S (default 15) while the READY queue is empty:
+    sends idle, charged robots toward upcoming demand (see PrepositionService.demand).
+    Each cycle runs inside `tick_flight`, never alongside an orchestrator tick.
+
+    Enable with:
+      PREPOSITION_ENABLED=1
+      PREPOSITION_HORIZON_S=300     PREPOSITION_CADENCE_S=900
+      PREPOSITION_MIN_BATTERY=0.5   PREPOSITION_NEAR_M=2.0   PREPOSITION_MAX_MOVES=2
+    """
+    def __init__(self, robot_api: RobotAPIService, task_client: AutoXingTaskClient) -> None:
+        self.cfg = preposition_settings()
+        self.enabled = bool(self.cfg["enabled"])
+        self.robot_api = robot_api
+        self.task_client = task_client
+
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+        self.moves_started = 0
+        self.last_plan: List[Dict[str, Any]] = []
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("PREPOSITION disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._loop())
+        log.info("PREPOSITION enabled %s", self.cfg)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    async def _idle_robots(self, session: Session) -> List[RobotSlot]:
+        from .service import AssignmentEngineService  # local import: service.py imports this module
+
+        ae = AssignmentEngineService(session, self.robot_api, self.task_client)
+        busy: Set[str] = busy_index.busy_robot_ids() if busy_index.ready else await run_in_db(ae._busy_robot_ids)
+        out: List[RobotSlot] = []
+        for rid in get_robot_ids():
+            if rid in busy:
+                continue
+            try:
+                ok, _, state = await ae._is_robot_eligible(rid, include_state=True)
+            except Exception:
+                continue
+            if not ok:
+                continue
+            slot = robot_slot_from_state(rid, state)
+            if self.cfg["min_battery"] > 0 and (slot.battery is None or slot.battery < self.cfg["min_battery"]):
+                continue
+            out.append(slot)
+        return out
+
+    async def run_once(self) -> List[Dict[str, Any]]:
+        res = await tick_flight.run(("preposition",), self._run_locked)
+        if res.get("coalesced"):
+            return []
+        started: List[Dict[str, Any]] = res["started"]
+        self.moves_started += len(started)
+        self.last_plan = started
+        for m in started:
+            await publish_event("preposition.started", m, source="prepositioning")
+        return started
+
+    async def _run_locked(self) -> Dict[str, Any]:
+        started: List[Dict[str, Any]] = []
+        with Session(engine) as session:
+            if await run_in_db(QueueManagerService(session).count_ready):
+                return {"started": started}  # real work waiting; the tick will use the idle robots
+            svc = PrepositionService(session)
+            points = await run_in_db(svc.demand, self.cfg["horizon_s"], self.cfg["cadence_s"])
+            if not points:
+                return {"started": started}
+            covered: Dict[Tuple[str, str], int] = {}
+            for m in (await run_in_db(svc.active_moves)).values():
+                covered[m["target"]] = covered.get(m["target"], 0) + 1
+            robots = await self._idle_robots(session)
+            plan = plan_moves(robots, points, self.cfg["near_m"], int(self.cfg["max_moves"]), covered)
+
+            wf = WorkflowEngineService(session, self.robot_api, self.task_client)
+            for rid, p in plan:
+                task_id = await run_in_db(svc.create_move, rid, p.kind, p.ref)
+                if task_id is None:
+                    continue  # robot got work since the idle scan
+                try:
+                    run = await wf.start_run(task_id, rid)
+                except Exception as e:
+                    await run_in_db(svc.drop_move, task_id, f"start_run failed: {e}")
+                    log.warning("pre-position start failed robot=%s target=%s/%s: %s", rid, p.kind, p.ref, e)
+                    continue
+                started.append({"robot_id": rid, "task_id": task_id, "run_id": run.id, "target_kind": p.kind, "target_ref": p.ref, "demand": p.count, "due_in_s": round(p.due_in_s, 1)})
+        return {"started": started}
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                log.warning("pre-position cycle error: %s", e)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.cfg["interval_s"])
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import exists, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from ..common.single_flight import tick_flight
+from ..persistence.db import engine, run_in_db
+from ..persistence.models import Task, TaskStatus
+from ..queue_manager.service import QueueManagerService
+from ..realtime_bus.bus import bus, publish_event
+from ..realtime_bus.models import RealtimeEvent
+from ..robot_api.service import RobotAPIService
+from ..workflow_engine.service import WorkflowEngineService
+from ..workflow_engine.vendor_task_client import AutoXingTaskClient
+from ..robot_registry.service import robot_registry
+from .busy_index import busy_index, robot_free_clause
+
+
+log = logging.getLogger("reservations")
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def reservation_settings() -> Dict[str, Any]:
+    return {
+        "enabled": os.getenv("RESERVATION_ENABLED", "0") == "1",
+        "depth": min(2, max(1, int(os.getenv("RESERVATION_DEPTH", "1")))),
+    }
+
+
+# Queue-order changes that may put better work behind a reservation
+_RELEASE_EVENTS = {"priority.override_set", "priority.override_cleared", "task.created", "task.updated", "queue.updated"}
+
+
+class ReservationService:
+    """
+    Lookahead reservations: READY tasks held for busy robots (Task.reserved_robot_id).
+    Reserved tasks stay READY and visible in the queue, but other robots skip them.
+    """
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def release_outranked(self, task_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Release only reservations that better work now outranks: a reserved task
+        goes back to the pool when an unreserved READY task of the same type (so
+        the holder can serve it) has a higher rank. `task_ids` limits the
+        comparison to the tasks that changed; None compares against the whole queue.
+        Everything else keeps its reservation until the next tick's rebalance.
+        """
+        better = aliased(Task)
+        outranks = (
+            exists()
+            .where(better.status == TaskStatus.READY)
+            .where(better.assigned_robot_id.is_(None))
+            .where(better.reserved_robot_id.is_(None))
+            .where(better.task_type == Task.task_type)
+            .where(better.rank_key > Task.rank_key)
+        )
+        if task_ids is not None:
+            ids = [int(x) for x in task_ids]
+            if not ids:
+                return 0
+            outranks = outranks.where(better.id.in_(ids))
+        res = self.session.exec(
+            update(Task).where(Task.reserved_robot_id.is_not(None)).where(outranks).values(reserved_robot_id=None)
+        )
+        self.session.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    def release(self, robot_id: Optional[str] = None) -> int:
+        stmt = update(Task).where(Task.reserved_robot_id.is_not(None))
+        if robot_id is not None:
+            stmt = stmt.where(Task.reserved_robot_id == robot_id)
+        res = self.session.exec(stmt.values(reserved_robot_id=None))
+        self.session.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    def release_except(self, holders: Iterable[str]) -> int:
+        """
+        Release every reservation not held by one of `holders`.
+        """
+        stmt = update(Task).where(Task.reserved_robot_id.is_not(None))
+        keep = [str(rid) for rid in holders]
+        if keep:
+            stmt = stmt.where(Task.reserved_robot_id.not_in(keep))
+        res = self.session.exec(stmt.values(reserved_robot_id=None))
+        self.session.commit()
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    def rebalance(self, busy_robot_ids: List[str], depth: int) -> Dict[str, List[int]]:
+        """
+        Recompute all reservations from the current queue head (one transaction):
+        up to `depth` tasks per busy robot, handed out round-robin in priority order.
+        """
+        out: Dict[str, List[int]] = {rid: [] for rid in busy_robot_ids}
+        try:
+            self.session.exec(
+                update(Task).where(Task.reserved_robot_id.is_not(None)).values(reserved_robot_id=None)
+            )
+            want = len(busy_robot_ids) * max(0, int(depth))
+            if want:
+                page = QueueManagerService(self.session).get_ready_queue_page(
+                    limit=want, fields=["task_id", "task_type"], unreserved_only=True
+                )
+                turn = 0
+                for x in page["queue"]:
+                    task_id = int(x["task_id"])
+                    # Next robot in round-robin order that can serve this task type and has room
+                    rid = None
+                    for k in range(len(busy_robot_ids)):
+                        cand = busy_robot_ids[(turn + k) % len(busy_robot_ids)]
+                        if len(out[cand]) < depth and robot_registry.can_serve(cand, x["task_type"]):
+                            rid = cand
+                            turn = (turn + k + 1) % len(busy_robot_ids)
+                            break
+                    if rid is None:
+                        continue
+                    self.session.exec(
+                        update(Task)
+                        .where(Task.id == task_id)
+                        .where(Task.status == TaskStatus.READY)
+                        .where(Task.assigned_robot_id.is_(None))
+                        .values(reserved_robot_id=rid)
+                    )
+                    out[rid].append(task_id)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return {rid: ids for rid, ids in out.items() if ids}
+
+    def claim_next_for(self, robot_id: str) -> Optional[int]:
+        """
+        Claim the best task this robot may take: its own reservations compete with
+        unreserved work on priority, so a reservation never outranks better work.
+        """
+        page = QueueManagerService(self.session).get_ready_queue_page(
+            limit=16, fields=["task_id", "task_type"], for_robot=robot_id, unreserved_only=True
+        )
+        task_id = next((int(x["task_id"]) for x in page["queue"] if robot_registry.can_serve(robot_id, x["task_type"])), None)
+        if task_id is None:
+            return None
+        res = self.session.exec(
+            update(Task)
+            .where(Task.id == task_id)
+            .where(Task.status == TaskStatus.READY)
+            .where(Task.assigned_robot_id.is_(None))
+            .where(QueueManagerService._claimable_by(robot_id))
+            # Re-checked in the claim itself: a tick may have started this robot meanwhile
+            .where(robot_free_clause(robot_id))
+            .values(status=TaskStatus.ASSIGNED, assigned_robot_id=robot_id, reserved_robot_id=None, updated_at=utc_now())
+        )
+        self.session.commit()
+        return task_id if getattr(res, "rowcount", 0) == 1 else None
+
+    def snapshot(self) -> Dict[str, List[int]]:
+        stmt = (
+            select(Task.reserved_robot_id, Task.id)
+            .where(Task.reserved_robot_id.is_not(None))
+            .order_by(Task.rank_key.desc())
+        )
+        out: Dict[str, List[int]] = {}
+        for rid, task_id in self.session.exec(stmt).all():
+            out.setdefault(str(rid), []).append(int(task_id))
+        return out
+
+
+def _release_outranked(task_ids: Optional[List[int]]) -> int:
+    with Session(engine) as session:
+        return ReservationService(session).release_outranked(task_ids)
+
+
+def _claim_next(robot_id: str) -> Optional[int]:
+    with Session(engine) as session:
+        return ReservationService(session).claim_next_for(robot_id)
+
+
+def _unassign(task_id: int, reason: str) -> bool:
+    from .service import AssignmentEngineService  # local import: service.py imports this module
+
+    with Session(engine) as session:
+        return AssignmentEngineService(session, None, None).unassign(task_id, reason)
+
+
+def _event_task_ids(data: Any) -> Optional[List[int]]:
+    if not isinstance(data, dict):
+        return None
+    if data.get("task_id") is not None:
+        return [int(data["task_id"])]
+    if isinstance(data.get("task_ids"), list):
+        return [int(x) for x in data["task_ids"]]
+    return None
+
+
+class ReservationDispatcher:
+    """
+    Starts a robot's next task the moment its current run is committed as
+    finished (busy-index callback), instead of waiting for the next
+    /orchestrator/tick. The dispatch runs inside `tick_flight` (never alongside a
+    tick) and the claim re-checks in SQL that the robot has no run or claim.
+
+    On priority/queue changes only reservations outranked by better work of the
+    same type are released; the next tick (assign_many) recomputes the rest.
+
+    Enable with:
+      RESERVATION_ENABLED=1      (RESERVATION_DEPTH=1|2 tasks per busy robot)
+    """
+    def __init__(self, robot_api: RobotAPIService, task_client: AutoXingTaskClient) -> None:
+        cfg = reservation_settings()
+        self.enabled = bool(cfg["enabled"])
+        self.depth = int(cfg["depth"])
+        self.robot_api = robot_api
+        self.task_client = task_client
+
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.dispatched = 0
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("RESERVATION disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        busy_index.add_listener(self._on_run_finished)
+        bus.add_listener(self._on_event)
+        self._task = asyncio.create_task(self._run())
+        log.info("RESERVATION enabled depth=%s", self.depth)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        busy_index.remove_listener(self._on_run_finished)
+        bus.remove_listener(self._on_event)
+        if self._task:
+            self._task.cancel()
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except BaseException:
+                pass
+
+    def _on_run_finished(self, robot_id: str, _run_id: Optional[int]) -> None:
+        # Called from whichever thread committed the run (DB executor / loop)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._queue.put_nowait, robot_id)
+
+    def _on_event(self, event: RealtimeEvent) -> None:
+        if event.type not in _RELEASE_EVENTS or event.source == "reservations":
+            return
+        task_ids = _event_task_ids(event.data)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(lambda: loop.create_task(self._release(task_ids)))
+
+    async def _release(self, task_ids: Optional[List[int]]) -> None:
+        try:
+            released = await run_in_db(_release_outranked, task_ids)
+            if released:
+                log.info("released %s outranked reservation(s) after queue change", released)
+        except Exception as e:
+            log.warning("reservation release error: %s", e)
+
+    async def _dispatch(self, robot_id: str) -> None:
+        res = await tick_flight.run(("reservation", robot_id), lambda: self._dispatch_locked(robot_id))
+        if not res.get("task_id") or res.get("coalesced"):
+            return
+
+        self.dispatched += 1
+        task_id, run_id = res["task_id"], res["run_id"]
+        payload = {"assigned": True, "task_id": task_id, "robot_id": robot_id, "run_id": run_id, "reason": "reservation"}
+        await publish_event("assignment.made", payload, source="reservations")
+        await publish_event("queue.updated", {"reason": "reservation_dispatched"}, source="reservations")
+
+    async def _dispatch_locked(self, robot_id: str) -> Dict[str, Any]:
+        if busy_index.is_busy(robot_id):
+            return {}
+        from .service import AssignmentEngineService  # local import: service.py imports this module
+
+        ok, reason, _ = await AssignmentEngineService(None, self.robot_api, self.task_client)._is_robot_eligible(robot_id)
+        if not ok:
+            log.info("robot %s finished but not eligible (%s); leaving it to the tick", robot_id, reason)
+            return {}
+
+        task_id = await run_in_db(_claim_next, robot_id)
+        if task_id is None:
+            return {}
+        with Session(engine) as session:
+            try:
+                run = await WorkflowEngineService(session, self.robot_api, self.task_client).start_run(task_id, robot_id)
+            except Exception as e:
+                # Fresh session in the DB executor (never share `session` across threads)
+                await run_in_db(_unassign, task_id, f"start_run failed: {e}")
+                log.warning("reserved start failed robot=%s task=%s: %s", robot_id, task_id, e)
+                return {}
+            return {"task_id": task_id, "run_id": run.id}
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            robot_id = await self._queue.get()
+            try:
+                await self._dispatch(robot_id)
+            except Exception as e:
+                log.warning("reservation dispatch error robot=%s: %s", robot_id, e)
@@ -2,10 +2,10 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session
 
-from ..persistence.db import get_session
+from ..persistence.db import AsyncSession, get_async_session, get_session
 from ..robot_api.router import get_robot_api_service
 from ..robot_api.service import RobotAPIService
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
@@ -13,19 +13,25 @@ from ..workflow_engine.router import get_task_client
 from ..realtime_bus.bus import publish_event_nowait
 
 from .service import AssignmentEngineService
+from .prepositioning import PrepositionService, preposition_settings
+from .trip_batching import TripBatchService, batching_settings
 
 router = APIRouter(prefix="/assignment", tags=["assignment-engine"])
 
 
 @router.get("/robots")
-async def robots(include_state: bool = False, session: Session = Depends(get_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
-    svc = AssignmentEngineService(session, robot_api, task_client)
-    return await svc.list_robots(include_state=include_state)
+async def robots(include_state: bool = False, deadline_s: Optional[float] = None, debug: bool = False, session: AsyncSession = Depends(get_async_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
+    svc = AssignmentEngineService(session.sync_session, robot_api, task_client)
+    robots, dbg = await svc.list_robots_debug(include_state=include_state, deadline_s=deadline_s)
+    # Plain list by default (backwards compatible); debug=true wraps it with timings
+    if debug:
+        return {"robots": robots, "debug": dbg}
+    return robots
 
 
 @router.post("/assign-next")
-async def assign_next(preferred_robot_id: Optional[str] = None, include_robot_state: bool = False, session: Session = Depends(get_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
-    svc = AssignmentEngineService(session, robot_api, task_client)
+async def assign_next(preferred_robot_id: Optional[str] = None, include_robot_state: bool = False, session: AsyncSession = Depends(get_async_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
+    svc = AssignmentEngineService(session.sync_session, robot_api, task_client)
     res = await svc.assign_next(preferred_robot_id=preferred_robot_id, include_robot_state=include_robot_state)
 
     if res.get("assigned"):
@@ -36,12 +42,55 @@ async def assign_next(preferred_robot_id: Optional[str] = None, include_robot_st
     return res
 
 
+@router.post("/assign-many")
+async def assign_many(max_assignments: int = 5, preferred_robot_id: Optional[str] = None, include_robot_state: bool = False, policy: Optional[str] = None, dry_run: bool = False, session: AsyncSession = Depends(get_async_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
+    svc = AssignmentEngineService(session.sync_session, robot_api, task_client)
+    res = await svc.assign_many(max_assignments=max_assignments, preferred_robot_id=preferred_robot_id, include_robot_state=include_robot_state, policy=policy, dry_run=dry_run)
+    if dry_run:
+        return res
+
+    for a in res.get("assignments", []):
+        publish_event_nowait("assignment.made", {"assigned": True, **a}, source="assignment-engine")
+    if not res.get("assigned"):
+        publish_event_nowait("assignment.failed", res, source="assignment-engine")
+
+    return res
+
+
 @router.get("/assignments")
 def assignments(session: Session = Depends(get_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
     svc = AssignmentEngineService(session, robot_api, task_client)
     return svc.get_assignments()
 
 
+@router.get("/trips")
+def trips(window_s: float = 3600.0, session: Session = Depends(get_session)):
+    """
+    Multi-stop trip batching: kitchen round trips saved (window, per hour) + open trips.
+    """
+    cfg = batching_settings()
+    out = TripBatchService(session).stats(window_s=max(60.0, window_s))
+    return {"enabled": cfg["enabled"], "settings": {**cfg, "types": sorted(cfg["types"])}, **out}
+
+
+@router.get("/preposition")
+def preposition(request: Request, session: Session = Depends(get_session)):
+    """
+    Pre-positioning: forecast demand per staging point, moves in flight, last plan.
+    """
+    cfg = preposition_settings()
+    svc = PrepositionService(session)
+    runner = getattr(request.app.state, "preposition_runner", None)
+    return {
+        "enabled": cfg["enabled"],
+        "settings": cfg,
+        "demand": [vars(p) for p in svc.demand(cfg["horizon_s"], cfg["cadence_s"])],
+        "active_moves": svc.active_moves(),
+        "moves_started": getattr(runner, "moves_started", 0),
+        "last_plan": getattr(runner, "last_plan", []),
+    }
+
+
 @router.post("/unassign")
 def unassign(task_id: int, reason: Optional[str] = None, session: Session = Depends(get_session), robot_api: RobotAPIService = Depends(get_robot_api_service), task_client: AutoXingTaskClient = Depends(get_task_client)):
     svc = AssignmentEngineService(session, robot_api, task_client)
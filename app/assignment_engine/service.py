@@ -1,78 +1,181 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import os
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import update
+from sqlalchemy import literal
 from sqlmodel import Session, select
 
-from ..persistence.models import Task, TaskStatus, WorkflowRun, WorkflowRunStatus
+from ..common.fleet_state import availability, fleet_state, is_available
+from ..common.timing import PhaseTimer
+from ..persistence.db import run_in_db
+from ..persistence.models import Task, TaskStatus, TaskType, WorkflowRun, WorkflowRunStatus
+from ..poi_mapping.service import PoiMappingService
 from ..robot_api.service import RobotAPIService
+from ..robot_registry.service import robot_registry
 from ..workflow_engine.service import WorkflowEngineService
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
-from ..queue_manager.service import QueueManagerService
+from ..queue_manager.service import UNZONED, QueueManagerService
+from .busy_index import busy_index, claim_task_stmt, robot_free_clause
+from .matching import (
+    POLICIES,
+    POLICY_MIN_COST,
+    MatchingWeights,
+    TaskSlot,
+    build_cost_matrix,
+    default_policy,
+    preference_lists,
+    robot_slot_from_state,
+    solve_assignment,
+)
+from .prepositioning import PREPOSITION_CREATOR, PrepositionService, preempt_move, preposition_settings
+from .reservations import ReservationService, reservation_settings
 from .robots import get_robot_ids
+from .trip_batching import TripBatchService, batching_settings, pre_start_trip
 
 
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _safe_bool(d: Any, *keys: str) -> Optional[bool]:
-    if d is None:
-        return None
-    if hasattr(d, "model_dump"):
-        d = d.model_dump()
-    elif hasattr(d, "dict"):
-        d = d.dict()
-    if isinstance(d, dict):
-        for k in keys:
-            v = d.get(k)
-            if isinstance(v, bool):
-                return v
-    return None
-
-
 class AssignmentEngineService:
     """
     Assignment Engine v0 + Priority:
-      - Uses QueueManagerService.get_ready_queue() (sorted by effective priority)
+      - Uses the head of the READY queue (highest effective priority, index seek)
       - Picks an eligible robot (not busy, online, not charging, not estop)
       - Atomically claims the task
       - Starts workflow run
+
+    With `area_id` (area-sharded orchestrator), assign_many only sees robots whose
+    registry home area is `area_id` and READY tasks whose target maps to it
+    (UNZONED: robots without a home area / tasks without a mapped area).
     """
 
-    def __init__(self, session: Session, robot_api: RobotAPIService, task_client: AutoXingTaskClient):
+    def __init__(
+        self,
+        session: Session,
+        robot_api: RobotAPIService,
+        task_client: AutoXingTaskClient,
+        area_id: Optional[str] = None,
+    ):
         self.session = session
         self.robot_api = robot_api
         self.task_client = task_client
+        self.area_id = area_id
 
-    async def list_robots(self, include_state: bool = False) -> List[Dict[str, Any]]:
-        ids = get_robot_ids()
-        robots = []
-        for rid in ids:
-            busy = self._is_robot_busy(rid)
-            eligible, reason, state_obj = await self._is_robot_eligible(rid, include_state=include_state)
-            robots.append(
-                {
-                    "robot_id": rid,
-                    "busy": busy,
-                    "eligible": eligible and (not busy),
-                    "reason": reason if (not eligible or busy) else None,
-                    "state": state_obj if include_state else None,
-                }
-            )
+    async def list_robots(self, include_state: bool = False, deadline_s: Optional[float] = None) -> List[Dict[str, Any]]:
+        robots, _debug = await self.list_robots_debug(include_state=include_state, deadline_s=deadline_s)
         return robots
 
+    async def list_robots_debug(
+        self,
+        include_state: bool = False,
+        deadline_s: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Fleet status with bounded-concurrency fan-out (ROBOTS_FANOUT_CONCURRENCY)
+        and one deadline for the whole request (ROBOTS_DEADLINE_S). Robots that
+        miss it come back as status "unknown" instead of stalling the response.
+        Returns (robots, debug) where debug carries per-robot latencies
+        ("timeout" for robots the deadline dropped, finished or not started).
+        """
+        ids = get_robot_ids()
+        deadline = float(deadline_s if deadline_s is not None else os.getenv("ROBOTS_DEADLINE_S", "3.0"))
+        sem = asyncio.Semaphore(max(1, int(os.getenv("ROBOTS_FANOUT_CONCURRENCY", "8"))))
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        latency_ms: Dict[str, Any] = {}
+        # One busy snapshot up front: the fan-out below never touches the session
+        busy_ids = busy_index.busy_robot_ids() if busy_index.ready else await run_in_db(self._busy_robot_ids)
+
+        async def one(rid: str) -> Dict[str, Any]:
+            async with sem:
+                started = loop.time()
+                try:
+                    busy = rid in busy_ids
+                    eligible, reason, state_obj = await self._is_robot_eligible(rid, include_state=include_state)
+                finally:
+                    latency_ms[rid] = round((loop.time() - started) * 1000.0, 2)
+            return {
+                "robot_id": rid,
+                "status": "ok",
+                "busy": busy,
+                "eligible": eligible and (not busy),
+                "reason": reason if (not eligible or busy) else None,
+                "state": state_obj if include_state else None,
+                "state_age_s": fleet_state.age_s(rid),
+            }
+
+        tasks = {rid: asyncio.create_task(one(rid)) for rid in ids}
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=max(0.0, deadline))
+
+        robots: List[Dict[str, Any]] = []
+        timed_out: List[str] = []
+        # Snapshot: canceled fetches would otherwise write their latency in later
+        latency = dict(latency_ms)
+        for rid, task in tasks.items():
+            if not task.done():
+                task.cancel()
+                timed_out.append(rid)
+                latency[rid] = "timeout"
+                robots.append(self._unknown_robot(rid, "deadline exceeded", rid in busy_ids))
+            elif task.cancelled():
+                robots.append(self._unknown_robot(rid, "state fetch canceled", rid in busy_ids))
+            elif task.exception() is not None:
+                robots.append(self._unknown_robot(rid, f"state error: {task.exception()}", rid in busy_ids))
+            else:
+                robots.append(task.result())
+
+        debug = {
+            "deadline_s": deadline,
+            "elapsed_ms": round((loop.time() - t0) * 1000.0, 2),
+            "timed_out": timed_out,
+            "latency_ms": latency,
+        }
+        return robots, debug
+
+    @staticmethod
+    def _unknown_robot(robot_id: str, reason: str, busy: Optional[bool] = None) -> Dict[str, Any]:
+        return {
+            "robot_id": robot_id,
+            "status": "unknown",
+            "busy": busy,
+            "eligible": False,
+            "reason": reason,
+            "state": None,
+            "state_age_s": fleet_state.age_s(robot_id),
+        }
+
     def _is_robot_busy(self, robot_id: str) -> bool:
+        if busy_index.ready:
+            return busy_index.is_busy(robot_id)
         stmt = select(WorkflowRun).where(
             WorkflowRun.robot_id == robot_id,
             WorkflowRun.status == WorkflowRunStatus.RUNNING,
         )
         return self.session.exec(stmt).first() is not None
 
-    async def _is_robot_eligible(self, robot_id: str, include_state: bool = False) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
-        state = await self.robot_api.get_state(robot_id)
+    async def _is_robot_busy_async(self, robot_id: str) -> bool:
+        # Dictionary lookup once the index is built; DB query only before that
+        if busy_index.ready:
+            return busy_index.is_busy(robot_id)
+        return await run_in_db(self._is_robot_busy, robot_id)
+
+    async def _is_robot_eligible(
+        self, robot_id: str, include_state: bool = False, cached_only: bool = False
+    ) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+        # Poller-fed cache; live vendor call only when the entry is stale.
+        # cached_only (dry run): last known state whatever its age, never the vendor;
+        # no state at all means the plan can't vouch for the robot.
+        if cached_only:
+            state = fleet_state.peek(robot_id, max_age_s=float("inf"))
+            if state is None:
+                return False, "no cached state", None
+        else:
+            state = await fleet_state.get_state(robot_id, self.robot_api.get_state)
 
         state_dict: Optional[Dict[str, Any]] = None
         if include_state:
@@ -83,9 +186,7 @@ class AssignmentEngineService:
             elif isinstance(state, dict):
                 state_dict = state
 
-        online = _safe_bool(state, "online", "isOnline", "connected")
-        charging = _safe_bool(state, "charging", "isCharging", "onCharge", "onChargingPile")
-        estop = _safe_bool(state, "emergency_stop", "emergencyStop", "eStop")
+        online, charging, estop = availability(state)
 
         if online is False:
             return False, "robot offline", state_dict
@@ -97,31 +198,29 @@ class AssignmentEngineService:
         return True, None, state_dict
 
     def _pick_next_ready_task_id(self) -> Optional[int]:
-        qm = QueueManagerService(self.session)
-        q = qm.get_ready_queue()
-        if not q:
-            return None
-        return int(q[0]["task_id"])
+        return QueueManagerService(self.session).peek_next_ready_task_id()
+
+    def _task_type(self, task_id: int) -> Optional[TaskType]:
+        return self.session.exec(select(Task.task_type).where(Task.id == task_id)).first()
 
     def _try_claim_task(self, task_id: int, robot_id: str) -> bool:
-        now = utc_now()
-        stmt = (
-            update(Task)
-            .where(Task.id == task_id)
-            .where(Task.status == TaskStatus.READY)
-            .where(Task.assigned_robot_id.is_(None))
-            .values(status=TaskStatus.ASSIGNED, assigned_robot_id=robot_id, updated_at=now)
-        )
-        res = self.session.exec(stmt)
+        # A pre-positioning move doesn't make the robot busy: it is preempted before start_run
+        res = self.session.exec(claim_task_stmt(task_id, robot_id, utc_now(), except_created_by=PREPOSITION_CREATOR))
         self.session.commit()
         return getattr(res, "rowcount", 0) == 1
 
+    async def _pick_next_ready_task_id_async(self) -> Optional[int]:
+        return await run_in_db(self._pick_next_ready_task_id)
+
+    async def _try_claim_task_async(self, task_id: int, robot_id: str) -> bool:
+        return await run_in_db(self._try_claim_task, task_id, robot_id)
+
     async def assign_next(self, preferred_robot_id: Optional[str] = None, include_robot_state: bool = False) -> Dict[str, Any]:
         robot_ids = get_robot_ids()
         if not robot_ids:
-            return {"assigned": False, "message": "No robots configured. Set ROBOT_IDS env var or secrets.ROBOT_IDS."}
+            return {"assigned": False, "message": "No robots configured. Add them via /robot-registry/robots or set ROBOT_IDS."}
 
-        task_id = self._pick_next_ready_task_id()
+        task_id = await self._pick_next_ready_task_id_async()
         if task_id is None:
             return {"assigned": False, "message": "No READY tasks to assign."}
 
@@ -130,10 +229,15 @@ class AssignmentEngineService:
         chosen_reason = None
         chosen_state = None
 
+        # Capability filter first: no vendor call for robots that can't serve this task type
+        task_type = await run_in_db(self._task_type, task_id)
         for rid in candidates:
             if rid not in robot_ids:
                 continue
-            if self._is_robot_busy(rid):
+            if not robot_registry.can_serve(rid, task_type):
+                chosen_reason = f"no robot capable of {getattr(task_type, 'value', task_type)}"
+                continue
+            if await self._is_robot_busy_async(rid):
                 chosen_reason = "robot busy"
                 continue
             ok, reason, state_obj = await self._is_robot_eligible(rid, include_state=include_robot_state)
@@ -146,7 +250,7 @@ class AssignmentEngineService:
         if not chosen_robot:
             return {"assigned": False, "message": f"No eligible robot found ({chosen_reason or 'unknown'})."}
 
-        if not self._try_claim_task(task_id, chosen_robot):
+        if not await self._try_claim_task_async(task_id, chosen_robot):
             return {"assigned": False, "message": "Task was already claimed by another process/operator."}
 
         wf = WorkflowEngineService(self.session, self.robot_api, self.task_client)
@@ -161,6 +265,427 @@ class AssignmentEngineService:
             "robot_state": chosen_state if include_robot_state else None,
         }
 
+    # ----------------------------
+    # Batch assignment (one pass per tick)
+    # ----------------------------
+    def _busy_robot_ids(self) -> Set[str]:
+        if busy_index.ready:
+            return busy_index.busy_robot_ids()
+        stmt = select(WorkflowRun.robot_id).where(WorkflowRun.status == WorkflowRunStatus.RUNNING).distinct()
+        return {str(rid) for rid in self.session.exec(stmt).all()}
+
+    def _head_task_types(self, limit: int, include_due: bool = False, exclude: Optional[Set[int]] = None) -> Set[Any]:
+        page = QueueManagerService(self.session).get_ready_queue_page(
+            limit=limit + len(exclude or ()),
+            fields=["task_id", "task_type"],
+            unreserved_only=True,
+            area_id=self.area_id,
+            include_due=include_due,
+        )
+        return {x["task_type"] for x in page["queue"] if not exclude or int(x["task_id"]) not in exclude}
+
+    def _claim_in_txn(self, task_id: int, robot_id: str, now: datetime) -> bool:
+        # Same guarded UPDATE as _try_claim_task, left to the caller's transaction
+        res = self.session.exec(claim_task_stmt(task_id, robot_id, now, except_created_by=PREPOSITION_CREATOR))
+        return getattr(res, "rowcount", 0) == 1
+
+    def _robot_free_in_txn(self, robot_id: str) -> bool:
+        stmt = select(literal(1)).where(robot_free_clause(robot_id, except_created_by=PREPOSITION_CREATOR))
+        return self.session.exec(stmt).first() is not None
+
+    def _claim_preferred(self, prefs: List[Tuple[str, List[int]]], dry_run: bool = False) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Claim one task per robot from its preference list (one transaction).
+        Tasks taken earlier in the batch are skipped; lost races fall through.
+        dry_run: plan only (every claim "wins", nothing is written).
+        """
+        now = utc_now()
+        taken: Set[int] = set()
+        pairs: List[Tuple[int, str]] = []
+        lost = 0
+        try:
+            for rid, task_ids in prefs:
+                for task_id in task_ids:
+                    if task_id in taken:
+                        continue
+                    if dry_run or self._claim_in_txn(task_id, rid, now):
+                        taken.add(task_id)
+                        pairs.append((task_id, rid))
+                        break
+                    if not self._robot_free_in_txn(rid):
+                        break  # robot got work meanwhile; the task stays for others
+                    taken.add(task_id)
+                    lost += 1
+            if not dry_run:
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return pairs, lost
+
+    def _task_slots(self, limit: int, exclude: Optional[Set[int]] = None, include_due: bool = False) -> List[TaskSlot]:
+        """
+        Queue head with target coordinates: PoiMapping (kind, ref) -> poi_id -> RobotPOICache x/y.
+        """
+        page = QueueManagerService(self.session).get_ready_queue_page(
+            limit=limit,
+            fields=["task_id", "task_type", "target_kind", "target_ref", "effective_priority"],
+            unreserved_only=True,
+            area_id=self.area_id,
+            include_due=include_due,
+        )
+        items = [x for x in page["queue"] if not exclude or int(x["task_id"]) not in exclude]
+        if not items:
+            return []
+
+        coords = PoiMappingService(self.session).target_coords({x["target_kind"] for x in items})
+
+        slots: List[TaskSlot] = []
+        for x in items:
+            key = (PoiMappingService.norm_kind(x["target_kind"]), PoiMappingService.norm_ref(x["target_ref"]))
+            xy = coords.get(key)
+            slots.append(
+                TaskSlot(
+                    task_id=int(x["task_id"]),
+                    priority=float(x["effective_priority"]),
+                    x=xy[0] if xy else None,
+                    y=xy[1] if xy else None,
+                    task_type=getattr(x["task_type"], "value", x["task_type"]),
+                )
+            )
+        return slots
+
+    def _claim_for_robots(
+        self,
+        robot_ids: List[str],
+        exclude: Optional[Set[int]] = None,
+        dry_run: bool = False,
+        max_pairs: Optional[int] = None,
+    ) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Match free robots to the head of the READY queue in priority order and
+        claim all pairs in one transaction. A lost claim (someone else took the
+        task) falls through to the next candidate instead of giving up.
+        Tasks in `exclude` (held for trip batching) are passed over, and a robot
+        skips tasks it has no capability for (they stay for the next robot).
+        Stops after `max_pairs` claims: robots that found nothing don't count.
+        dry_run: plan only over READY + due PENDING tasks, nothing is written.
+        Returns ([(task_id, robot_id)], lost_claims).
+        """
+        qm = QueueManagerService(self.session)
+        page_size = max(16, 2 * len(robot_ids))
+        now = utc_now()
+
+        pairs: List[Tuple[int, str]] = []
+        lost = 0
+        candidates: List[Tuple[int, Any]] = []
+        cursor: Optional[str] = None
+        exhausted = False
+        try:
+            for rid in robot_ids:
+                if max_pairs is not None and len(pairs) >= max_pairs:
+                    break
+                i = 0
+                while True:
+                    if i >= len(candidates):
+                        if exhausted:
+                            break
+                        page = qm.get_ready_queue_page(
+                            limit=page_size,
+                            cursor=cursor,
+                            fields=["task_id", "task_type"],
+                            unreserved_only=True,
+                            area_id=self.area_id,
+                            include_due=dry_run,
+                        )
+                        candidates += [
+                            (int(x["task_id"]), x["task_type"])
+                            for x in page["queue"]
+                            if not exclude or int(x["task_id"]) not in exclude
+                        ]
+                        cursor = page["next_cursor"]
+                        exhausted = cursor is None
+                        continue
+                    task_id, task_type = candidates[i]
+                    if not robot_registry.can_serve(rid, task_type):
+                        i += 1
+                        continue
+                    candidates.pop(i)
+                    if dry_run or self._claim_in_txn(task_id, rid, now):
+                        pairs.append((task_id, rid))
+                        break
+                    if not self._robot_free_in_txn(rid):
+                        # Robot got work meanwhile (reservation dispatch); the task stays for the next robot
+                        candidates.insert(i, (task_id, task_type))
+                        break
+                    lost += 1
+                if not candidates and exhausted:
+                    break
+            if not dry_run:
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return pairs, lost
+
+    async def assign_many(
+        self,
+        max_assignments: int = 5,
+        preferred_robot_id: Optional[str] = None,
+        include_robot_state: bool = False,
+        policy: Optional[str] = None,
+        timer: Optional[PhaseTimer] = None,
+        dry_run: bool = False,
+        already_planned: Iterable[Tuple[int, str]] = (),
+    ) -> Dict[str, Any]:
+        """
+        Batch variant of assign_next for orchestrator ticks:
+          - one busy-robot query for the whole fleet
+          - robot eligibility (vendor state) fetched concurrently
+          - free robots matched to the queue head in priority order, claimed in one
+            transaction with fallback to the next task on a lost race
+          - workflow runs started for every claimed pair
+          - with PREPOSITION_ENABLED=1, robots on a pre-positioning move count as
+            free; their move is canceled when they get a task
+          - with TRIP_BATCH_ENABLED=1, nearby same-type tasks merged into the
+            started runs as extra stops (see trip_batching.py)
+          - with RESERVATION_ENABLED=1, reservations of robots that are no longer busy
+            (or are unavailable) released first, and lookahead tasks re-reserved for
+            busy robots on every exit path (not per shard: only the unfiltered pass)
+        Cost is O(N + R) per tick instead of O(k * (N + R)).
+
+        policy:
+          "priority"  free robots (registry order) take the queue head in order
+          "min_cost"  robot x task cost matrix (distance, battery, priority) over the
+                      queue head, solved as a min-cost assignment (see matching.py)
+        Default: ASSIGN_POLICY env ("priority").
+
+        timer: optional PhaseTimer; filled with "queue_build" (queue head, busy set,
+        claims), "vendor_state", "workflow_start" and "reservations" (orchestrator metrics).
+
+        dry_run: the same plan from a read-only snapshot (READY + due PENDING tasks,
+        cached robot state of any age) with no claims, no start_run, no vendor calls
+        and no reservation changes; returns "plan" (predicted workflow starts).
+        Robots with no cached state at all are not planned ("no cached state").
+        `already_planned` (dry run): (task_id, robot_id) pairs an earlier pass of
+        the same plan took; their robots count as busy and their tasks as claimed,
+        as they would be after a real pass.
+        """
+        timer = timer if timer is not None else PhaseTimer()
+        # Reservations are global: only unfiltered live passes touch them, on every exit path
+        manage_reservations = not dry_run and self.area_id is None and reservation_settings()["enabled"]
+        if manage_reservations:
+            with timer.phase("reservations"):
+                await self.release_stale_reservations()
+        res: Dict[str, Any] = {}
+        try:
+            res = await self._assign_many(
+                max_assignments, preferred_robot_id, include_robot_state, policy, timer, dry_run, list(already_planned)
+            )
+        finally:
+            if manage_reservations:
+                with timer.phase("reservations"):
+                    res["reservations"] = await self.rebalance_reservations(a["robot_id"] for a in res.get("assignments", []))
+        return res
+
+    async def _assign_many(
+        self,
+        max_assignments: int,
+        preferred_robot_id: Optional[str],
+        include_robot_state: bool,
+        policy: Optional[str],
+        timer: PhaseTimer,
+        dry_run: bool,
+        already_planned: List[Tuple[int, str]],
+    ) -> Dict[str, Any]:
+        policy = (policy or default_policy()).strip().lower()
+        if policy not in POLICIES:
+            return {"assigned": 0, "assignments": [], "message": f"Unknown policy '{policy}' (use {', '.join(POLICIES)})."}
+        robot_ids = get_robot_ids()
+        if not robot_ids:
+            return {"assigned": 0, "assignments": [], "message": "No robots configured. Add them via /robot-registry/robots or set ROBOT_IDS."}
+        if self.area_id is not None:
+            robot_ids = [rid for rid in robot_ids if (robot_registry.area_of(rid) or UNZONED) == self.area_id]
+            if not robot_ids:
+                return {"assigned": 0, "assignments": [], "message": f"No robots in area '{self.area_id}'."}
+        limit = max(0, int(max_assignments))
+        if limit == 0:
+            return {"assigned": 0, "assignments": [], "message": "max_assignments=0"}
+
+        candidates = [preferred_robot_id] if preferred_robot_id else list(robot_ids)
+        candidates = [rid for rid in candidates if rid in robot_ids]
+        taken: Set[int] = {int(task_id) for task_id, _ in already_planned}
+        with timer.phase("queue_build"):
+            # Capability pre-filter on the queue head: no vendor call for robots with nothing to do
+            head_types = await run_in_db(self._head_task_types, max(16, 2 * len(candidates)), dry_run, taken)
+            if not head_types:
+                return {"assigned": 0, "policy": policy, "assignments": [], "message": "No READY tasks to assign."}
+
+            busy = busy_index.busy_robot_ids() if busy_index.ready else await run_in_db(self._busy_robot_ids)
+            movable: Dict[str, Dict[str, Any]] = {}
+            if preposition_settings()["enabled"]:
+                # Robots on a pre-positioning move can take real work (the move is canceled)
+                movable = await run_in_db(PrepositionService(self.session).active_moves)
+                busy = set(busy) - set(movable)
+            busy = set(busy) | {rid for _, rid in already_planned}
+        skipped: Dict[str, str] = {rid: "robot busy" for rid in candidates if rid in busy}
+        for rid in candidates:
+            if rid not in busy and not robot_registry.can_serve_any(rid, head_types):
+                skipped[rid] = "no capability for queued task types"
+        free = [rid for rid in candidates if rid not in skipped]
+        free.sort(key=lambda rid: rid in movable)  # idle robots first
+
+        need_state = include_robot_state or policy == POLICY_MIN_COST
+        with timer.phase("vendor_state"):
+            checks = await asyncio.gather(
+                *[self._is_robot_eligible(rid, include_state=need_state, cached_only=dry_run) for rid in free],
+                return_exceptions=True,
+            )
+        eligible: List[str] = []
+        states: Dict[str, Optional[Dict[str, Any]]] = {}
+        for rid, res in zip(free, checks):
+            if isinstance(res, BaseException):
+                skipped[rid] = f"state error: {res}"
+                continue
+            ok, reason, state_obj = res
+            if ok:
+                eligible.append(rid)
+                states[rid] = state_obj
+            else:
+                skipped[rid] = reason or "not eligible"
+
+        if not eligible:
+            return {"assigned": 0, "assignments": [], "skipped_robots": skipped, "message": "No eligible robot found."}
+
+        with timer.phase("queue_build"):
+            trip_cfg = batching_settings()
+            held: Set[int] = set()
+            if trip_cfg["enabled"]:
+                held = await run_in_db(TripBatchService(self.session).held_task_ids, trip_cfg)
+            if held:
+                # Held tasks aren't claimable this tick: re-check capabilities against the rest
+                head_types = await run_in_db(self._head_task_types, max(16, 2 * len(candidates)), dry_run, held | taken)
+            servable = [rid for rid in eligible if robot_registry.can_serve_any(rid, head_types)]
+            for rid in eligible:
+                if rid not in servable:
+                    skipped[rid] = "no capability for queued task types"
+
+            if policy == POLICY_MIN_COST:
+                weights = MatchingWeights.from_env()
+                robots = [robot_slot_from_state(rid, states.get(rid)) for rid in servable]
+                tasks = await run_in_db(self._task_slots, max(limit, weights.window * len(robots)), held | taken, dry_run)
+                cost = build_cost_matrix(robots, tasks, weights, can_serve=robot_registry.can_serve)
+                matched = solve_assignment(cost) if tasks else []
+                # Highest-priority matches first, capped at max_assignments
+                matched.sort(key=lambda rc: -tasks[rc[1]].priority)
+                prefs = preference_lists(robots, tasks, cost, matched[:limit])
+                pairs, lost = await run_in_db(self._claim_preferred, prefs, dry_run)
+            else:
+                # Every servable robot may try; only successful claims count toward the limit
+                pairs, lost = await run_in_db(self._claim_for_robots, servable, held | taken, dry_run, limit)
+
+        if dry_run:
+            return {
+                "dry_run": True,
+                "assigned": 0,
+                "planned": len(pairs),
+                "policy": policy,
+                "plan": [
+                    {
+                        "task_id": task_id,
+                        "robot_id": rid,
+                        "preempts_move_run_id": movable[rid]["run_id"] if rid in movable else None,
+                        "robot_state": states.get(rid) if include_robot_state else None,
+                    }
+                    for task_id, rid in pairs
+                ],
+                "held_for_batching": sorted(held),
+                "skipped_robots": skipped,
+                # Planned from a cached state older than FLEET_STATE_MAX_AGE_S (or none at all)
+                "stale_state_robots": [rid for rid in eligible if fleet_state.peek(rid) is None],
+                "message": "No READY tasks to assign." if not pairs else "Dry run: nothing claimed or started.",
+            }
+
+        wf = WorkflowEngineService(self.session, self.robot_api, self.task_client)
+        assignments: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        with timer.phase("workflow_start"):
+            for task_id, rid in pairs:
+                planned = None
+                if trip_cfg["enabled"]:
+                    try:
+                        planned = await run_in_db(TripBatchService(self.session).claim_companions, task_id, rid, trip_cfg)
+                    except Exception as e:
+                        errors.append({"task_id": task_id, "robot_id": rid, "error": f"trip batching: {e}"})
+                try:
+                    # Companion stops go into the run as start_run writes it (released if they don't)
+                    async with pre_start_trip(planned):
+                        if rid in movable:
+                            # Move canceled and real run started as one handoff: no "robot free" in between
+                            with busy_index.handoff(rid):
+                                await preempt_move(self.session, self.task_client, rid, f"real assignment: task {task_id}")
+                                run = await wf.start_run(task_id, rid)
+                        else:
+                            run = await wf.start_run(task_id, rid)
+                except Exception as e:
+                    # Hand the task back to the queue; the robot is retried next tick
+                    await run_in_db(self.unassign, task_id, f"start_run failed: {e}")
+                    errors.append({"task_id": task_id, "robot_id": rid, "error": str(e)})
+                    continue
+                trip = planned.result if planned else None
+                assignments.append(
+                    {
+                        "task_id": task_id,
+                        "robot_id": rid,
+                        "run_id": run.id,
+                        "trip_task_ids": trip["task_ids"] if trip else None,
+                        "robot_state": states.get(rid) if include_robot_state else None,
+                    }
+                )
+
+        return {
+            "assigned": len(assignments),
+            "policy": policy,
+            "reservations": None,
+            "assignments": assignments,
+            "lost_claims": lost,
+            "held_for_batching": sorted(held),
+            "skipped_robots": skipped,
+            "errors": errors,
+            "message": "No READY tasks to assign." if not pairs else "Assigned tasks (batch) and started workflow runs.",
+        }
+
+    async def rebalance_reservations(self, just_assigned: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        With RESERVATION_ENABLED=1: lookahead for every busy robot, recomputed each
+        tick so priority changes apply. `just_assigned` robots count as busy.
+        """
+        res_cfg = reservation_settings()
+        if not res_cfg["enabled"]:
+            return None
+        holders = await self._reservation_holders(just_assigned)
+        return await run_in_db(ReservationService(self.session).rebalance, holders, int(res_cfg["depth"]))
+
+    async def release_stale_reservations(self) -> int:
+        """
+        Release reservations whose holder can't use them any more: its run finished
+        (it competes for work like any free robot) or it is disabled / unavailable.
+        Run before planning so the same tick can hand those tasks to other robots.
+        """
+        if not reservation_settings()["enabled"]:
+            return 0
+        holders = await self._reservation_holders()
+        return await run_in_db(ReservationService(self.session).release_except, holders)
+
+    async def _reservation_holders(self, just_assigned: Iterable[str] = ()) -> List[str]:
+        # Busy (or just assigned), enabled, and not offline / charging / e-stopped in the cached state
+        busy_now = set(busy_index.busy_robot_ids() if busy_index.ready else await run_in_db(self._busy_robot_ids))
+        busy_now |= set(just_assigned)
+        return [rid for rid in get_robot_ids() if rid in busy_now and is_available(fleet_state.peek(rid))]
+
+    async def get_assignments_async(self) -> Dict[str, Any]:
+        return await run_in_db(self.get_assignments)
+
     def get_assignments(self) -> Dict[str, Any]:
         t_stmt = select(Task).where(Task.status == TaskStatus.ASSIGNED).order_by(Task.updated_at.desc())
         tasks = list(self.session.exec(t_stmt).all())
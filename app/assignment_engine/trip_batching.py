@@ -0,0 +1,522 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, func, select
+
+from ..persistence.db import engine, run_in_db
+from ..persistence.models import (
+    Task,
+    TaskStatus,
+    TripBatch,
+    TripBatchStatus,
+    WorkflowRun,
+    WorkflowRunStatus,
+    WorkflowStep,
+    WorkflowStepType,
+)
+from ..poi_mapping.service import PoiMappingService
+from ..queue_manager.service import QueueManagerService
+from ..realtime_bus.bus import publish_event
+from .busy_index import busy_index
+
+
+log = logging.getLogger("trip-batching")
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def batching_settings() -> Dict[str, Any]:
+    return {
+        "enabled": os.getenv("TRIP_BATCH_ENABLED", "0") == "1",
+        "types": {t.strip().upper() for t in os.getenv("TRIP_BATCH_TYPES", "DELIVERY,CLEANUP").split(",") if t.strip()},
+        "radius_m": max(0.0, float(os.getenv("TRIP_BATCH_RADIUS_M", "3.0"))),
+        "max_stops": max(1, int(os.getenv("TRIP_BATCH_MAX_STOPS", "3"))),
+        "wait_s": max(0.0, float(os.getenv("TRIP_BATCH_WAIT_S", "0"))),
+        "scan": max(1, int(os.getenv("TRIP_BATCH_SCAN", "50"))),
+    }
+
+
+@dataclass
+class TripStop:
+    task_id: int
+    task_type: str
+    created_at: Optional[datetime] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+
+
+@dataclass
+class PlannedTrip:
+    """Companions claimed for a primary task before its run starts."""
+    task_id: int
+    robot_id: str
+    task_type: Any
+    primary: TripStop
+    companions: List[TripStop]
+    # Set by the pre-start splice once the stops are in the run
+    result: Optional[Dict[str, Any]] = field(default=None)
+
+    @property
+    def companion_ids(self) -> List[int]:
+        return [c.task_id for c in self.companions]
+
+
+def _type_name(v: Any) -> str:
+    return str(getattr(v, "value", v) or "").upper()
+
+
+def _dist(a: TripStop, b: TripStop) -> float:
+    return math.hypot(a.x - b.x, a.y - b.y)
+
+
+def plan_trip(primary: TripStop, candidates: Sequence[TripStop], radius_m: float, max_stops: int) -> List[TripStop]:
+    """
+    Companion stops for `primary`: same task type, target within radius_m of the
+    primary's target, visited nearest-neighbour from the primary. At most max_stops - 1.
+    """
+    if primary.x is None or primary.y is None or max_stops <= 1:
+        return []
+    pool = [
+        c for c in candidates
+        if c.task_id != primary.task_id
+        and c.task_type == primary.task_type
+        and c.x is not None and c.y is not None
+        and _dist(primary, c) <= radius_m
+    ]
+    route: List[TripStop] = []
+    here = primary
+    while pool and len(route) < max_stops - 1:
+        nxt = min(pool, key=lambda c: _dist(here, c))
+        pool.remove(nxt)
+        route.append(nxt)
+        here = nxt
+    return route
+
+
+def held_task_ids(stops: Sequence[TripStop], cfg: Dict[str, Any], now: datetime) -> Set[int]:
+    """
+    Wait window: a batchable task with no companion in range yet is held back
+    until it is TRIP_BATCH_WAIT_S old, giving nearby orders time to arrive.
+    """
+    wait_s = float(cfg["wait_s"])
+    if wait_s <= 0:
+        return set()
+    held: Set[int] = set()
+    for s in stops:
+        if s.task_type not in cfg["types"] or s.x is None or s.y is None or s.created_at is None:
+            continue
+        created = s.created_at if s.created_at.tzinfo else s.created_at.replace(tzinfo=timezone.utc)
+        if (now - created).total_seconds() >= wait_s:
+            continue
+        if not plan_trip(s, stops, float(cfg["radius_m"]), 2):
+            held.add(s.task_id)
+    return held
+
+
+class TripBatchService:
+    """
+    Multi-stop trips: before a batchable task's workflow run starts, nearby
+    READY tasks of the same type are claimed for the same robot (claim_companions).
+    While start_run builds the run, the commit that writes its steps also gets
+    one copy of the primary's target segment (NAVIGATE + the confirm/wait steps
+    after it) per companion (see `pre_start_trip`), so the run is never rewritten
+    once live. One kitchen round trip serves them all.
+    Companions are closed with the run: DONE with it, or back to READY if it
+    fails / is canceled, or if their stops never made it into the run.
+    """
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def head_stops(self, limit: int, robot_id: Optional[str] = None) -> List[TripStop]:
+        page = QueueManagerService(self.session).get_ready_queue_page(
+            limit=limit,
+            fields=["task_id", "task_type", "created_at", "target_kind", "target_ref"],
+            for_robot=robot_id,
+            unreserved_only=True,
+        )
+        items = page["queue"]
+        if not items:
+            return []
+        coords = PoiMappingService(self.session).target_coords({x["target_kind"] for x in items}, robot_id=robot_id)
+        out: List[TripStop] = []
+        for x in items:
+            xy = coords.get((PoiMappingService.norm_kind(x["target_kind"]), PoiMappingService.norm_ref(x["target_ref"])))
+            out.append(
+                TripStop(
+                    task_id=int(x["task_id"]),
+                    task_type=_type_name(x["task_type"]),
+                    created_at=x["created_at"],
+                    x=xy[0] if xy else None,
+                    y=xy[1] if xy else None,
+                )
+            )
+        return out
+
+    def held_task_ids(self, cfg: Dict[str, Any]) -> Set[int]:
+        if float(cfg["wait_s"]) <= 0:
+            return set()
+        return held_task_ids(self.head_stops(int(cfg["scan"])), cfg, utc_now())
+
+    @staticmethod
+    def _target_segment(steps: List[WorkflowStep], x: float, y: float, after_index: int) -> List[WorkflowStep]:
+        """
+        NAVIGATE step to (x, y) plus the non-NAVIGATE steps that follow it,
+        only if the run hasn't reached the end of that segment yet.
+        """
+        for i, st in enumerate(steps):
+            if st.step_type != WorkflowStepType.NAVIGATE or st.x is None or st.y is None:
+                continue
+            if math.hypot(st.x - x, st.y - y) > max(0.5, float(st.stop_radius or 0.0)):
+                continue
+            seg = [st]
+            for nxt in steps[i + 1:]:
+                if nxt.step_type == WorkflowStepType.NAVIGATE:
+                    break
+                seg.append(nxt)
+            if seg[-1].step_index > after_index:
+                return seg
+        return []
+
+    def claim_companions(self, task_id: int, robot_id: str, cfg: Dict[str, Any]) -> Optional[PlannedTrip]:
+        """
+        Claim companions for a task about to start on robot_id (one transaction).
+        Returns the planned trip, or None when nothing was batched.
+        """
+        task = self.session.get(Task, task_id)
+        if task is None or _type_name(task.task_type) not in cfg["types"]:
+            return None
+
+        coords = PoiMappingService(self.session).target_coords({task.target_kind}, robot_id=robot_id)
+        xy = coords.get((PoiMappingService.norm_kind(task.target_kind), PoiMappingService.norm_ref(task.target_ref)))
+        if xy is None:
+            return None
+        primary = TripStop(task_id=task_id, task_type=_type_name(task.task_type), x=xy[0], y=xy[1])
+        companions = plan_trip(primary, self.head_stops(int(cfg["scan"]), robot_id), float(cfg["radius_m"]), int(cfg["max_stops"]))
+        if not companions:
+            return None
+
+        now = utc_now()
+        try:
+            claimed: List[TripStop] = []
+            for c in companions:
+                res = self.session.exec(
+                    update(Task)
+                    .where(Task.id == c.task_id)
+                    .where(Task.status == TaskStatus.READY)
+                    .where(Task.assigned_robot_id.is_(None))
+                    .where(QueueManagerService._claimable_by(robot_id))
+                    .values(status=TaskStatus.ASSIGNED, assigned_robot_id=robot_id, reserved_robot_id=None, updated_at=now)
+                )
+                if getattr(res, "rowcount", 0) == 1:
+                    claimed.append(c)
+            if not claimed:
+                self.session.rollback()
+                return None
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return PlannedTrip(task_id=task_id, robot_id=robot_id, task_type=task.task_type, primary=primary, companions=claimed)
+
+    def splice(self, trip: PlannedTrip, run: WorkflowRun) -> Optional[Dict[str, Any]]:
+        """
+        Insert the companions' stops after the primary's segment of a run that
+        is being created, and record the TripBatch. No commit: runs inside the
+        transaction that writes the run's steps.
+        """
+        steps = list(
+            self.session.exec(
+                select(WorkflowStep).where(WorkflowStep.run_id == run.id).order_by(WorkflowStep.step_index.asc())
+            ).all()
+        )
+        segment = self._target_segment(steps, trip.primary.x, trip.primary.y, int(run.current_step_index or 0))
+        if not segment:
+            log.info("run %s: no target segment for task %s; not batching", run.id, trip.task_id)
+            return None
+
+        # Make room after the primary's segment, then insert one copy per companion
+        insert_at = segment[-1].step_index + 1
+        extra = len(segment) * len(trip.companions)
+        self.session.exec(
+            update(WorkflowStep)
+            .where(WorkflowStep.run_id == run.id)
+            .where(WorkflowStep.step_index >= insert_at)
+            .values(step_index=WorkflowStep.step_index + extra)
+        )
+        idx = insert_at
+        for n, c in enumerate(trip.companions, start=2):
+            for st in segment:
+                nav = st.step_type == WorkflowStepType.NAVIGATE
+                self.session.add(
+                    WorkflowStep(
+                        run_id=run.id,
+                        step_index=idx,
+                        step_type=st.step_type,
+                        step_code=st.step_code,
+                        area_id=st.area_id,
+                        x=c.x if nav else st.x,
+                        y=c.y if nav else st.y,
+                        yaw=None if nav else st.yaw,
+                        stop_radius=st.stop_radius,
+                        wait_seconds=st.wait_seconds,
+                        label=f"Stop {n}: task {c.task_id}" + (f" ({st.label})" if st.label else ""),
+                    )
+                )
+                idx += 1
+        run.total_steps = int(run.total_steps or 0) + extra
+        run.updated_at = utc_now()
+        self.session.add(run)
+
+        task_ids = [trip.task_id] + trip.companion_ids
+        batch = TripBatch(
+            run_id=run.id,
+            robot_id=trip.robot_id,
+            task_type=trip.task_type,
+            task_ids=",".join(str(i) for i in task_ids),
+        )
+        self.session.add(batch)
+        self.session.flush()
+        return {"trip_id": batch.id, "run_id": run.id, "robot_id": trip.robot_id, "task_ids": task_ids}
+
+    def release_companions(self, trip: PlannedTrip, reason: str) -> int:
+        # Companions whose stops never made it into a run go back to the queue
+        res = self.session.exec(
+            update(Task)
+            .where(Task.id.in_(trip.companion_ids))
+            .where(Task.status == TaskStatus.ASSIGNED)
+            .where(Task.assigned_robot_id == trip.robot_id)
+            .values(status=TaskStatus.READY, assigned_robot_id=None, updated_at=utc_now())
+        )
+        self.session.commit()
+        if reason:
+            log.info("trip for task %s not started (%s); released %s", trip.task_id, reason, trip.companion_ids)
+        return int(getattr(res, "rowcount", 0) or 0)
+
+    def settle(self, run_id: int) -> List[Dict[str, Any]]:
+        """
+        Close ACTIVE trips of a finished run: companions DONE with a DONE run,
+        otherwise handed back to the queue.
+        """
+        run = self.session.get(WorkflowRun, run_id)
+        if run is None or run.status == WorkflowRunStatus.RUNNING:
+            return []
+        trips = list(
+            self.session.exec(
+                select(TripBatch).where(TripBatch.run_id == run_id).where(TripBatch.status == TripBatchStatus.ACTIVE)
+            ).all()
+        )
+        now = utc_now()
+        out: List[Dict[str, Any]] = []
+        try:
+            for trip in trips:
+                companions = [int(i) for i in trip.task_ids.split(",")[1:] if i]
+                guard = (
+                    update(Task)
+                    .where(Task.id.in_(companions))
+                    .where(Task.status == TaskStatus.ASSIGNED)
+                    .where(Task.assigned_robot_id == trip.robot_id)
+                )
+                if run.status == WorkflowRunStatus.DONE:
+                    res = self.session.exec(guard.values(status=TaskStatus.DONE, updated_at=now))
+                    trip.status = TripBatchStatus.DONE
+                    trip.trips_saved = int(getattr(res, "rowcount", 0) or 0)
+                else:
+                    self.session.exec(guard.values(status=TaskStatus.READY, assigned_robot_id=None, updated_at=now))
+                    trip.status = TripBatchStatus.ABORTED
+                trip.closed_at = now
+                self.session.add(trip)
+                out.append({"trip_id": trip.id, "run_id": run_id, "status": trip.status, "task_ids": companions})
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return out
+
+    def open_run_ids(self) -> List[int]:
+        stmt = (
+            select(TripBatch.run_id)
+            .join(WorkflowRun, WorkflowRun.id == TripBatch.run_id)
+            .where(TripBatch.status == TripBatchStatus.ACTIVE)
+            .where(WorkflowRun.status != WorkflowRunStatus.RUNNING)
+        )
+        return sorted({int(r) for r in self.session.exec(stmt).all()})
+
+    def stats(self, window_s: float = 3600.0) -> Dict[str, Any]:
+        since = utc_now() - timedelta(seconds=window_s)
+        done, saved = self.session.exec(
+            select(func.count(), func.coalesce(func.sum(TripBatch.trips_saved), 0))
+            .where(TripBatch.status == TripBatchStatus.DONE)
+            .where(TripBatch.closed_at >= since)
+        ).one()
+        active = list(self.session.exec(select(TripBatch).where(TripBatch.status == TripBatchStatus.ACTIVE)).all())
+        return {
+            "window_s": window_s,
+            "trips_done": int(done or 0),
+            "kitchen_trips_saved": int(saved or 0),
+            "kitchen_trips_saved_per_hour": round(float(saved or 0) * 3600.0 / window_s, 2),
+            "active": [
+                {"trip_id": t.id, "run_id": t.run_id, "robot_id": t.robot_id, "task_ids": [int(i) for i in t.task_ids.split(",") if i]}
+                for t in active
+            ],
+        }
+
+
+# ----------------------------
+# Pre-start splice (ORM hooks, all sessions)
+# ----------------------------
+_NEW_STEP_RUNS_KEY = "trip_new_step_runs"
+_pending_lock = threading.Lock()
+_pending_trips: Dict[int, PlannedTrip] = {}  # primary task_id -> trip
+
+
+@asynccontextmanager
+async def pre_start_trip(trip: Optional[PlannedTrip]) -> AsyncIterator[Optional[PlannedTrip]]:
+    """
+    Wrap start_run of a planned trip's primary task: the commit that first
+    writes the run's steps gets the companions' stops too. If that never
+    happens (start_run failed, no target segment), the companions are released.
+    """
+    if trip is None:
+        yield None
+        return
+    with _pending_lock:
+        _pending_trips[trip.task_id] = trip
+    try:
+        yield trip
+    finally:
+        with _pending_lock:
+            _pending_trips.pop(trip.task_id, None)
+        if trip.result is None:
+            try:
+                await run_in_db(_release_companions, trip)
+            except Exception as e:
+                log.warning("trip release failed task=%s companions=%s: %s", trip.task_id, trip.companion_ids, e)
+
+
+def _release_companions(trip: PlannedTrip) -> int:
+    with Session(engine) as session:
+        return TripBatchService(session).release_companions(trip, "stops not spliced")
+
+
+@event.listens_for(SASession, "after_flush")
+def _collect_new_steps(session: SASession, _ctx: Any) -> None:
+    if not _pending_trips:
+        return
+    run_ids: Set[int] = session.info.setdefault(_NEW_STEP_RUNS_KEY, set())
+    for obj in session.new:
+        if isinstance(obj, WorkflowStep) and obj.run_id is not None:
+            run_ids.add(int(obj.run_id))
+
+
+@event.listens_for(SASession, "before_commit")
+def _splice_pending_trips(session: SASession) -> None:
+    if not _pending_trips:
+        return
+    session.flush()
+    run_ids = session.info.pop(_NEW_STEP_RUNS_KEY, None)
+    if not run_ids:
+        return
+    for run_id in run_ids:
+        run = session.get(WorkflowRun, run_id)
+        if run is None:
+            continue
+        with _pending_lock:
+            trip = _pending_trips.get(int(run.task_id))
+        if trip is None or trip.result is not None or run.robot_id != trip.robot_id:
+            continue
+        trip.result = TripBatchService(session).splice(trip, run)
+
+
+@event.listens_for(SASession, "after_rollback")
+def _drop_new_steps(session: SASession) -> None:
+    session.info.pop(_NEW_STEP_RUNS_KEY, None)
+
+
+def _settle(run_id: Optional[int]) -> List[Dict[str, Any]]:
+    with Session(engine) as session:
+        svc = TripBatchService(session)
+        run_ids = [run_id] if run_id is not None else svc.open_run_ids()
+        out: List[Dict[str, Any]] = []
+        for rid in run_ids:
+            out += svc.settle(rid)
+        return out
+
+
+class TripBatchRunner:
+    """
+    Closes multi-stop trips when their run finishes (busy-index callback), with
+    a periodic sweep every TRIP_BATCH_SETTLE_S (default 30) for runs ended by
+    bulk writes or while the process was down.
+
+    Enable with:
+      TRIP_BATCH_ENABLED=1
+      TRIP_BATCH_TYPES=DELIVERY,CLEANUP   TRIP_BATCH_RADIUS_M=3.0
+      TRIP_BATCH_MAX_STOPS=3              TRIP_BATCH_WAIT_S=0 (hold lone tasks up to N s)
+    """
+    def __init__(self) -> None:
+        cfg = batching_settings()
+        self.enabled = bool(cfg["enabled"])
+        self.interval_s = max(5.0, float(os.getenv("TRIP_BATCH_SETTLE_S", "30")))
+
+        self._queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("TRIP_BATCH disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        busy_index.add_listener(self._on_run_finished)
+        self._queue.put_nowait(None)  # sweep trips left open by a previous process
+        self._task = asyncio.create_task(self._run())
+        log.info("TRIP_BATCH enabled %s", {k: sorted(v) if isinstance(v, set) else v for k, v in batching_settings().items()})
+
+    async def stop(self) -> None:
+        self._stop.set()
+        busy_index.remove_listener(self._on_run_finished)
+        if self._task:
+            self._task.cancel()
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except BaseException:
+                pass
+
+    def _on_run_finished(self, _robot_id: str, run_id: Optional[int]) -> None:
+        loop = self._loop
+        if run_id is None or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._queue.put_nowait, run_id)
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                run_id = await asyncio.wait_for(self._queue.get(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                run_id = None
+            try:
+                closed = await run_in_db(_settle, run_id)
+            except Exception as e:
+                log.warning("trip settle error run=%s: %s", run_id, e)
+                continue
+            for trip in closed:
+                await publish_event("trip.closed", trip, source="trip-batching")
+            if any(t["status"] == TripBatchStatus.ABORTED for t in closed):
+                await publish_event("queue.updated", {"reason": "trip_aborted"}, source="trip-batching")
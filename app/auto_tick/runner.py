@@ -16,14 +16,15 @@ class AutoTickRunner:
     Optional background loop that periodically calls:
       POST /orchestrator/tick
 
-    Disabled by default. Enable with:
-      AUTO_TICK_ENABLED=1
+    Legacy mode; the in-process OrchestratorLoop (orchestrator/loop.py) is the
+    default. Disabled by default. Enable with:
+      AUTO_TICK_ENABLED=1 AUTO_TICK_MODE=http
 
     Required:
       AUTO_TICK_API_KEY must be operator/admin key.
     """
     def __init__(self) -> None:
-        self.enabled = os.getenv("AUTO_TICK_ENABLED", "0") == "1"
+        self.enabled = os.getenv("AUTO_TICK_ENABLED", "0") == "1" and os.getenv("AUTO_TICK_MODE", "events").lower() == "http"
         self.interval_s = float(os.getenv("AUTO_TICK_INTERVAL_S", "2.0"))
         self.url = os.getenv("AUTO_TICK_URL", "http://127.0.0.1:8000/orchestrator/tick")
         self.api_key = os.getenv("AUTO_TICK_API_KEY", "dev-operator-key")
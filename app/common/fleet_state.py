@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def state_flag(d: Any, *keys: str) -> Optional[bool]:
+    if d is None:
+        return None
+    if hasattr(d, "model_dump"):
+        d = d.model_dump()
+    elif hasattr(d, "dict"):
+        d = d.dict()
+    if isinstance(d, dict):
+        for k in keys:
+            v = d.get(k)
+            if isinstance(v, bool):
+                return v
+    return None
+
+
+def availability(state: Any) -> Tuple[Optional[bool], Optional[bool], Optional[bool]]:
+    """
+    (online, charging, emergency_stop) as read by assignment eligibility.
+    """
+    return (
+        state_flag(state, "online", "isOnline", "connected"),
+        state_flag(state, "charging", "isCharging", "onCharge", "onChargingPile"),
+        state_flag(state, "emergency_stop", "emergencyStop", "eStop"),
+    )
+
+
+def is_available(state: Any) -> bool:
+    online, charging, estop = availability(state)
+    return online is not False and charging is not True and estop is not True
+
+
+# (robot_id, state) called when a robot becomes available for work again
+AvailabilityListener = Callable[[str, Any], None]
+
+
+@dataclass
+class FleetStateEntry:
+    state: Any
+    fetched_at: datetime
+    mono: float
+    source: str  # "poller" | "live"
+
+
+class FleetStateStore:
+    """
+    Shared in-memory robot state, fed by the background RobotStatePoller.
+
+    Readers (assignment eligibility, /assignment/robots, dashboard) take the
+    cached entry when it is younger than FLEET_STATE_MAX_AGE_S and only fall
+    back to a live vendor call when it is stale/missing. Concurrent misses for
+    the same robot share one live fetch.
+    """
+    def __init__(self, max_age_s: Optional[float] = None) -> None:
+        self.max_age_s = float(max_age_s if max_age_s is not None else os.getenv("FLEET_STATE_MAX_AGE_S", "10"))
+        self._entries: Dict[str, FleetStateEntry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.live_errors = 0
+        self._listeners: List[AvailabilityListener] = []
+
+    def add_listener(self, fn: AvailabilityListener) -> None:
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: AvailabilityListener) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def put(self, robot_id: str, state: Any, source: str = "poller") -> None:
+        prev = self._entries.get(robot_id)
+        self._entries[robot_id] = FleetStateEntry(state=state, fetched_at=utc_now(), mono=time.monotonic(), source=source)
+        # Offline / charging / e-stop -> available: wake whoever waits for free robots
+        if prev is not None and self._listeners and is_available(state) and not is_available(prev.state):
+            for fn in list(self._listeners):
+                try:
+                    fn(robot_id, state)
+                except Exception:
+                    pass
+
+    def age_s(self, robot_id: str) -> Optional[float]:
+        e = self._entries.get(robot_id)
+        return None if e is None else max(0.0, time.monotonic() - e.mono)
+
+    def peek(self, robot_id: str, max_age_s: Optional[float] = None) -> Optional[Any]:
+        """
+        Cached state if fresh enough, else None (no vendor call, no counters).
+        """
+        limit = self.max_age_s if max_age_s is None else max_age_s
+        e = self._entries.get(robot_id)
+        if e is None or (time.monotonic() - e.mono) > limit:
+            return None
+        return e.state
+
+    async def get_state(self, robot_id: str, fetch: Callable[[str], Awaitable[Any]], max_age_s: Optional[float] = None) -> Any:
+        state = self.peek(robot_id, max_age_s=max_age_s)
+        if state is not None:
+            self.hits += 1
+            return state
+
+        self.misses += 1
+        fut = self._inflight.get(robot_id)
+        if fut is not None:
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[robot_id] = fut
+        try:
+            state = await fetch(robot_id)
+            self.put(robot_id, state, source="live")
+            fut.set_result(state)
+            return state
+        except asyncio.CancelledError:
+            # Caller gave up (deadline); don't leave other waiters hanging
+            fut.cancel()
+            raise
+        except Exception as e:
+            self.live_errors += 1
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(robot_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "max_age_s": self.max_age_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "live_errors": self.live_errors,
+            "robots": {
+                rid: {"age_s": round(time.monotonic() - e.mono, 2), "fetched_at": e.fetched_at, "source": e.source}
+                for rid, e in self._entries.items()
+            },
+        }
+
+
+# Process-wide store (same lifetime as the poller)
+fleet_state = FleetStateStore()
+
+
+class FleetStateRecorder:
+    """
+    Wrap the robot API handed to RobotStatePoller: every state it reads is
+    also written into the fleet state store. Other calls pass through.
+    """
+    def __init__(self, inner: Any, store: FleetStateStore = fleet_state) -> None:
+        self.inner = inner
+        self.store = store
+
+    async def get_state(self, robot_id: str):
+        state = await self.inner.get_state(robot_id)
+        self.store.put(robot_id, state)
+        return state
+
+    async def get_robot_state(self, robot_id: str):
+        fn = getattr(self.inner, "get_robot_state", None) or self.inner.get_state
+        state = await fn(robot_id)
+        self.store.put(robot_id, state)
+        return state
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
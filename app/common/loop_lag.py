@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+log = logging.getLogger("loop-lag")
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a sleep(interval) wakes up.
+    Any blocking call on the loop (sync DB, CPU work) shows up here directly.
+    """
+    def __init__(self, interval_s: Optional[float] = None, window: int = 600) -> None:
+        self.interval_s = float(interval_s if interval_s is not None else os.getenv("LOOP_LAG_INTERVAL_S", "0.25"))
+        self.warn_ms = float(os.getenv("LOOP_LAG_WARN_MS", "200"))
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    def snapshot(self) -> Dict[str, float]:
+        data = sorted(self._samples)
+        if not data:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def pct(p: float) -> float:
+            return round(data[min(len(data) - 1, int(p * (len(data) - 1)))], 2)
+
+        return {"samples": len(data), "p50_ms": pct(0.50), "p99_ms": pct(0.99), "max_ms": round(data[-1], 2)}
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            lag_ms = max(0.0, (time.perf_counter() - t0 - self.interval_s) * 1000.0)
+            self._samples.append(lag_ms)
+            if lag_ms >= self.warn_ms:
+                log.warning("event loop lag %.1fms", lag_ms)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class TickSingleFlight:
+    """
+    At most one orchestrator pass per process. A caller that arrives while a pass
+    is running queues the *next* pass; callers with the same parameters that arrive
+    before it starts attach to it and get its result (one promote/assign/vendor
+    round instead of one per caller). Joining the next pass rather than the running
+    one means the caller's own writes (new task, confirm) are always seen.
+
+    Each pass runs in its own asyncio.Task: a caller that is cancelled (client
+    disconnect, shutdown) only stops waiting, the pass still finishes for the
+    other callers.
+    """
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._next: Dict[Hashable, "asyncio.Task[Dict[str, Any]]"] = {}
+        self.passes = 0
+        self.queued = 0  # leaders that waited for a running pass
+        self.coalesced = 0  # callers served by another caller's pass
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        task = self._next.get(key)
+        if task is not None:
+            self.coalesced += 1
+            res = await asyncio.shield(task)
+            return {**res, "coalesced": True}
+
+        if self._lock.locked():
+            self.queued += 1
+        task = asyncio.get_running_loop().create_task(self._pass(key, fn))
+        task.add_done_callback(_retrieve)
+        self._next[key] = task
+        return await asyncio.shield(task)
+
+    async def _pass(self, key: Hashable, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        me = asyncio.current_task()
+        try:
+            async with self._lock:
+                # Started: later callers queue a fresh pass
+                if self._next.get(key) is me:
+                    self._next.pop(key, None)
+                self.passes += 1
+                return await fn()
+        finally:
+            if self._next.get(key) is me:
+                self._next.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._lock.locked(),
+            "pending": len(self._next),
+            "passes": self.passes,
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+        }
+
+
+def _retrieve(task: "asyncio.Task[Any]") -> None:
+    # Mark a failed pass's exception retrieved when every caller stopped waiting
+    if not task.cancelled():
+        task.exception()
+
+
+# Everything that claims tasks for robots and starts runs (orchestrator ticks,
+# reservation dispatch, pre-positioning) goes through this one flight, so two
+# writers never pick the same idle robot.
+tick_flight = TickSingleFlight()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    data = sorted(values)
+    if not data:
+        return None
+    return round(data[min(len(data) - 1, int(q * (len(data) - 1)))], 2)
+
+
+class PhaseTimer:
+    """
+    Monotonic per-phase timings for one pass (ms). A phase entered more than
+    once accumulates, so split code paths can share a phase name.
+
+        timer = PhaseTimer()
+        with timer.phase("promote"):
+            ...
+        timer.breakdown()  # {"promote": 1.2, ..., "total": 9.8}
+    """
+    def __init__(self) -> None:
+        self._t0 = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+
+    def breakdown(self) -> Dict[str, float]:
+        out = {name: round(ms, 2) for name, ms in self.phases.items()}
+        out["total"] = round((time.perf_counter() - self._t0) * 1000.0, 2)
+        return out
+
+
+class PhaseHistograms:
+    """
+    Rolling window of PhaseTimer breakdowns; p50/p95/p99 per phase.
+    Phases missing from a pass (early return) simply have fewer samples.
+    """
+    def __init__(self, window: int = 500) -> None:
+        self.window = max(1, int(window))
+        self._samples: Dict[str, Deque[float]] = {}
+        self.count = 0
+        self.last: Optional[Dict[str, float]] = None
+
+    def record(self, breakdown: Dict[str, float]) -> None:
+        self.count += 1
+        self.last = dict(breakdown)
+        for name, ms in breakdown.items():
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(float(ms))
+
+    def reset(self) -> None:
+        self._samples.clear()
+        self.count = 0
+        self.last = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        phases: Dict[str, Dict[str, Any]] = {}
+        for name, dq in self._samples.items():
+            data: List[float] = list(dq)
+            phases[name] = {
+                "samples": len(data),
+                "p50_ms": percentile(data, 0.50),
+                "p95_ms": percentile(data, 0.95),
+                "p99_ms": percentile(data, 0.99),
+                "max_ms": round(max(data), 2) if data else None,
+            }
+        return {"count": self.count, "window": self.window, "phases": phases, "last": self.last}
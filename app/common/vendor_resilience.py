@@ -1,7 +1,10 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import os
-from typing import Optional
+import time
+import weakref
+from typing import Any, Dict, Iterable, Optional, Set
 
 from ..robot_api.service import RobotAPIService
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
@@ -62,3 +65,103 @@ class RetryingTaskClient:
             return await async_retry(lambda: getattr(self.inner, "task_cancel_v2")(task_id), self.cfg)
 
         return {"ok": False, "note": "No vendor cancel method implemented in AutoXingTaskClient"}
+
+
+def prefetch_settings() -> Dict[str, Any]:
+    return {
+        "enabled": os.getenv("WORKFLOW_PREFETCH_ENABLED", "1") == "1",
+        "concurrency": max(1, int(os.getenv("WORKFLOW_POLL_CONCURRENCY", "8"))),
+        "deadline_s": max(0.1, float(os.getenv("WORKFLOW_POLL_DEADLINE_S", "3.0"))),
+    }
+
+
+# Per task client: vendor task id -> last task_state_v2 seen for it (ids of RUNNING
+# runs only). Keyed by the long-lived client so orchestrators on different
+# clients never answer (or prune) each other's ids.
+_last_states_by_client: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def stale_task_state(task_id: str) -> Dict[str, Any]:
+    """
+    Answer for a vendor task id whose poll missed the tick deadline and has no
+    earlier state: nothing is known yet, so the run stays RUNNING until the next
+    tick polls it again.
+    """
+    return {"taskId": task_id, "state": "UNKNOWN", "stale": True}
+
+
+def is_stale_task_state(state: Any) -> bool:
+    return isinstance(state, dict) and state.get("stale") is True
+
+
+class PrefetchedTaskClient:
+    """
+    Per-tick view over a task client: task_state_v2 answers from states fetched
+    up front (concurrently, see prefetch); everything else goes to `inner`.
+
+    Vendor task ids that missed the tick deadline never reach the vendor again
+    this tick: they get the state fetched for them on an earlier tick (already
+    applied by the engine, so the run has no change this tick), or, with no
+    earlier state (first poll after start_run), a stale_task_state marker.
+    Ids not prefetched at all fall through to a live call. Vendor errors from
+    the prefetch are raised as a live call would raise them.
+    """
+    def __init__(self, inner: Any) -> None:
+        self.inner = inner
+        self._states: Dict[str, Any] = {}
+        self._errors: Dict[str, BaseException] = {}
+        self._skipped: Set[str] = set()
+        try:
+            self._last_states = _last_states_by_client.setdefault(inner, {})
+        except TypeError:
+            self._last_states = {}  # client can't be weakly referenced: no carry-over
+        self.stats: Dict[str, Any] = {"requested": 0, "fetched": 0, "errors": 0, "skipped_deadline": 0, "ms": 0.0}
+
+    async def prefetch(self, vendor_task_ids: Iterable[str], concurrency: int, deadline_s: float) -> Dict[str, Any]:
+        ids = list(dict.fromkeys(str(x) for x in vendor_task_ids if x))
+        t0 = time.perf_counter()
+        sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+        async def one(task_id: str) -> None:
+            async with sem:
+                try:
+                    self._states[task_id] = await self.inner.task_state_v2(task_id)
+                except Exception as e:
+                    self._errors[task_id] = e
+
+        jobs = {asyncio.ensure_future(one(tid)): tid for tid in ids}
+        if jobs:
+            _done, pending = await asyncio.wait(jobs, timeout=deadline_s)
+            for fut in pending:
+                fut.cancel()
+                self._skipped.add(jobs[fut])
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        for tid in [t for t in self._last_states if t not in jobs.values()]:
+            self._last_states.pop(tid, None)  # run no longer RUNNING
+        self._last_states.update(self._states)
+
+        self.stats = {
+            "requested": len(ids),
+            "fetched": len(self._states),
+            "errors": len(self._errors),
+            "skipped_deadline": len(self._skipped),
+            "ms": round((time.perf_counter() - t0) * 1000.0, 2),
+        }
+        return self.stats
+
+    async def task_state_v2(self, task_id: str):
+        tid = str(task_id)
+        if tid in self._states:
+            return self._states[tid]
+        if tid in self._errors:
+            raise self._errors[tid]
+        if tid in self._skipped:
+            return self._last_states.get(tid) or stale_task_state(tid)
+        state = await self.inner.task_state_v2(task_id)
+        self._last_states[tid] = state
+        return state
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
@@ -8,8 +8,10 @@ from sqlmodel import Session, delete
 
 from ..auth_roles.deps import require_role
 from ..persistence.db import get_session
-from ..persistence.models import Task, TaskStatus, WorkflowRun, WorkflowRunStatus, WorkflowStep
+from ..persistence.models import Task, TaskStatus, TripBatch, WorkflowRun, WorkflowRunStatus, WorkflowStep
 from ..priority_manager.models import TaskPriorityOverride
+from ..priority_manager.service import invalidate_override_caches
+from ..archive.models import TaskArchive, WorkflowRunArchive, WorkflowStepArchive
 from ..realtime_bus.bus import publish_event_nowait
 from ..workflow_engine.router import get_task_client
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
@@ -96,19 +98,24 @@ async def cancel_vendor_task(vendor_task_id: str, task_client: AutoXingTaskClien
 @router.post("/reset", dependencies=[Depends(require_role("admin"))])
 def reset_system(session: Session = Depends(get_session)):
     """
-    Admin-only reset: clear tasks, workflow runs/steps, and priority overrides.
+    Admin-only reset: clear tasks, workflow runs/steps, trips, priority overrides and archived history.
     """
     deleted = {}
     for model, name in (
         (WorkflowStep, "workflow_steps"),
+        (TripBatch, "trip_batches"),
         (WorkflowRun, "workflow_runs"),
         (TaskPriorityOverride, "task_priority_overrides"),
         (Task, "tasks"),
+        (WorkflowStepArchive, "archived_workflow_steps"),
+        (WorkflowRunArchive, "archived_workflow_runs"),
+        (TaskArchive, "archived_tasks"),
     ):
         result = session.exec(delete(model))
         deleted[name] = result.rowcount
 
     session.commit()
+    invalidate_override_caches()
     logger.info("system.reset deleted=%s", deleted)
     publish_event_nowait("system.reset", {"deleted": deleted}, source="controls")
     return {"ok": True, "deleted": deleted}
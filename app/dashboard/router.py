@@ -5,7 +5,7 @@ from typing import Any, Dict, List
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
 
-from ..persistence.db import get_session
+from ..persistence.db import AsyncSession, get_async_session
 from ..robot_api.router import get_robot_api_service
 from ..robot_api.service import RobotAPIService
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
@@ -20,17 +20,10 @@ from ..auth_roles.deps import require_role
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
-@router.get("/overview", dependencies=[Depends(require_role("monitor"))])
-async def overview(
-    session: Session = Depends(get_session),
-    robot_api: RobotAPIService = Depends(get_robot_api_service),
-    task_client: AutoXingTaskClient = Depends(get_task_client),
-    limit: int = 200,
-    offset: int = 0,
-):
-    ae = AssignmentEngineService(session, robot_api, task_client)
-    robots = await ae.list_robots(include_state=False)
-
+def _overview_db(session: Session, limit: int, offset: int) -> Dict[str, Any]:
+    """
+    All blocking DB reads for the overview (runs on the DB executor).
+    """
     qm = QueueManagerService(session)
     ready_queue = qm.get_ready_queue()
     stats = qm.stats()
@@ -99,9 +92,24 @@ async def overview(
         })
 
     return {
-        "robots": robots,
         "queue_ready": ready_queue,
         "task_stats": stats,
         "running_workflows": items,
         "tasks": task_rows,
     }
+
+
+@router.get("/overview", dependencies=[Depends(require_role("monitor"))])
+async def overview(
+    session: AsyncSession = Depends(get_async_session),
+    robot_api: RobotAPIService = Depends(get_robot_api_service),
+    task_client: AutoXingTaskClient = Depends(get_task_client),
+    limit: int = 200,
+    offset: int = 0,
+):
+    ae = AssignmentEngineService(session.sync_session, robot_api, task_client)
+    # Concurrent fan-out bounded by ROBOTS_DEADLINE_S (slow robots come back "unknown")
+    robots, robots_debug = await ae.list_robots_debug(include_state=False)
+
+    data = await session.run_sync(_overview_db, limit, offset)
+    return {"robots": robots, **data, "debug": {"robots": robots_debug}}
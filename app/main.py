@@ -4,6 +4,8 @@ import os
 from fastapi import FastAPI
 
 from .common.logging import configure_logging
+from .common.fleet_state import FleetStateRecorder
+from .common.loop_lag import LoopLagMonitor
 from .common.middleware import RequestIdMiddleware
 from .common.vendor_resilience import RetryingRobotAPIService, RetryingTaskClient
 
@@ -14,10 +16,15 @@ from .robot_api.router import router as robot_api_router, get_robot_api_service
 from .robot_api.service import RobotAPIService
 
 from .task_manager.router import router as task_manager_router
+from .task_manager.bulk_router import router as task_bulk_router
 from .queue_manager.router import router as queue_manager_router
+from .queue_manager.scheduler import ReleaseScheduler
+from .queue_manager.stats_runner import TaskStatsReconciler
 from .priority_manager.router import router as priority_router
 
 from .poi_mapping.router import router as poi_mapping_router
+from .robot_registry.router import router as robot_registry_router
+from .robot_registry.service import robot_registry
 
 from .workflow_engine.vendor_task_client import AutoXingTaskClient
 from .workflow_engine.router import router as workflow_engine_router, get_task_client
@@ -33,7 +40,13 @@ from .auto_tick.runner import AutoTickRunner
 from .auto_confirm.runner import AutoConfirmRunner
 from .poi_cache.poller import PoiCachePoller
 from .poi_cache.router import router as poi_cache_router
+from .archive.router import router as archive_router
+from .archive.runner import ArchiveRunner
 
+from .assignment_engine.busy_index import BusyIndexReconciler
+from .assignment_engine.prepositioning import PrepositionRunner
+from .assignment_engine.reservations import ReservationDispatcher
+from .assignment_engine.trip_batching import TripBatchRunner
 from .assignment_engine.robots import get_robot_ids
 
 # Optional routers (won't crash if module doesn't exist yet)
@@ -47,6 +60,11 @@ try:
 except Exception:
     orchestrator_router = None
 
+try:
+    from .orchestrator.loop import OrchestratorLoop
+except Exception:
+    OrchestratorLoop = None
+
 
 def create_app() -> FastAPI:
     configure_logging()
@@ -61,6 +79,9 @@ def create_app() -> FastAPI:
     # Init DB tables (SQLite)
     init_db()
 
+    # Robot registry snapshot (seeded from ROBOT_IDS when the table is empty)
+    robot_registry.bootstrap()
+
     # Shared vendor config
     cfg = AutoXingConfig()
 
@@ -75,11 +96,14 @@ def create_app() -> FastAPI:
     # Routers
     app.include_router(robot_api_router)
 
+    # bulk route first so /tasks/bulk never falls through to /tasks/{task_id}
+    app.include_router(task_bulk_router)
     app.include_router(task_manager_router)
     app.include_router(priority_router)
     app.include_router(queue_manager_router)
 
     app.include_router(poi_mapping_router)
+    app.include_router(robot_registry_router)
     app.include_router(workflow_engine_router)
 
     if assignment_router:
@@ -93,6 +117,7 @@ def create_app() -> FastAPI:
     app.include_router(robot_monitor_router)
     app.include_router(controls_router)
     app.include_router(poi_cache_router)
+    app.include_router(archive_router)
 
     # ---- Background services ----
     interval_s = float(os.getenv("ROBOT_POLL_INTERVAL", "5"))
@@ -101,9 +126,34 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def _startup():
-        # Robot monitor poller
+        # Event-loop lag monitor (reported in /preflight/check)
+        lag = LoopLagMonitor()
+        app.state.loop_lag_monitor = lag
+        await lag.start()
+
+        # robot -> running run map (busy checks without a DB query)
+        busy_reconciler = BusyIndexReconciler()
+        app.state.busy_index_reconciler = busy_reconciler
+        await busy_reconciler.start()
+
+        # Optional lookahead reservations (start next task as soon as a run finishes)
+        reservation_dispatcher = ReservationDispatcher(robot_svc, vendor_tasks)
+        app.state.reservation_dispatcher = reservation_dispatcher
+        await reservation_dispatcher.start()
+
+        # Optional multi-stop trips (closes companion tasks when the trip's run ends)
+        trip_runner = TripBatchRunner()
+        app.state.trip_batch_runner = trip_runner
+        await trip_runner.start()
+
+        # Optional demand-aware pre-positioning of idle robots
+        preposition_runner = PrepositionRunner(robot_svc, vendor_tasks)
+        app.state.preposition_runner = preposition_runner
+        await preposition_runner.start()
+
+        # Robot monitor poller (also feeds the shared fleet state store)
         ids = get_robot_ids()
-        poller = RobotStatePoller(robot_svc, ids, interval_s=interval_s)
+        poller = RobotStatePoller(FleetStateRecorder(robot_svc), ids, interval_s=interval_s)
         app.state.robot_state_poller = poller
         await poller.start()
 
@@ -113,7 +163,23 @@ def create_app() -> FastAPI:
             app.state.poi_cache_poller = poi_poller
             await poi_poller.start()
 
-        # Optional AutoTick runner
+        # PENDING -> READY release scheduler (timer-driven)
+        release_scheduler = ReleaseScheduler()
+        app.state.release_scheduler = release_scheduler
+        await release_scheduler.start()
+
+        # Task-status counter reconciliation (backs /queue-manager/stats)
+        stats_reconciler = TaskStatsReconciler()
+        app.state.task_stats_reconciler = stats_reconciler
+        await stats_reconciler.start()
+
+        # Optional in-process orchestrator (event-driven; AUTO_TICK_MODE=events)
+        if OrchestratorLoop:
+            orchestrator_loop = OrchestratorLoop(robot_svc, vendor_tasks)
+            app.state.orchestrator_loop = orchestrator_loop
+            await orchestrator_loop.start()
+
+        # Optional AutoTick runner (legacy HTTP self-call; AUTO_TICK_MODE=http)
         runner = AutoTickRunner()
         app.state.auto_tick_runner = runner
         await runner.start()
@@ -123,6 +189,11 @@ def create_app() -> FastAPI:
         app.state.auto_confirm_runner = confirm_runner
         await confirm_runner.start()
 
+        # History archiver (DONE/CANCELED tasks + terminal runs/steps)
+        archive_runner = ArchiveRunner()
+        app.state.archive_runner = archive_runner
+        await archive_runner.start()
+
     @app.on_event("shutdown")
     async def _shutdown():
         poller = getattr(app.state, "robot_state_poller", None)
@@ -137,10 +208,46 @@ def create_app() -> FastAPI:
         if runner:
             await runner.stop()
 
+        orchestrator_loop = getattr(app.state, "orchestrator_loop", None)
+        if orchestrator_loop:
+            await orchestrator_loop.stop()
+
+        release_scheduler = getattr(app.state, "release_scheduler", None)
+        if release_scheduler:
+            await release_scheduler.stop()
+
+        stats_reconciler = getattr(app.state, "task_stats_reconciler", None)
+        if stats_reconciler:
+            await stats_reconciler.stop()
+
         confirm_runner = getattr(app.state, "auto_confirm_runner", None)
         if confirm_runner:
             await confirm_runner.stop()
 
+        archive_runner = getattr(app.state, "archive_runner", None)
+        if archive_runner:
+            await archive_runner.stop()
+
+        preposition_runner = getattr(app.state, "preposition_runner", None)
+        if preposition_runner:
+            await preposition_runner.stop()
+
+        trip_runner = getattr(app.state, "trip_batch_runner", None)
+        if trip_runner:
+            await trip_runner.stop()
+
+        reservation_dispatcher = getattr(app.state, "reservation_dispatcher", None)
+        if reservation_dispatcher:
+            await reservation_dispatcher.stop()
+
+        busy_reconciler = getattr(app.state, "busy_index_reconciler", None)
+        if busy_reconciler:
+            await busy_reconciler.stop()
+
+        lag = getattr(app.state, "loop_lag_monitor", None)
+        if lag:
+            await lag.stop()
+
     return app
 
 
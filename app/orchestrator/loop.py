@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
+from ..assignment_engine.busy_index import busy_index
+from ..common.fleet_state import fleet_state
+from ..common.timing import percentile
+from ..realtime_bus.bus import bus
+from ..realtime_bus.models import RealtimeEvent
+from ..robot_api.service import RobotAPIService
+from ..workflow_engine.vendor_task_client import AutoXingTaskClient
+from .service import OrchestratorService
+
+
+log = logging.getLogger("orchestrator-loop")
+
+# Bus events that can create assignable work or free a robot
+_WAKE_EVENTS = {
+    "queue.updated",  # release scheduler promoted due tasks, reservations dispatched, trip aborted
+    "assignment.unassigned",
+    "trip.closed",
+    "robot_registry.updated",
+    "system.reset",
+}
+# task.* (created/updated/canceled), priority overrides, workflow progress (manual confirm, run finished)
+_WAKE_PREFIXES = ("task.", "priority.", "workflow.")
+
+
+# Set inside the loop's own tick: bus events it publishes (directly or via the
+# workflow engine) must not wake it again.
+_in_tick: contextvars.ContextVar[bool] = contextvars.ContextVar("orchestrator_in_tick", default=False)
+
+
+class OrchestratorLoop:
+    """
+    In-process orchestrator (replaces AutoTickRunner's HTTP self-call).
+
+    Wakes on events instead of a fixed poll:
+      - bus events: task created/updated, queue updated (release due), priority
+        changes, workflow.* (manual confirm, run finished/canceled), reset
+      - busy index: a robot's RUNNING run committed as finished
+      - fleet state: a robot back online / off the charger / e-stop released
+    plus a fallback tick every ORCHESTRATOR_FALLBACK_S (workflow progress polling).
+
+    Bursts are coalesced: wakeups arriving while a tick is pending or running
+    fold into one follow-up tick (after ORCHESTRATOR_COALESCE_MS).
+
+    Enable with:
+      AUTO_TICK_ENABLED=1            (AUTO_TICK_MODE=events, the default)
+      AUTO_TICK_MAX_ASSIGNMENTS=2    ORCHESTRATOR_FALLBACK_S=2.0   ORCHESTRATOR_COALESCE_MS=50
+    """
+    def __init__(self, robot_api: RobotAPIService, task_client: AutoXingTaskClient) -> None:
+        self.enabled = os.getenv("AUTO_TICK_ENABLED", "0") == "1" and os.getenv("AUTO_TICK_MODE", "events").lower() != "http"
+        self.fallback_s = max(0.2, float(os.getenv("ORCHESTRATOR_FALLBACK_S", os.getenv("AUTO_TICK_INTERVAL_S", "2.0"))))
+        self.coalesce_s = max(0.0, float(os.getenv("ORCHESTRATOR_COALESCE_MS", "50")) / 1000.0)
+        self.max_assignments = int(os.getenv("AUTO_TICK_MAX_ASSIGNMENTS", "2"))
+        self.robot_api = robot_api
+        self.task_client = task_client
+
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Monotonic time of the oldest wakeup not yet served by a tick
+        self._pending_since: Optional[float] = None
+        self._pending_reasons: Counter = Counter()
+
+        self.wakeups = 0
+        self.coalesced = 0
+        self.ticks: Counter = Counter()  # "event" | "fallback"
+        self.assigned_total = 0
+        self.errors = 0
+        self.last_tick_ms: Optional[float] = None
+        self._latency_ms: Deque[float] = deque(maxlen=500)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("ORCHESTRATOR_LOOP disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        bus.add_listener(self._on_event)
+        busy_index.add_listener(self._on_run_finished)
+        fleet_state.add_listener(self._on_robot_available)
+        self._task = asyncio.create_task(self._run())
+        log.info(
+            "ORCHESTRATOR_LOOP enabled fallback=%.2fs coalesce=%.0fms max_assignments=%s",
+            self.fallback_s, self.coalesce_s * 1000.0, self.max_assignments,
+        )
+
+    async def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        bus.remove_listener(self._on_event)
+        busy_index.remove_listener(self._on_run_finished)
+        fleet_state.remove_listener(self._on_robot_available)
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except Exception:
+                pass
+
+    # ---- wake sources (any thread) ----
+    def wake(self, reason: str) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        def _apply() -> None:
+            self.wakeups += 1
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            else:
+                self.coalesced += 1
+            self._pending_reasons[reason] += 1
+            self._wake.set()
+
+        try:
+            if asyncio.get_running_loop() is loop:
+                _apply()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(_apply)
+
+    def _on_event(self, event: RealtimeEvent) -> None:
+        if event.source == "orchestrator" or _in_tick.get():
+            return
+        if event.type in _WAKE_EVENTS or event.type.startswith(_WAKE_PREFIXES):
+            self.wake(event.type)
+
+    def _on_run_finished(self, _robot_id: str, _run_id: Optional[int]) -> None:
+        self.wake("run.finished")
+
+    def _on_robot_available(self, _robot_id: str, _state: Any) -> None:
+        self.wake("robot.available")
+
+    # ---- loop ----
+    async def _tick(self, trigger: str) -> None:
+        t0 = time.monotonic()
+        since = self._pending_since
+        self._pending_since = None
+        self._pending_reasons.clear()
+        self.ticks[trigger] += 1
+        token = _in_tick.set(True)
+        try:
+            res = await OrchestratorService(self.robot_api, self.task_client).tick(max_assignments=self.max_assignments)
+        except Exception as e:
+            self.errors += 1
+            log.warning("orchestrator tick error (%s): %s", trigger, e)
+            return
+        finally:
+            _in_tick.reset(token)
+            self.last_tick_ms = round((time.monotonic() - t0) * 1000.0, 2)
+
+        assigned = int(res.get("assigned") or 0)
+        self.assigned_total += assigned
+        if assigned and since is not None:
+            self._latency_ms.append((time.monotonic() - since) * 1000.0)
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.fallback_s)
+                trigger = "event"
+            except asyncio.TimeoutError:
+                trigger = "fallback"
+            if self._stop.is_set():
+                break
+            if trigger == "event" and self.coalesce_s:
+                await asyncio.sleep(self.coalesce_s)  # let the rest of the burst arrive
+            self._wake.clear()
+            await self._tick(trigger)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = list(self._latency_ms)
+        return {
+            "enabled": self.enabled,
+            "fallback_s": self.fallback_s,
+            "coalesce_ms": round(self.coalesce_s * 1000.0, 1),
+            "wakeups": self.wakeups,
+            "coalesced": self.coalesced,
+            "ticks": dict(self.ticks),
+            "pending": dict(self._pending_reasons),
+            "assigned_total": self.assigned_total,
+            "errors": self.errors,
+            "last_tick_ms": self.last_tick_ms,
+            "trigger_to_assignment_ms": {
+                "samples": len(lat),
+                "p50": percentile(lat, 0.50),
+                "p95": percentile(lat, 0.95),
+                "max": round(max(lat), 2) if lat else None,
+            },
+        }
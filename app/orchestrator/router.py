@@ -2,19 +2,15 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, Request
 
-from ..persistence.db import get_session
+from ..auth_roles.deps import require_role
 from ..robot_api.router import get_robot_api_service
 from ..robot_api.service import RobotAPIService
 from ..workflow_engine.vendor_task_client import AutoXingTaskClient
 from ..workflow_engine.router import get_task_client
-from ..realtime_bus.bus import publish_event_nowait
 
-from ..queue_manager.service import QueueManagerService
-from ..assignment_engine.service import AssignmentEngineService
-from ..workflow_engine.service import WorkflowEngineService
+from .service import OrchestratorService, shards_snapshot, tick_flight, tick_metrics
 
 
 router = APIRouter(prefix="/orchestrator", tags=["orchestrator"])
@@ -24,34 +20,38 @@ router = APIRouter(prefix="/orchestrator", tags=["orchestrator"])
 async def tick(
     max_assignments: int = 5,
     preferred_robot_id: Optional[str] = None,
-    session: Session = Depends(get_session),
+    batch: bool = True,
+    policy: Optional[str] = None,
+    dry_run: bool = False,
     robot_api: RobotAPIService = Depends(get_robot_api_service),
     task_client: AutoXingTaskClient = Depends(get_task_client),
 ):
-    qm = QueueManagerService(session)
-    promoted = qm.tick_promote_due_tasks()
-
-    ae = AssignmentEngineService(session, robot_api, task_client)
-    assigned = 0
-    last_assign_result = None
-    for _ in range(max(0, int(max_assignments))):
-        res = await ae.assign_next(preferred_robot_id=preferred_robot_id, include_robot_state=False)
-        last_assign_result = res
-        if not res.get("assigned"):
-            break
-        assigned += 1
-
-    wf = WorkflowEngineService(session, robot_api, task_client)
-    wf_tick = await wf.tick()
-
-    payload = {
-        "promoted": promoted,
-        "assigned": assigned,
-        "workflow": wf_tick,
-    }
-
-    publish_event_nowait("orchestrator.ticked", payload, source="orchestrator")
-    if promoted or assigned or wf_tick.get("progressed_runs") or wf_tick.get("finished_runs") or wf_tick.get("failed_runs"):
-        publish_event_nowait("system.updated", {"reason": "orchestrator.tick"}, source="orchestrator")
-
-    return payload
+    # No request-scoped session: the pass opens its own (it may outlive this request)
+    svc = OrchestratorService(robot_api, task_client)
+    return await svc.tick(
+        max_assignments=max_assignments, preferred_robot_id=preferred_robot_id, batch=batch, policy=policy, dry_run=dry_run
+    )
+
+
+@router.get("/metrics", dependencies=[Depends(require_role("monitor"))])
+def metrics(reset: bool = False):
+    """
+    Per-phase tick timings (p50/p95/p99 over the last ORCHESTRATOR_METRICS_WINDOW
+    ticks, manual and loop-driven) plus the last tick's breakdown, and single-flight
+    counters (passes run vs callers coalesced onto another caller's pass).
+    """
+    out = {**tick_metrics.snapshot(), "single_flight": tick_flight.snapshot(), "shards": shards_snapshot()}
+    if reset:
+        tick_metrics.reset()
+    return out
+
+
+@router.get("/loop", dependencies=[Depends(require_role("monitor"))])
+def loop_stats(request: Request):
+    """
+    In-process orchestrator loop: wakeups, coalescing, trigger-to-assignment latency.
+    """
+    loop = getattr(request.app.state, "orchestrator_loop", None)
+    if loop is None:
+        return {"enabled": False}
+    return loop.snapshot()
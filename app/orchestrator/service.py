@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import Session, select
+
+from ..assignment_engine.robots import get_robot_ids
+from ..assignment_engine.service import AssignmentEngineService
+from ..common.single_flight import TickSingleFlight, tick_flight
+from ..common.timing import PhaseHistograms, PhaseTimer
+from ..common.vendor_resilience import PrefetchedTaskClient, prefetch_settings
+from ..persistence.db import engine, run_in_db
+from ..persistence.models import WorkflowRun, WorkflowRunStatus
+from ..queue_manager.service import UNZONED, QueueManagerService
+from ..realtime_bus.bus import publish_event_nowait
+from ..robot_api.service import RobotAPIService
+from ..robot_registry.service import robot_registry
+from ..workflow_engine.service import WorkflowEngineService
+from ..workflow_engine.vendor_task_client import AutoXingTaskClient
+
+
+# Rolling per-phase tick timings (GET /orchestrator/metrics)
+tick_metrics = PhaseHistograms(window=int(os.getenv("ORCHESTRATOR_METRICS_WINDOW", "500")))
+
+# Area-sharded mode: one single-flight per area, one for workflow progress
+_shard_flights: Dict[str, TickSingleFlight] = {}
+workflow_flight = TickSingleFlight()
+
+# Dry-run plans (dashboards polling every second share one read-only pass)
+plan_flight = TickSingleFlight()
+
+
+def sharding_enabled() -> bool:
+    return os.getenv("ORCHESTRATOR_SHARDING", "0") == "1"
+
+
+def shard_flight(area_id: str) -> TickSingleFlight:
+    flight = _shard_flights.get(area_id)
+    if flight is None:
+        flight = _shard_flights[area_id] = TickSingleFlight()
+    return flight
+
+
+def shard_areas() -> List[str]:
+    """
+    Areas with at least one enabled robot (registry home_area_id; UNZONED for none).
+    """
+    return sorted({robot_registry.area_of(rid) or UNZONED for rid in get_robot_ids()})
+
+
+# Label of the catch-all pass after the area shards (any idle robot, any task left)
+CATCH_ALL_SHARD = "other"
+
+
+def shard_label(area_id: Optional[str]) -> str:
+    if area_id is None:
+        return CATCH_ALL_SHARD
+    return area_id or "unzoned"
+
+
+def shards_snapshot() -> Dict[str, Any]:
+    return {
+        "enabled": sharding_enabled(),
+        "areas": [shard_label(a) for a in shard_areas()] + [CATCH_ALL_SHARD],
+        "flights": {shard_label(a): f.snapshot() for a, f in sorted(_shard_flights.items())},
+        "workflow": workflow_flight.snapshot(),
+    }
+
+
+class OrchestratorService:
+    """
+    One orchestration pass: promote due PENDING tasks, assign READY tasks to
+    free robots, advance running workflows. Shared by POST /orchestrator/tick
+    (manual) and the in-process OrchestratorLoop (event-driven).
+
+    Every pass is timed per phase (promote, queue_build, vendor_state,
+    workflow_start, reservations, vendor_task_state, workflow_tick) into `tick_metrics`; the
+    breakdown is returned and attached to orchestrator.ticked as "timings_ms".
+
+    Concurrent ticks are serialized and coalesced through `tick_flight`.
+
+    Every pass opens its own Session inside the single-flight task: the pass
+    outlives a cancelled or disconnected caller, so it never borrows a
+    request-scoped session. The orchestrator's own DB work on it goes through
+    run_in_db (directly or via the *_async / assign_many helpers), never inline
+    on the event loop.
+    WorkflowEngineService (start_run, tick) is outside this tree and does its
+    own DB access.
+
+    With ORCHESTRATOR_SHARDING=1 (batch ticks), tasks and robots are partitioned
+    by area (task target -> PoiMapping.area_id, robot -> registry home_area_id) and
+    every shard assigns concurrently on its own session behind its own
+    single-flight, so a slow vendor call in one area does not hold up another.
+    The whole sharded pass still runs inside `tick_flight`. After the area
+    shards, a catch-all pass ("other") lets any robot still idle take whatever
+    is left, so tasks in an area with no robot of its own (or unzoned tasks when
+    every robot has a home area) don't starve. max_assignments applies per
+    shard. Promotion (one UPDATE), reservations and workflow progress stay global.
+
+    Workflow progress: vendor task states of all RUNNING runs are fetched up front,
+    concurrently (WORKFLOW_POLL_CONCURRENCY) within a per-tick deadline
+    (WORKFLOW_POLL_DEADLINE_S), and handed to WorkflowEngineService.tick through a
+    PrefetchedTaskClient, so one slow vendor response no longer serializes the fleet.
+    Runs whose state missed the deadline are not polled again this tick: they see
+    their last known state, or a stale marker (stale_task_state) when there is none
+    yet, stay RUNNING until the next tick (see PrefetchedTaskClient) and are counted in
+    workflow.vendor_prefetch.skipped_deadline. The engine applies the results
+    as before; the prefetch does not change its transactions.
+
+    dry_run=True plans instead of acting: due promotions and the assignment plan
+    (predicted workflow starts) from a read-only snapshot, with no claims, no
+    start_run, no vendor calls and no events. A sharded plan runs the same shard
+    sequence as a sharded tick (areas, then the catch-all), and robots with no
+    cached state are not planned. Dry runs are not recorded in `tick_metrics`;
+    their timings come back in the response.
+    """
+    def __init__(self, robot_api: RobotAPIService, task_client: AutoXingTaskClient):
+        self.robot_api = robot_api
+        self.task_client = task_client
+
+    async def tick(
+        self,
+        max_assignments: int = 5,
+        preferred_robot_id: Optional[str] = None,
+        batch: bool = True,
+        policy: Optional[str] = None,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        if dry_run:
+            return await plan_flight.run(
+                (int(max_assignments), preferred_robot_id, policy),
+                lambda: self._in_session(
+                    lambda session: self._plan(session, max_assignments, preferred_robot_id=preferred_robot_id, policy=policy)
+                ),
+            )
+        key = (int(max_assignments), preferred_robot_id, bool(batch), policy)
+        if batch and sharding_enabled():
+            return await tick_flight.run(
+                ("sharded",) + key,
+                lambda: self._in_session(
+                    lambda session: self._tick_sharded(session, max_assignments, preferred_robot_id=preferred_robot_id, policy=policy)
+                ),
+            )
+        return await tick_flight.run(
+            key,
+            lambda: self._in_session(
+                lambda session: self._tick(session, max_assignments, preferred_robot_id=preferred_robot_id, batch=batch, policy=policy)
+            ),
+        )
+
+    @staticmethod
+    async def _in_session(fn: Callable[[Session], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        # Called inside the pass task, so the session lives exactly as long as the pass
+        with Session(engine) as session:
+            return await fn(session)
+
+    async def _tick(
+        self,
+        session: Session,
+        max_assignments: int,
+        preferred_robot_id: Optional[str] = None,
+        batch: bool = True,
+        policy: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        timer = PhaseTimer()
+        qm = QueueManagerService(session)
+        with timer.phase("promote"):
+            promoted = await qm.tick_promote_due_tasks_async()
+
+        ae = AssignmentEngineService(session, self.robot_api, self.task_client)
+        assigned = 0
+        if batch:
+            # One snapshot of queue + fleet per tick (see AssignmentEngineService.assign_many)
+            res = await ae.assign_many(
+                max_assignments=max_assignments, preferred_robot_id=preferred_robot_id, policy=policy, timer=timer
+            )
+            assigned = int(res.get("assigned") or 0)
+            for a in res.get("assignments", []):
+                publish_event_nowait("assignment.made", {"assigned": True, **a}, source="assignment-engine")
+        else:
+            with timer.phase("assign_next"):
+                for _ in range(max(0, int(max_assignments))):
+                    res = await ae.assign_next(preferred_robot_id=preferred_robot_id, include_robot_state=False)
+                    if not res.get("assigned"):
+                        break
+                    assigned += 1
+
+        wf_tick = await self._workflow_tick(session, timer)
+
+        return self._finish(timer, {"promoted": promoted, "assigned": assigned, "workflow": wf_tick})
+
+    @staticmethod
+    def _running_vendor_task_ids(session: Session) -> List[str]:
+        stmt = (
+            select(WorkflowRun.current_vendor_task_id)
+            .where(WorkflowRun.status == WorkflowRunStatus.RUNNING)
+            .where(WorkflowRun.current_vendor_task_id.is_not(None))
+        )
+        return [str(x) for x in session.exec(stmt).all()]
+
+    async def _workflow_tick(self, session: Session, timer: PhaseTimer) -> Dict[str, Any]:
+        cfg = prefetch_settings()
+        client: Any = self.task_client
+        prefetch: Optional[Dict[str, Any]] = None
+        if cfg["enabled"]:
+            with timer.phase("vendor_task_state"):
+                ids = await run_in_db(self._running_vendor_task_ids, session)
+                client = PrefetchedTaskClient(self.task_client)
+                prefetch = await client.prefetch(ids, cfg["concurrency"], cfg["deadline_s"])
+
+        wf = WorkflowEngineService(session, self.robot_api, client)
+        with timer.phase("workflow_tick"):
+            wf_tick = await wf.tick()
+        if prefetch is not None:
+            wf_tick = {**wf_tick, "vendor_prefetch": prefetch}
+        return wf_tick
+
+    async def _assign_shard(
+        self,
+        area_id: Optional[str],
+        max_assignments: int,
+        preferred_robot_id: Optional[str],
+        policy: Optional[str],
+        dry_run: bool = False,
+        already_planned: Sequence[Tuple[int, str]] = (),
+    ) -> Dict[str, Any]:
+        timer = PhaseTimer()
+        # Own session: shards run their DB work concurrently on the DB executor
+        with Session(engine) as session:
+            ae = AssignmentEngineService(session, self.robot_api, self.task_client, area_id=area_id)
+            res = await ae.assign_many(
+                max_assignments=max_assignments,
+                preferred_robot_id=preferred_robot_id,
+                policy=policy,
+                timer=timer,
+                dry_run=dry_run,
+                already_planned=already_planned,
+            )
+        return {**res, "timings_ms": timer.breakdown()}
+
+    async def _run_shards(
+        self,
+        max_assignments: int,
+        preferred_robot_id: Optional[str],
+        policy: Optional[str],
+        dry_run: bool = False,
+    ) -> Tuple[List[Optional[str]], List[Any]]:
+        """
+        The sharded assignment sequence, shared by ticks and dry-run plans: every
+        area shard concurrently, then the catch-all pass over what they left.
+        Returns (areas + [None], results); a failed shard's result is its exception.
+        A dry run claims nothing, so the catch-all is told what the areas planned.
+        """
+        areas: List[Optional[str]] = list(shard_areas())
+        key = (int(max_assignments), preferred_robot_id, policy)
+
+        def area_pass(area: Optional[str]) -> Awaitable[Dict[str, Any]]:
+            if dry_run:
+                # Plans are read-only: they don't queue behind (or coalesce with) a live shard pass
+                return self._assign_shard(area, max_assignments, preferred_robot_id, policy, dry_run=True)
+            return shard_flight(area).run(key, lambda: self._assign_shard(area, max_assignments, preferred_robot_id, policy))
+
+        results: List[Any] = list(await asyncio.gather(*[area_pass(area) for area in areas], return_exceptions=True))
+
+        # Catch-all: unfiltered pass over the robots the area shards left idle
+        planned = [
+            (int(p["task_id"]), str(p["robot_id"]))
+            for res in results
+            if not isinstance(res, BaseException)
+            for p in res.get("plan", [])
+        ]
+        try:
+            catch_all: Any = await self._assign_shard(
+                None, max_assignments, preferred_robot_id, policy, dry_run=dry_run, already_planned=planned
+            )
+        except Exception as e:
+            catch_all = e
+        return areas + [None], results + [catch_all]
+
+    async def _tick_sharded(
+        self,
+        session: Session,
+        max_assignments: int,
+        preferred_robot_id: Optional[str] = None,
+        policy: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        timer = PhaseTimer()
+        with timer.phase("promote"):
+            promoted = await QueueManagerService(session).tick_promote_due_tasks_async()
+        with timer.phase("reservations"):
+            # Area shards leave reservations alone; free stale ones before any shard plans
+            await AssignmentEngineService(session, self.robot_api, self.task_client).release_stale_reservations()
+
+        with timer.phase("shards"):
+            areas, results = await self._run_shards(max_assignments, preferred_robot_id, policy)
+        catch_all = results[-1]
+
+        assigned = 0
+        robots: List[str] = []
+        shards: Dict[str, Any] = {}
+        for area, res in zip(areas, results):
+            label = shard_label(area)
+            if isinstance(res, BaseException):
+                shards[label] = {"assigned": 0, "error": str(res)}
+                continue
+            shards[label] = {"assigned": res.get("assigned", 0), "message": res.get("message"), "timings_ms": res.get("timings_ms")}
+            if res.get("coalesced"):
+                # Another caller's pass: its assignments were already published
+                continue
+            assigned += int(res.get("assigned") or 0)
+            for a in res.get("assignments", []):
+                robots.append(a["robot_id"])
+                publish_event_nowait("assignment.made", {"assigned": True, "area_id": area or None, **a}, source="assignment-engine")
+
+        # The unfiltered catch-all pass rebalances reservations on its way out (see assign_many)
+        reservations = None if isinstance(catch_all, BaseException) else catch_all.get("reservations")
+        if reservations is None:
+            ae = AssignmentEngineService(session, self.robot_api, self.task_client)
+            with timer.phase("reservations"):
+                reservations = await ae.rebalance_reservations(robots)
+
+        wf_tick = await workflow_flight.run(
+            (), lambda: self._in_session(lambda wf_session: self._workflow_tick(wf_session, timer))
+        )
+
+        for label, sh in shards.items():
+            if sh.get("timings_ms"):
+                timer.phases[f"shard.{label}"] = sh["timings_ms"]["total"]
+        return self._finish(
+            timer,
+            {"promoted": promoted, "assigned": assigned, "workflow": wf_tick, "reservations": reservations, "shards": shards},
+        )
+
+    async def _plan(
+        self,
+        session: Session,
+        max_assignments: int,
+        preferred_robot_id: Optional[str] = None,
+        policy: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        timer = PhaseTimer()
+        with timer.phase("promote"):
+            due = await run_in_db(QueueManagerService(session).due_task_ids)
+
+        shards: Optional[Dict[str, Any]] = None
+        if sharding_enabled():
+            with timer.phase("shards"):
+                areas, results = await self._run_shards(max_assignments, preferred_robot_id, policy, dry_run=True)
+            plan: List[Dict[str, Any]] = []
+            skipped: Dict[str, str] = {}
+            held: set = set()
+            stale: List[str] = []
+            shards = {}
+            for area, res in zip(areas, results):
+                label = shard_label(area)
+                if isinstance(res, BaseException):
+                    shards[label] = {"planned": 0, "error": str(res)}
+                    continue
+                plan += [{**p, "area_id": area or None} for p in res.get("plan", [])]
+                for rid, reason in (res.get("skipped_robots") or {}).items():
+                    # First pass's reason wins (the catch-all sees area robots as busy)
+                    skipped.setdefault(rid, reason)
+                held |= set(res.get("held_for_batching") or [])
+                stale += [rid for rid in res.get("stale_state_robots") or [] if rid not in stale]
+                shards[label] = {"planned": res.get("planned", 0), "message": res.get("message"), "timings_ms": res.get("timings_ms")}
+                timer.phases[f"shard.{label}"] = res["timings_ms"]["total"]
+            planned_robots = {p["robot_id"] for p in plan}
+            skipped = {rid: reason for rid, reason in skipped.items() if rid not in planned_robots}
+            res = {"plan": plan, "skipped_robots": skipped, "held_for_batching": sorted(held), "stale_state_robots": stale}
+        else:
+            ae = AssignmentEngineService(session, self.robot_api, self.task_client)
+            res = await ae.assign_many(
+                max_assignments=max_assignments, preferred_robot_id=preferred_robot_id, policy=policy, timer=timer, dry_run=True
+            )
+
+        return {
+            "dry_run": True,
+            "would_promote": len(due),
+            "promote_task_ids": due,
+            "planned": len(res.get("plan", [])),
+            "plan": res.get("plan", []),
+            "skipped_robots": res.get("skipped_robots"),
+            "held_for_batching": res.get("held_for_batching"),
+            "stale_state_robots": res.get("stale_state_robots"),
+            "shards": shards,
+            "message": res.get("message"),
+            "timings_ms": timer.breakdown(),
+        }
+
+    def _finish(self, timer: PhaseTimer, payload: Dict[str, Any]) -> Dict[str, Any]:
+        timings = timer.breakdown()
+        tick_metrics.record(timings)
+        payload["timings_ms"] = timings
+
+        wf_tick = payload["workflow"]
+        publish_event_nowait("orchestrator.ticked", payload, source="orchestrator")
+        if (
+            payload["promoted"]
+            or payload["assigned"]
+            or wf_tick.get("progressed_runs")
+            or wf_tick.get("finished_runs")
+            or wf_tick.get("failed_runs")
+        ):
+            publish_event_nowait("system.updated", {"reason": "orchestrator.tick"}, source="orchestrator")
+
+        return payload
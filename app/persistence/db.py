@@ -1,24 +1,227 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import logging
 import os
-from typing import Generator
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, TypeVar
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlmodel import Session, SQLModel, create_engine
 
+from .migrations import current_version, explain_hot_queries, run_migrations
+
+log = logging.getLogger("db")
+
 # SQLite by default (file in project root)
 DB_URL = os.getenv("DB_URL", "sqlite:///./robot_backend.db")
 
-# For SQLite, check_same_thread must be False when used in web apps
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
+# Storage profile:
+#   - "production": WAL + tuned pragmas so dashboard reads don't block behind tick writes
+#   - "legacy": bare engine (rollback journal), kept for comparison / troubleshooting
+DB_PROFILE = os.getenv("DB_PROFILE", "production").strip().lower()
+
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "legacy": {
+        "pragmas": {},
+        "pool": {},
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,  # ms
+            "mmap_size": 268435456,  # 256 MiB
+            "cache_size": -65536,  # negative = KiB (64 MiB)
+            "temp_store": "MEMORY",
+        },
+        "pool": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "pool_pre_ping": True,
+        },
+    },
+}
+
+# engine -> profile name (Engine has no user info dict)
+_ENGINE_PROFILES: "weakref.WeakKeyDictionary[Engine, str]" = weakref.WeakKeyDictionary()
+
+
+def _profile_settings(profile: str) -> Dict[str, Any]:
+    base = STORAGE_PROFILES.get(profile)
+    if base is None:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r} (expected one of {sorted(STORAGE_PROFILES)})")
+
+    pragmas = dict(base["pragmas"])
+    pool = dict(base["pool"])
+
+    # Optional env overrides (only apply to profiles that set the key)
+    for env_name, key in (
+        ("DB_BUSY_TIMEOUT_MS", "busy_timeout"),
+        ("DB_MMAP_SIZE", "mmap_size"),
+        ("DB_CACHE_SIZE", "cache_size"),
+    ):
+        val = os.getenv(env_name)
+        if val and key in pragmas:
+            pragmas[key] = int(val)
+    if os.getenv("DB_SYNCHRONOUS") and "synchronous" in pragmas:
+        pragmas["synchronous"] = os.getenv("DB_SYNCHRONOUS", "").strip().upper()
+
+    for env_name, key in (("DB_POOL_SIZE", "pool_size"), ("DB_MAX_OVERFLOW", "max_overflow")):
+        val = os.getenv(env_name)
+        if val and key in pool:
+            pool[key] = int(val)
+
+    return {"pragmas": pragmas, "pool": pool}
+
+
+def _apply_pragmas(dbapi_conn: Any, pragmas: Dict[str, Any]) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        for key, value in pragmas.items():
+            cur.execute(f"PRAGMA {key}={value}")
+    finally:
+        cur.close()
+
+
+def make_engine(db_url: str = DB_URL, profile: str = DB_PROFILE) -> Engine:
+    """
+    Build an engine for the given storage profile.
+    Pragmas are applied on every new DBAPI connection (they are per-connection in SQLite).
+    """
+    is_sqlite = db_url.startswith("sqlite")
+    settings = _profile_settings(profile)
+
+    # For SQLite, check_same_thread must be False when used in web apps
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+
+    kwargs: Dict[str, Any] = {}
+    in_memory = is_sqlite and (db_url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in db_url)
+    if not in_memory:
+        kwargs.update(settings["pool"])
+
+    eng = create_engine(db_url, echo=False, connect_args=connect_args, **kwargs)
+
+    if is_sqlite and settings["pragmas"]:
+        pragmas = settings["pragmas"]
+
+        @event.listens_for(eng, "connect")
+        def _on_connect(dbapi_conn, _record):
+            _apply_pragmas(dbapi_conn, pragmas)
+
+    _ENGINE_PROFILES[eng] = profile
+    return eng
+
+
+engine = make_engine()
+
 
-engine = create_engine(DB_URL, echo=False, connect_args=connect_args)
+def storage_settings(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    """
+    Report the settings actually in effect (read back from the DB, not from config).
+    """
+    eng = eng or engine
+    out: Dict[str, Any] = {"profile": _ENGINE_PROFILES.get(eng, DB_PROFILE), "dialect": eng.dialect.name}
+
+    pool = eng.pool
+    out["pool"] = {
+        "class": type(pool).__name__,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+    }
+
+    if eng.dialect.name == "sqlite":
+        pragmas: Dict[str, Any] = {}
+        with eng.connect() as conn:
+            for key in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "temp_store"):
+                pragmas[key] = conn.exec_driver_sql(f"PRAGMA {key}").scalar()
+        out["pragmas"] = pragmas
+
+    return out
 
 
 def init_db() -> None:
-    """Create all tables (simple v0 approach; later you can add migrations)."""
+    """
+    Create missing tables, then apply pending versioned migrations
+    (indexes/columns that create_all won't add to an existing DB).
+    """
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+    for plan in explain_hot_queries(engine):
+        if not plan["ok"]:
+            log.warning("hot query %s is not index-backed: %s", plan["name"], plan["plan"])
+
+
+def migration_status(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    eng = eng or engine
+    return {"version": current_version(eng), "query_plans": explain_hot_queries(eng)}
 
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
+
+
+# ----------------------------
+# Async access (thread-offloaded)
+# ----------------------------
+T = TypeVar("T")
+
+# Dedicated pool so DB work never competes with Starlette's default threadpool,
+# and is bounded below the connection pool size.
+DB_ASYNC_WORKERS = int(os.getenv("DB_ASYNC_WORKERS", "8"))
+_db_executor = ThreadPoolExecutor(max_workers=max(1, DB_ASYNC_WORKERS), thread_name_prefix="db")
+
+
+async def run_in_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run blocking DB work on the DB executor so async routes don't freeze the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncSession:
+    """
+    Async facade over a sync Session.
+    Every call is offloaded to the DB executor; calls are awaited one at a time,
+    so the underlying Session is never used by two threads concurrently.
+    Mirrors SQLAlchemy's AsyncSession.run_sync() so swapping in aiosqlite later is mechanical.
+    """
+    def __init__(self, sync_session: Session) -> None:
+        self.sync_session = sync_session
+
+    async def run_sync(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_db(fn, self.sync_session, *args, **kwargs)
+
+    async def exec_all(self, statement: Any) -> List[Any]:
+        return await run_in_db(lambda: list(self.sync_session.exec(statement).all()))
+
+    async def exec_first(self, statement: Any) -> Any:
+        return await run_in_db(lambda: self.sync_session.exec(statement).first())
+
+    async def get(self, model: Any, ident: Any) -> Any:
+        return await run_in_db(self.sync_session.get, model, ident)
+
+    def add(self, obj: Any) -> None:
+        self.sync_session.add(obj)
+
+    async def commit(self) -> None:
+        await run_in_db(self.sync_session.commit)
+
+    async def close(self) -> None:
+        await run_in_db(self.sync_session.close)
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    session = AsyncSession(Session(engine))
+    try:
+        yield session
+    finally:
+        await session.close()
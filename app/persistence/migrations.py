@@ -0,0 +1,382 @@
+﻿from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Field, SQLModel
+
+
+log = logging.getLogger("migrations")
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class SchemaMigration(SQLModel, table=True):
+    """
+    One row per applied migration (forward-only).
+    """
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=utc_now)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _create_indexes(*names: str) -> Callable[[Connection], None]:
+    """
+    Create named indexes from the model metadata (single source of truth).
+    checkfirst makes this safe on fresh DBs where create_all already built them.
+    """
+    def _apply(conn: Connection) -> None:
+        wanted = set(names)
+        for table in SQLModel.metadata.sorted_tables:
+            for idx in table.indexes:
+                if idx.name in wanted:
+                    idx.create(conn, checkfirst=True)
+                    wanted.discard(idx.name)
+        if wanted:
+            raise RuntimeError(f"Index definitions missing from models: {sorted(wanted)}")
+    return _apply
+
+
+def _rebuild_indexes(*names: str) -> Callable[[Connection], None]:
+    """
+    Drop and recreate named indexes whose definition changed in the models
+    (CREATE INDEX IF NOT EXISTS would keep the old shape).
+    """
+    def _apply(conn: Connection) -> None:
+        for name in names:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        _create_indexes(*names)(conn)
+    return _apply
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    # No-op on fresh DBs where create_all already built the column
+    cols = {c["name"] for c in sa_inspect(conn).get_columns(table)}
+    if column not in cols:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _task_rank_key(conn: Connection) -> None:
+    """
+    Add Task.rank_key (if create_all didn't), backfill it from type/override/created_at,
+    then build the READY-queue index on it.
+    """
+    from ..queue_manager.ranking import rank_key_for
+
+    _add_column(conn, "task", "rank_key", "FLOAT NOT NULL DEFAULT 0")
+
+    rows = conn.exec_driver_sql(
+        "SELECT t.id, t.task_type, t.created_at, COALESCE(o.override, 0) "
+        "FROM task t LEFT JOIN taskpriorityoverride o ON o.task_id = t.id"
+    ).all()
+    params = []
+    for task_id, task_type, created_at, override in rows:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        params.append({"id": task_id, "rk": rank_key_for(task_type, created_at, int(override or 0))})
+    if params:
+        conn.execute(text("UPDATE task SET rank_key = :rk WHERE id = :id"), params)
+
+    _create_indexes("ix_task_ready_rank")(conn)
+
+
+# Per-row triggers: every INSERT / status change / DELETE on task adjusts
+# taskstatuscount in the same transaction (covers ORM, bulk and set-based writes).
+# Archived tasks keep counting: ArchiveService copies a row into taskarchive
+# before deleting it, so that delete leaves the counters alone.
+_TASK_COUNT_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_task_count_insert AFTER INSERT ON task
+    BEGIN
+        INSERT INTO taskstatuscount (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_task_count_update AFTER UPDATE OF status ON task
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE taskstatuscount SET count = count - 1 WHERE status = OLD.status;
+        INSERT INTO taskstatuscount (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_task_count_delete AFTER DELETE ON task
+    WHEN NOT EXISTS (SELECT 1 FROM taskarchive WHERE id = OLD.id)
+    BEGIN
+        UPDATE taskstatuscount SET count = count - 1 WHERE status = OLD.status;
+    END
+    """,
+)
+
+TASK_COUNT_RESEED_SQL = (
+    "DELETE FROM taskstatuscount",
+    "INSERT INTO taskstatuscount (status, count) SELECT status, COUNT(*) FROM "
+    "(SELECT status FROM task UNION ALL SELECT status FROM taskarchive) GROUP BY status",
+)
+
+
+def task_counters_supported(engine_or_conn: Any) -> bool:
+    return engine_or_conn.dialect.name == "sqlite"
+
+
+def _task_status_counters(conn: Connection) -> None:
+    from ..archive.models import TaskArchive
+    from .models import TaskStatusCount
+
+    TaskStatusCount.__table__.create(conn, checkfirst=True)
+    TaskArchive.__table__.create(conn, checkfirst=True)
+    if not task_counters_supported(conn):
+        return
+    for ddl in _TASK_COUNT_TRIGGERS:
+        conn.exec_driver_sql(ddl)
+    for sql in TASK_COUNT_RESEED_SQL:
+        conn.exec_driver_sql(sql)
+
+
+def _task_counters_keep_archived(conn: Connection) -> None:
+    # Recreate the delete trigger with its archive guard, then reseed live + archived
+    if task_counters_supported(conn):
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS trg_task_count_delete")
+    _task_status_counters(conn)
+
+
+def _task_reservations(conn: Connection) -> None:
+    _add_column(conn, "task", "reserved_robot_id", "VARCHAR")
+    _create_indexes("ix_task_reserved_robot_id")(conn)
+
+
+def _autoincrement_ids(conn: Connection) -> None:
+    """
+    Rebuild task / workflowrun as AUTOINCREMENT tables (SQLite reuses the max
+    rowid otherwise, so a new task could take an archived task's id) and start
+    their sequences past every id already in the archive.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    from ..archive.models import TaskArchive, WorkflowRunArchive
+    from .models import Task, WorkflowRun
+
+    for model, archive in ((Task, TaskArchive), (WorkflowRun, WorkflowRunArchive)):
+        table = model.__table__
+        name = table.name
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).scalar()
+        if ddl is not None and "AUTOINCREMENT" not in ddl.upper():
+            # Indexes/triggers follow a renamed table: drop them, rebuild from the models
+            for (obj_type, obj_name) in conn.exec_driver_sql(
+                "SELECT type, name FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                (name,),
+            ).all():
+                conn.exec_driver_sql(f"DROP {obj_type.upper()} {obj_name}")
+            old = f"_{name}_old"
+            conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {old}")
+            table.create(conn)
+            have = {c["name"] for c in sa_inspect(conn).get_columns(old)}
+            cols = ", ".join(c.name for c in table.columns if c.name in have)
+            conn.exec_driver_sql(f"INSERT INTO {name} ({cols}) SELECT {cols} FROM {old}")
+            conn.exec_driver_sql(f"DROP TABLE {old}")
+            if name == Task.__tablename__ and task_counters_supported(conn):
+                for trigger in _TASK_COUNT_TRIGGERS:
+                    conn.exec_driver_sql(trigger)
+
+        archive_tbl = archive.__table__
+        archive_tbl.create(conn, checkfirst=True)
+        floor = conn.exec_driver_sql(
+            f"SELECT MAX(COALESCE((SELECT MAX(id) FROM {name}), 0), COALESCE((SELECT MAX(id) FROM {archive_tbl.name}), 0))"
+        ).scalar()
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, int(floor or 0)))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "hot_query_indexes",
+        _create_indexes(
+            "ix_task_status_robot",
+            "ix_task_ready_unassigned",
+            "ix_task_pending_release",
+            "ix_workflowrun_robot_status",
+            "ix_workflowrun_task_created",
+            "ix_workflowstep_run_step",
+        ),
+    ),
+    Migration(2, "task_rank_key", _task_rank_key),
+    Migration(3, "task_status_counters", _task_status_counters),
+    Migration(4, "task_reservations", _task_reservations),
+    Migration(5, "autoincrement_ids", _autoincrement_ids),
+    Migration(6, "task_ready_rank_composite", _rebuild_indexes("ix_task_ready_rank")),
+    Migration(7, "task_pending_release_composite", _rebuild_indexes("ix_task_pending_release")),
+    Migration(8, "task_counters_keep_archived", _task_counters_keep_archived),
+]
+
+
+def current_version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        SchemaMigration.__table__.create(conn, checkfirst=True)
+        conn.commit()
+        v = conn.exec_driver_sql("SELECT MAX(version) FROM schemamigration").scalar()
+    return int(v or 0)
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Apply pending migrations in version order, each in its own transaction.
+    Returns the versions applied in this call.
+    """
+    applied_now: List[int] = []
+    have = current_version(engine)
+
+    for m in sorted(MIGRATIONS, key=lambda x: x.version):
+        if m.version <= have:
+            continue
+        with engine.begin() as conn:
+            m.apply(conn)
+            conn.execute(
+                SchemaMigration.__table__.insert().values(version=m.version, name=m.name, applied_at=utc_now())
+            )
+        log.info("migration applied version=%s name=%s", m.version, m.name)
+        applied_now.append(m.version)
+
+    return applied_now
+
+
+# ----------------------------
+# Query-plan checks for the hot paths
+# ----------------------------
+def _ready_page() -> Any:
+    from ..queue_manager.service import QueueManagerService
+
+    return QueueManagerService.ready_page_stmt(
+        ("task_id", "task_type", "operator_override", "effective_priority"), limit=50
+    )
+
+
+def _ready_page_cursor() -> Any:
+    from ..queue_manager.service import QueueManagerService, encode_cursor
+
+    return QueueManagerService.ready_page_stmt(
+        ("task_id", "task_type"), limit=50, cursor=encode_cursor(0.0, utc_now(), 1)
+    )
+
+
+def _ready_page_claimable_in_area() -> Any:
+    from ..queue_manager.service import QueueManagerService
+
+    return QueueManagerService.ready_page_stmt(
+        ("task_id", "task_type"), limit=50, for_robot="robot", unreserved_only=True, area_id="area"
+    )
+
+
+def _ready_head() -> Any:
+    from ..queue_manager.service import QueueManagerService
+
+    return QueueManagerService.ready_head_stmt("robot")
+
+
+def _promote_due() -> Any:
+    from ..queue_manager.service import QueueManagerService
+
+    return QueueManagerService.promote_due_stmt(utc_now())
+
+
+def _claim() -> Any:
+    from ..assignment_engine.busy_index import claim_task_stmt
+
+    # except_created_by as the assignment engine passes it (PREPOSITION_CREATOR)
+    return claim_task_stmt(1, "robot", utc_now(), except_created_by="prepositioner")
+
+
+# name -> table + the statement the services issue (built by the service code
+# itself, bound parameters included), or raw SQL for paths outside this tree.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    {"name": "ready_queue", "table": "task", "stmt": _ready_page},
+    {"name": "ready_queue_cursor", "table": "task", "stmt": _ready_page_cursor},
+    {"name": "ready_queue_claimable_area", "table": "task", "stmt": _ready_page_claimable_in_area},
+    {"name": "ready_head", "table": "task", "stmt": _ready_head},
+    {"name": "pending_due", "table": "task", "stmt": _promote_due},
+    {"name": "claim", "table": "task", "stmt": _claim},
+    {
+        "name": "robot_busy",
+        "table": "workflowrun",
+        "sql": "SELECT id FROM workflowrun WHERE robot_id = ? AND status = 'RUNNING' LIMIT 1",
+        "params": ("robot",),
+    },
+    {
+        "name": "run_steps",
+        "table": "workflowstep",
+        "sql": "SELECT id FROM workflowstep WHERE run_id = ? ORDER BY step_index",
+        "params": (1,),
+    },
+    {
+        "name": "first_run_per_task",
+        "table": "workflowrun",
+        "sql": "SELECT task_id, created_at FROM workflowrun WHERE task_id IN (?, ?) ORDER BY created_at",
+        "params": (1, 2),
+        # sorts only the runs of one dashboard page of tasks
+        "sort_ok": True,
+    },
+]
+
+
+def _plan_uses_index(details: List[str], table: str, sort_ok: bool = False) -> bool:
+    """
+    OK when the target table is reached through a seek (index or rowid): no SCAN
+    of any table (covering-index scans included) and, unless `sort_ok`, no temp
+    b-tree sort.
+    """
+    if any(d.startswith("SCAN") for d in details):
+        return False
+    if not sort_ok and any("TEMP B-TREE" in d for d in details):
+        return False
+    return any(d.startswith(f"SEARCH {table} ") for d in details)
+
+
+def _explain(conn: Connection, stmt: Any) -> List[str]:
+    # Execute the compiled statement with its own binds, prefixed with
+    # EXPLAIN QUERY PLAN at the cursor (nothing is written for UPDATEs).
+    def _prefix(_conn: Any, _cursor: Any, statement: str, parameters: Any, _ctx: Any, _many: bool) -> Any:
+        return "EXPLAIN QUERY PLAN " + statement, parameters
+
+    event.listen(conn, "before_cursor_execute", _prefix, retval=True)
+    try:
+        # Raw cursor rows: the statement's own result processors don't fit plan rows
+        rows = conn.execute(stmt).cursor.fetchall()
+    finally:
+        event.remove(conn, "before_cursor_execute", _prefix)
+    return [str(r[-1]) for r in rows]
+
+
+def explain_hot_queries(engine: Engine, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Run EXPLAIN QUERY PLAN for each hot query (SQLite only) and flag full scans / sorts.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+
+    out: List[Dict[str, Any]] = []
+    with engine.connect() as conn:
+        for q in HOT_QUERIES:
+            if names and q["name"] not in names:
+                continue
+            if "stmt" in q:
+                details = _explain(conn, q["stmt"]())
+            else:
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + q["sql"], q["params"]).all()
+                details = [str(r[-1]) for r in rows]
+            out.append({"name": q["name"], "plan": details, "ok": _plan_uses_index(details, q["table"], q.get("sort_ok", False))})
+    return out
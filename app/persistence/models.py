@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Optional
 
 from sqlmodel import SQLModel, Field
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint, text
 
 
 def utc_now() -> datetime:
@@ -30,6 +30,33 @@ class TaskType(str, Enum):
 
 
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        # get_ready_queue / assignments: status + robot filter
+        Index("ix_task_status_robot", "status", "assigned_robot_id"),
+        # READY + unassigned queue (partial: only the live queue is indexed)
+        Index(
+            "ix_task_ready_unassigned",
+            "created_at",
+            sqlite_where=text("status = 'READY' AND assigned_robot_id IS NULL"),
+            postgresql_where=text("status = 'READY' AND assigned_robot_id IS NULL"),
+        ),
+        # READY queue in effective-priority order (see queue_manager/ranking.py).
+        # Not partial: the services bind status as a parameter, which never matches
+        # a `status = 'READY'` index predicate, so the status/robot columns lead instead.
+        Index(
+            "ix_task_ready_rank",
+            "status",
+            "assigned_robot_id",
+            text("rank_key DESC"),
+            "created_at",
+            "id",
+        ),
+        # due-release lookup for PENDING tasks (status bound as a parameter, so not partial)
+        Index("ix_task_pending_release", "status", "release_at"),
+        # AUTOINCREMENT: ids of archived (deleted) tasks are never handed out again
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     created_at: datetime = Field(default_factory=utc_now, index=True)
@@ -52,6 +79,22 @@ class Task(SQLModel, table=True):
 
     created_by: Optional[str] = Field(default="operator")
 
+    # Lookahead: READY task held for a busy robot (assignment_engine/reservations.py)
+    reserved_robot_id: Optional[str] = Field(default=None, index=True)
+
+    # Time-invariant queue order: base_priority + override - created_at/600s
+    # Maintained by queue_manager.ranking + PriorityService; never set by hand.
+    rank_key: float = Field(default=0.0)
+
+
+class TaskStatusCount(SQLModel, table=True):
+    """
+    Live task count per status, kept in step with the task table by DB triggers
+    (see migrations: task_status_counters) and reconciled periodically.
+    """
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
 
 class RobotPOICache(SQLModel, table=True):
     __table_args__ = (UniqueConstraint("robot_id", "poi_id", name="uix_robot_poi"),)
@@ -91,6 +134,15 @@ class WorkflowStepType(str, Enum):
 
 
 class WorkflowRun(SQLModel, table=True):
+    __table_args__ = (
+        # _is_robot_busy: robot + status
+        Index("ix_workflowrun_robot_status", "robot_id", "status"),
+        # dashboard: first run per task (started_at)
+        Index("ix_workflowrun_task_created", "task_id", "created_at"),
+        # AUTOINCREMENT: archive history joins runs by task_id and steps by run_id
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     created_at: datetime = Field(default_factory=utc_now, index=True)
@@ -109,6 +161,11 @@ class WorkflowRun(SQLModel, table=True):
 
 
 class WorkflowStep(SQLModel, table=True):
+    __table_args__ = (
+        # dashboard / engine: steps of a run in order
+        Index("ix_workflowstep_run_step", "run_id", "step_index"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     run_id: int = Field(index=True)
@@ -135,3 +192,31 @@ class WorkflowStep(SQLModel, table=True):
     decision_payload: Optional[str] = None  # JSON string (simple v0 storage)
 
     label: Optional[str] = None
+
+
+class TripBatchStatus(str, Enum):
+    ACTIVE = "ACTIVE"
+    DONE = "DONE"
+    ABORTED = "ABORTED"
+
+
+class TripBatch(SQLModel, table=True):
+    """
+    Multi-stop trip: one WorkflowRun (for the primary task) carrying extra
+    stops for nearby same-type tasks (assignment_engine/trip_batching.py).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    created_at: datetime = Field(default_factory=utc_now, index=True)
+    closed_at: Optional[datetime] = Field(default=None, index=True)
+
+    run_id: int = Field(index=True)
+    robot_id: str = Field(index=True)
+    task_type: TaskType = Field(index=True)
+
+    # Trip order, primary first (comma-separated task ids)
+    task_ids: str = Field(default="")
+
+    status: TripBatchStatus = Field(default=TripBatchStatus.ACTIVE, index=True)
+    # Kitchen round trips avoided (stops - 1) once the trip completes
+    trips_saved: int = Field(default=0)
@@ -72,7 +72,7 @@ class PoiCachePoller:
 
                     with Session(engine) as session:
                         svc = PoiCacheService(session)
-                        result = svc.update_robot_pois(rid, poi_dicts)
+                        result = await svc.update_robot_pois_async(rid, poi_dicts)
 
                     self._last_hash[rid] = h
                     await publish_event(
@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
+from ..persistence.db import run_in_db
 from ..persistence.models import RobotPOICache
 
 
@@ -119,3 +120,12 @@ class PoiCacheService:
             "deleted": deleted,
             "total": len(incoming),
         }
+
+    # ----------------------------
+    # Async variants
+    # ----------------------------
+    async def list_pois_async(self, robot_id: Optional[str] = None, limit: int = 200, offset: int = 0) -> List[RobotPOICache]:
+        return await run_in_db(self.list_pois, robot_id=robot_id, limit=limit, offset=offset)
+
+    async def update_robot_pois_async(self, robot_id: str, pois: List[Dict[str, Any]]) -> Dict[str, int]:
+        return await run_in_db(self.update_robot_pois, robot_id, pois)
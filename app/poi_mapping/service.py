@@ -1,11 +1,12 @@
 ﻿from __future__ import annotations
 
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
 from .models import PoiMapping
+from ..persistence.models import RobotPOICache
 from ..robot_api.service import RobotAPIService
 
 
@@ -57,6 +58,24 @@ class PoiMappingService:
         r = self.norm_ref(ref)
         return self.session.get(PoiMapping, (k, r))
 
+    def target_coords(self, kinds: Iterable[str], robot_id: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """
+        (kind, ref) -> (x, y) via poi_id -> RobotPOICache, one query for all refs of `kinds`.
+        With robot_id, that robot's cached coordinates win over other robots' entries.
+        """
+        stmt = (
+            select(PoiMapping.kind, PoiMapping.ref, RobotPOICache.robot_id, RobotPOICache.x, RobotPOICache.y)
+            .join(RobotPOICache, RobotPOICache.poi_id == PoiMapping.poi_id)
+            .where(PoiMapping.kind.in_({self.norm_kind(k) for k in kinds}))
+            .where(RobotPOICache.x.is_not(None))
+            .where(RobotPOICache.y.is_not(None))
+        )
+        coords: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        for kind, ref, rid, x, y in self.session.exec(stmt).all():
+            if (kind, ref) not in coords or (robot_id is not None and rid == robot_id):
+                coords[(kind, ref)] = (float(x), float(y))
+        return coords
+
     # ----------------------------
     # Auto-mapping helper (best-effort)
     # ----------------------------
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Request
+from sqlmodel import select
 
 from ..auth_roles.deps import require_role
+from ..assignment_engine.busy_index import busy_index
+from ..assignment_engine.reservations import ReservationService
 from ..assignment_engine.robots import get_robot_ids
+from ..common.fleet_state import fleet_state
+from ..robot_registry.service import robot_registry
 from ..common.safety import safe_mode_enabled
-from ..persistence.db import get_session, DB_URL
+from ..persistence.db import AsyncSession, get_async_session, migration_status, run_in_db, storage_settings, DB_URL
 from ..persistence.models import Task
 from ..robot_api.autox_client import AutoXingClient, AutoXingConfig
 
@@ -16,21 +20,61 @@ router = APIRouter(prefix="/preflight", tags=["preflight"])
 
 
 @router.get("/check", dependencies=[Depends(require_role("monitor"))])
-async def preflight_check(verify_vendor: bool = False, session: Session = Depends(get_session)) -> Dict[str, Any]:
+async def preflight_check(request: Request, verify_vendor: bool = False, session: AsyncSession = Depends(get_async_session)) -> Dict[str, Any]:
+    """
+    Readiness report. DB work (probe query, PRAGMA read-back, EXPLAIN QUERY PLAN,
+    reservations) runs on the DB executor, so the check never blocks the event loop.
+    """
     out: Dict[str, Any] = {
         "safe_mode": safe_mode_enabled(),
         "robot_ids": get_robot_ids(),
+        "robot_registry": {"loaded": robot_registry.loaded, "version": robot_registry.version},
         "db": {"ok": False, "url": DB_URL},
         "autox_config": {"ok": False},
     }
 
     # DB check
     try:
-        _ = session.exec(select(Task).limit(1)).first()
+        _ = await session.exec_first(select(Task).limit(1))
         out["db"]["ok"] = True
     except Exception as e:
         out["db"]["error"] = str(e)
 
+    # Active storage profile (pragmas read back from the live connection)
+    try:
+        out["db"]["storage"] = await run_in_db(storage_settings)
+    except Exception as e:
+        out["db"]["storage"] = {"error": str(e)}
+
+    # Schema version + EXPLAIN QUERY PLAN for the hot queries
+    try:
+        out["db"]["migrations"] = await run_in_db(migration_status)
+    except Exception as e:
+        out["db"]["migrations"] = {"error": str(e)}
+
+    lag = getattr(request.app.state, "loop_lag_monitor", None)
+    if lag:
+        out["event_loop_lag"] = lag.snapshot()
+
+    # Poller-fed robot state cache (hit/miss counters + per-robot age)
+    out["fleet_state"] = fleet_state.snapshot()
+    out["busy_index"] = busy_index.snapshot()
+
+    disp = getattr(request.app.state, "reservation_dispatcher", None)
+    if disp and disp.enabled:
+        try:
+            out["reservations"] = {
+                "depth": disp.depth,
+                "dispatched": disp.dispatched,
+                "held": await session.run_sync(lambda s: ReservationService(s).snapshot()),
+            }
+        except Exception as e:
+            out["reservations"] = {"error": str(e)}
+
+    orch = getattr(request.app.state, "orchestrator_loop", None)
+    if orch and orch.enabled:
+        out["orchestrator_loop"] = orch.snapshot()
+
     # AutoXing config check (no network)
     try:
         cfg = AutoXingConfig()
@@ -1,8 +1,13 @@
 ﻿from __future__ import annotations
 
+import itertools
 from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import update
 from sqlmodel import Session
 
+from ..persistence.models import Task
 from .models import TaskPriorityOverride
 
 
@@ -10,18 +15,60 @@ def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _shift_rank(session: Session, task_id: int, delta: int) -> None:
+    # Keep Task.rank_key in step with the override (same transaction)
+    if delta:
+        session.exec(update(Task).where(Task.id == task_id).values(rank_key=Task.rank_key + float(delta)))
+
+
+# session.info key for the per-session override cache. Entries are only trusted
+# while no override was written (in any session) since they were cached, so a
+# long-lived session never serves a stale value.
+_CACHE_KEY = "priority_overrides"
+_generations = itertools.count(1)
+_generation = 0
+
+
+def _override_cache(session: Session) -> Dict[int, int]:
+    entry: Optional[Dict[str, Any]] = session.info.get(_CACHE_KEY)
+    if entry is None or entry["generation"] != _generation:
+        entry = session.info[_CACHE_KEY] = {"generation": _generation, "overrides": {}}
+    return entry["overrides"]
+
+
+def invalidate_override_caches() -> None:
+    """Drop every session's cached overrides (after any priority write)."""
+    global _generation
+    _generation = next(_generations)
+
+
 class PriorityService:
+    @staticmethod
+    def prime_cache(session: Session, pairs: Iterable[Tuple[int, Optional[int]]]) -> None:
+        """
+        Seed the session's override cache from an already-joined query
+        ((task_id, override-or-None) pairs), so later get_override calls are free.
+        """
+        cache = _override_cache(session)
+        for task_id, override in pairs:
+            cache[int(task_id)] = int(override or 0)
+
     @staticmethod
     def set_override(session: Session, task_id: int, override: int) -> TaskPriorityOverride:
         row = session.get(TaskPriorityOverride, task_id)
+        previous = 0
         if row is None:
             row = TaskPriorityOverride(task_id=task_id, override=override, updated_at=utc_now())
         else:
+            previous = int(row.override)
             row.override = override
             row.updated_at = utc_now()
 
         session.add(row)
+        _shift_rank(session, task_id, int(override) - previous)
         session.commit()
+        invalidate_override_caches()
+        _override_cache(session)[int(task_id)] = int(override)
         session.refresh(row)
         return row
 
@@ -30,11 +77,18 @@ class PriorityService:
         row = session.get(TaskPriorityOverride, task_id)
         if row is None:
             return False
+        _shift_rank(session, task_id, -int(row.override))
         session.delete(row)
         session.commit()
+        invalidate_override_caches()
+        _override_cache(session)[int(task_id)] = 0
         return True
 
     @staticmethod
     def get_override(session: Session, task_id: int) -> int:
+        cache = _override_cache(session)
+        if task_id in cache:
+            return cache[task_id]
         row = session.get(TaskPriorityOverride, task_id)
-        return int(row.override) if row else 0
+        cache[task_id] = int(row.override) if row else 0
+        return cache[task_id]
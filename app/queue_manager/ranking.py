@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event, inspect
+
+from ..persistence.models import Task, TaskType
+
+
+# Every AGING_WINDOW_S seconds waiting adds +1 priority
+AGING_WINDOW_S = 600.0
+
+
+def base_priority(task_type: TaskType) -> int:
+    # Restaurant default (tweak anytime)
+    if task_type == TaskType.DELIVERY:
+        return 100
+    if task_type == TaskType.BILLING:
+        return 80
+    if task_type == TaskType.ORDERING:
+        return 60
+    if task_type == TaskType.NAVIGATE:
+        return 30
+    if task_type == TaskType.CLEANUP:
+        return 10
+    if task_type == TaskType.CHARGING:
+        return 5
+    return 0
+
+
+def _epoch_s(dt: datetime) -> float:
+    # SQLite drops tzinfo; assume naive timestamps are UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def rank_key_for(task_type: TaskType, created_at: datetime, override: int = 0) -> float:
+    """
+    Time-invariant sort key.
+      effective(now) = base + override + (now - created_at) / AGING_WINDOW_S
+                     = rank_key + now / AGING_WINDOW_S
+    All tasks age at the same rate, so ordering by rank_key == ordering by effective priority.
+    """
+    return float(base_priority(task_type)) + float(override) - _epoch_s(created_at) / AGING_WINDOW_S
+
+
+def effective_priority(rank_key: float, now: datetime) -> float:
+    return float(rank_key) + _epoch_s(now) / AGING_WINDOW_S
+
+
+def _as_task_type(value: object) -> Optional[TaskType]:
+    if value is None:
+        return None
+    try:
+        return value if isinstance(value, TaskType) else TaskType(str(value))
+    except ValueError:
+        return None
+
+
+@event.listens_for(Task, "before_insert")
+def _task_rank_on_insert(_mapper, _conn, target: Task) -> None:
+    created = target.created_at or datetime.now(timezone.utc)
+    target.rank_key = rank_key_for(_as_task_type(target.task_type) or TaskType.NAVIGATE, created)
+
+
+@event.listens_for(Task, "before_update")
+def _task_rank_on_type_change(_mapper, _conn, target: Task) -> None:
+    # Only a task_type change moves the key (override changes go through PriorityService)
+    hist = inspect(target).attrs.task_type.history
+    if not hist.has_changes() or not hist.deleted:
+        return
+    old = _as_task_type(hist.deleted[0])
+    new = _as_task_type(target.task_type)
+    if old is None or new is None or old == new:
+        return
+    target.rank_key = float(target.rank_key or 0.0) + float(base_priority(new) - base_priority(old))
@@ -1,6 +1,8 @@
 ﻿from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session
 
 from ..persistence.db import get_session
@@ -24,9 +26,27 @@ def tick(session: Session = Depends(get_session)):
 
 
 @router.get("/queue", dependencies=[Depends(require_role("monitor"))])
-def queue(session: Session = Depends(get_session)):
+def queue(
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated subset, e.g. task_id,title,effective_priority"),
+    count_only: bool = False,
+    session: Session = Depends(get_session),
+):
     svc = QueueManagerService(session)
-    return {"queue": svc.get_ready_queue()}
+    if count_only:
+        return {"count": svc.count_ready()}
+
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        page = svc.get_ready_queue_page(limit=limit, cursor=cursor, fields=wanted)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Unpaginated calls keep the original {"queue": [...]} shape
+    if limit is None:
+        return {"queue": page["queue"]}
+    return page
 
 
 @router.get("/stats", dependencies=[Depends(require_role("monitor"))])
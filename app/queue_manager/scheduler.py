@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlmodel import Session
+
+from ..persistence.db import engine, run_in_db
+from ..realtime_bus.bus import bus, publish_event
+from ..realtime_bus.models import RealtimeEvent
+from .service import QueueManagerService
+
+
+log = logging.getLogger("release-scheduler")
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Events that may have added/moved a PENDING release time
+_RESYNC_EVENTS = {"task.created", "task.updated", "task.status_changed", "queue.updated", "system.reset"}
+
+
+class ReleaseScheduler:
+    """
+    Timer-driven PENDING -> READY promotion.
+
+    Keeps the next upcoming release_at values in a min-heap (seeded from an
+    index-backed query), sleeps exactly until the head is due, then promotes
+    everything due with one set-based UPDATE. Task/queue events trigger a
+    resync, plus a periodic safety resync for writers that don't publish events.
+
+    Disable with:
+      RELEASE_SCHEDULER_ENABLED=0
+    """
+    def __init__(self) -> None:
+        self.enabled = os.getenv("RELEASE_SCHEDULER_ENABLED", "1") == "1"
+        self.resync_s = max(1.0, float(os.getenv("RELEASE_SCHEDULER_RESYNC_S", "30")))
+        self.window = max(1, int(os.getenv("RELEASE_SCHEDULER_WINDOW", "256")))
+
+        self._heap: List[datetime] = []
+        self._dirty = True
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.promoted_total = 0
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("RELEASE_SCHEDULER disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        bus.add_listener(self._on_event)
+        self._task = asyncio.create_task(self._run())
+        log.info("RELEASE_SCHEDULER enabled resync=%.0fs window=%s", self.resync_s, self.window)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        bus.remove_listener(self._on_event)
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    def notify(self, release_at: Optional[datetime] = None) -> None:
+        """
+        Tell the scheduler about a new/changed release time (thread-safe).
+        Without a timestamp, the heap is re-seeded from the DB.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+
+        def _apply() -> None:
+            if release_at is None:
+                self._dirty = True
+            else:
+                rel = release_at if release_at.tzinfo else release_at.replace(tzinfo=timezone.utc)
+                heapq.heappush(self._heap, rel)
+            self._wake.set()
+
+        try:
+            if asyncio.get_running_loop() is loop:
+                _apply()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(_apply)
+
+    def next_release_at(self) -> Optional[datetime]:
+        return self._heap[0] if self._heap else None
+
+    def _on_event(self, event: RealtimeEvent) -> None:
+        if event.source == "release-scheduler":
+            return
+        if event.type in _RESYNC_EVENTS:
+            self.notify()
+
+    @staticmethod
+    def _load_upcoming(window: int) -> List[datetime]:
+        with Session(engine) as session:
+            return QueueManagerService(session).upcoming_release_times(limit=window)
+
+    @staticmethod
+    def _promote_due() -> int:
+        with Session(engine) as session:
+            return QueueManagerService(session).tick_promote_due_tasks()
+
+    async def _resync(self) -> None:
+        self._heap = await run_in_db(self._load_upcoming, self.window)
+        heapq.heapify(self._heap)
+        self._dirty = False
+
+    async def _run(self) -> None:
+        last_sync = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            self._wake.clear()
+            errored = False
+            try:
+                if self._dirty or not self._heap or (loop.time() - last_sync) >= self.resync_s:
+                    await self._resync()
+                    last_sync = loop.time()
+
+                now = utc_now()
+                if self._heap and self._heap[0] <= now:
+                    promoted = await run_in_db(self._promote_due)
+                    while self._heap and self._heap[0] <= now:
+                        heapq.heappop(self._heap)
+                    if promoted:
+                        self.promoted_total += promoted
+                        log.info("promoted %s due task(s)", promoted)
+                        await publish_event(
+                            "queue.updated",
+                            {"reason": "promoted_due_tasks", "promoted": promoted},
+                            source="release-scheduler",
+                        )
+                    if not self._heap:
+                        self._dirty = True
+                    continue
+            except Exception as e:
+                log.warning("release scheduler error: %s", e)
+                errored = True
+
+            # Sleep until the head is due (or the resync deadline), or until notified
+            timeout = self.resync_s - (loop.time() - last_sync)
+            if self._heap:
+                timeout = min(timeout, (self._heap[0] - utc_now()).total_seconds())
+            if errored:
+                timeout = max(timeout, 1.0)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
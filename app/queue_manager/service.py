@@ -1,43 +1,72 @@
 ﻿from __future__ import annotations
 
+import base64
+import json
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from sqlalchemy import and_, func, or_, text, update
 from sqlmodel import Session, select
 
-from ..persistence.models import Task, TaskStatus, TaskType
+from ..archive.models import TaskArchive
+from ..persistence.db import run_in_db
+from ..persistence.migrations import TASK_COUNT_RESEED_SQL, task_counters_supported
+from ..persistence.models import Task, TaskStatus, TaskStatusCount, TaskType
+from ..poi_mapping.models import PoiMapping
+from ..priority_manager.models import TaskPriorityOverride
 from ..priority_manager.service import PriorityService
+from .ranking import base_priority, effective_priority  # noqa: F401  (base_priority re-exported)
 
 
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def base_priority(task_type: TaskType) -> int:
-    # Restaurant default (tweak anytime)
-    if task_type == TaskType.DELIVERY:
-        return 100
-    if task_type == TaskType.BILLING:
-        return 80
-    if task_type == TaskType.ORDERING:
-        return 60
-    if task_type == TaskType.NAVIGATE:
-        return 30
-    if task_type == TaskType.CLEANUP:
-        return 10
-    if task_type == TaskType.CHARGING:
-        return 5
-    return 0
-
-
-def aging_bonus_minutes(created_at: datetime) -> float:
-    # Every 10 minutes waiting adds +1 priority
-    now = utc_now()
-    # SQLite drops tzinfo; assume naive timestamps are UTC
-    if created_at.tzinfo is None:
-        created_at = created_at.replace(tzinfo=timezone.utc)
-    age_min = max(0.0, (now - created_at).total_seconds() / 60.0)
-    return age_min / 10.0
+# Area filter value for tasks whose target has no PoiMapping.area_id
+UNZONED = ""
+
+
+# Public shape of a queue item (order = default output order)
+QUEUE_FIELDS = (
+    "task_id",
+    "task_type",
+    "status",
+    "title",
+    "target_kind",
+    "target_ref",
+    "release_at",
+    "created_at",
+    "operator_override",
+    "effective_priority",
+    "reserved_robot_id",
+)
+
+# Queue fields that are plain Task columns (the other two are derived)
+_FIELD_COLUMNS = {
+    "task_id": Task.id,
+    "task_type": Task.task_type,
+    "status": Task.status,
+    "title": Task.title,
+    "target_kind": Task.target_kind,
+    "target_ref": Task.target_ref,
+    "release_at": Task.release_at,
+    "created_at": Task.created_at,
+    "reserved_robot_id": Task.reserved_robot_id,
+}
+
+
+def encode_cursor(rank_key: float, created_at: datetime, task_id: int) -> str:
+    raw = json.dumps([float(rank_key), created_at.isoformat(), int(task_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank_key, created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(rank_key), datetime.fromisoformat(created_at), int(task_id)
+    except Exception as e:
+        raise ValueError("Invalid queue cursor") from e
 
 
 class QueueManagerService:
@@ -47,74 +76,292 @@ class QueueManagerService:
     def tick_promote_due_tasks(self) -> int:
         """
         Promote tasks that are due:
-          PENDING + release_at <= now  => READY
+          PENDING + (release_at is NULL or release_at <= now)  => READY
+        One set-based UPDATE seeking ix_task_pending_release (status, release_at),
+        so cost is O(due). Nothing due: rolled back, no empty commit.
         Returns number of tasks promoted.
         """
-        now = utc_now()
-
-        stmt = select(Task).where(Task.status == TaskStatus.PENDING)
-        tasks = list(self.session.exec(stmt).all())
-
-        promoted = 0
-        for t in tasks:
-            if t.release_at is None:
-                t.status = TaskStatus.READY
-                t.updated_at = now
-                self.session.add(t)
-                promoted += 1
-            else:
-                rel = t.release_at
-                if rel is not None and rel.tzinfo is None:
-                    rel = rel.replace(tzinfo=timezone.utc)
-                if rel is not None and rel <= now:
-                    t.status = TaskStatus.READY
-                    t.updated_at = now
-                    self.session.add(t)
-                    promoted += 1
-
+        res = self.session.exec(self.promote_due_stmt(utc_now()))
+        promoted = int(getattr(res, "rowcount", 0) or 0)
         if promoted:
             self.session.commit()
+        else:
+            self.session.rollback()
         return promoted
 
-    def get_ready_queue(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def promote_due_stmt(now: datetime):
+        return update(Task).where(QueueManagerService._due(now)).values(status=TaskStatus.READY, updated_at=now)
+
+    @staticmethod
+    def _due(now: datetime):
+        # PENDING and (release_at NULL or past), spelled as two status+release_at
+        # terms so SQLite seeks both on ix_task_pending_release (MULTI-INDEX OR)
+        return or_(
+            and_(Task.status == TaskStatus.PENDING, Task.release_at.is_(None)),
+            and_(Task.status == TaskStatus.PENDING, Task.release_at <= now),
+        )
+
+    def upcoming_release_times(self, limit: int = 256) -> List[datetime]:
         """
-        READY tasks (unassigned) ordered by effective priority.
-        effective = base_priority + operator_override + aging_bonus
+        Next release_at values of PENDING tasks (ascending, index-backed).
+        """
+        stmt = (
+            select(Task.release_at)
+            .where(Task.status == TaskStatus.PENDING)
+            .where(Task.release_at.is_not(None))
+            .order_by(Task.release_at.asc())
+            .limit(limit)
+        )
+        out: List[datetime] = []
+        for rel in self.session.exec(stmt).all():
+            if rel.tzinfo is None:
+                rel = rel.replace(tzinfo=timezone.utc)
+            out.append(rel)
+        return out
+
+    @staticmethod
+    def _ready_where(stmt, include_due: bool = False):
+        if include_due:
+            # READY plus what tick_promote_due_tasks would promote right now (dry-run planning)
+            return stmt.where(or_(Task.status == TaskStatus.READY, QueueManagerService._due(utc_now()))).where(Task.assigned_robot_id.is_(None))
+        return stmt.where(Task.status == TaskStatus.READY).where(Task.assigned_robot_id.is_(None))
+
+    def due_task_ids(self, limit: int = 256) -> List[int]:
+        """
+        PENDING tasks tick_promote_due_tasks would promote now (read-only).
         """
         stmt = (
-            select(Task)
-            .where(Task.status == TaskStatus.READY)
-            .where(Task.assigned_robot_id.is_(None))
+            select(Task.id)
+            .where(self._due(utc_now()))
+            .order_by(Task.id.asc())
+            .limit(max(0, int(limit)))
         )
-        tasks = list(self.session.exec(stmt).all())
-
-        enriched: List[Dict[str, Any]] = []
-        for t in tasks:
-            override = PriorityService.get_override(self.session, t.id)
-            eff = float(base_priority(t.task_type)) + float(override) + float(aging_bonus_minutes(t.created_at))
-            enriched.append(
-                {
-                    "task_id": t.id,
-                    "task_type": t.task_type,
-                    "status": t.status,
-                    "title": t.title,
-                    "target_kind": t.target_kind,
-                    "target_ref": t.target_ref,
-                    "release_at": t.release_at,
-                    "created_at": t.created_at,
-                    "operator_override": override,
-                    "effective_priority": eff,
-                }
+        return [int(x) for x in self.session.exec(stmt).all()]
+
+    @staticmethod
+    def _claimable_by(robot_id: Optional[str]):
+        # Unreserved, or reserved for this robot
+        if robot_id is None:
+            return Task.reserved_robot_id.is_(None)
+        return or_(Task.reserved_robot_id.is_(None), Task.reserved_robot_id == robot_id)
+
+    @staticmethod
+    def _in_area(area_id: str):
+        # Task area = PoiMapping.area_id of its (target_kind, target_ref); PK lookup per row
+        mapped = (
+            select(PoiMapping.area_id)
+            .where(PoiMapping.kind == func.upper(func.trim(Task.target_kind)))
+            .where(PoiMapping.ref == func.trim(Task.target_ref))
+            .where(PoiMapping.area_id.is_not(None))
+            .correlate(Task)
+        )
+        if area_id == UNZONED:
+            return ~mapped.exists()
+        return mapped.where(PoiMapping.area_id == area_id).exists()
+
+    def get_ready_queue_page(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        for_robot: Optional[str] = None,
+        unreserved_only: bool = False,
+        area_id: Optional[str] = None,
+        include_due: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        One page of the READY queue (unassigned), ordered by effective priority.
+        effective = base_priority + operator_override + aging_bonus
+                  = rank_key + now / AGING_WINDOW_S   (see ranking.py)
+
+        Keyset pagination on (rank_key DESC, created_at, id): the cursor is the
+        last row of the previous page, so every page is an index seek + LIMIT.
+        `fields` projects columns in SQL; the override join is only added when needed.
+        `unreserved_only` hides tasks reserved for a robot (other than `for_robot`).
+        `area_id` keeps tasks whose target maps to that area (UNZONED: no mapped area).
+        `include_due` adds due PENDING tasks (as if promoted) for dry-run planning.
+        Raises ValueError on unknown fields / malformed cursor.
+        """
+        wanted = list(QUEUE_FIELDS) if not fields else list(dict.fromkeys(fields))
+        unknown = [f for f in wanted if f not in QUEUE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown queue field(s): {', '.join(unknown)}")
+
+        with_override = "operator_override" in wanted
+        stmt = self.ready_page_stmt(
+            wanted,
+            limit=limit,
+            cursor=cursor,
+            for_robot=for_robot,
+            unreserved_only=unreserved_only,
+            area_id=area_id,
+            include_due=include_due,
+        )
+        rows = list(self.session.exec(stmt).all())
+        if with_override:
+            PriorityService.prime_cache(self.session, ((r.task_id, r.operator_override) for r in rows))
+
+        now = utc_now()
+        items: List[Dict[str, Any]] = []
+        for r in rows:
+            m = r._mapping
+            item: Dict[str, Any] = {}
+            for f in wanted:
+                if f == "operator_override":
+                    item[f] = int(m[f] or 0)
+                elif f == "effective_priority":
+                    item[f] = effective_priority(m["rank_key"], now)
+                else:
+                    item[f] = m[f]
+            items.append(item)
+
+        next_cursor = None
+        if limit is not None and rows and len(rows) >= int(limit):
+            last = rows[-1]
+            next_cursor = encode_cursor(last.rank_key, last.created_at, last.task_id)
+        return {"queue": items, "next_cursor": next_cursor}
+
+    @classmethod
+    def ready_page_stmt(
+        cls,
+        wanted: Sequence[str],
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        for_robot: Optional[str] = None,
+        unreserved_only: bool = False,
+        area_id: Optional[str] = None,
+        include_due: bool = False,
+    ):
+        """
+        The SELECT behind get_ready_queue_page (`wanted` already validated).
+        """
+        # Key columns are always read (ordering + cursor); the rest only on request
+        cols = [Task.id.label("task_id"), Task.rank_key.label("rank_key"), Task.created_at.label("created_at")]
+        cols += [_FIELD_COLUMNS[f].label(f) for f in wanted if f in _FIELD_COLUMNS and f not in ("task_id", "created_at")]
+        with_override = "operator_override" in wanted
+        if with_override:
+            cols.append(TaskPriorityOverride.override.label("operator_override"))
+
+        # Seek on ix_task_ready_rank (status, assigned_robot_id, rank_key DESC, created_at, id):
+        # rows come back in queue order, so LIMIT stops early without a sort.
+        # Overrides come in the same statement (PK outer join), not one lookup per task.
+        stmt = select(*cols)
+        if with_override:
+            stmt = stmt.outerjoin(TaskPriorityOverride, TaskPriorityOverride.task_id == Task.id)
+        stmt = cls._ready_where(stmt, include_due=include_due)
+        if unreserved_only:
+            stmt = stmt.where(cls._claimable_by(for_robot))
+        if area_id is not None:
+            stmt = stmt.where(cls._in_area(area_id))
+        if cursor:
+            rank_key, created_at, task_id = decode_cursor(cursor)
+            stmt = stmt.where(
+                or_(
+                    Task.rank_key < rank_key,
+                    and_(Task.rank_key == rank_key, Task.created_at > created_at),
+                    and_(Task.rank_key == rank_key, Task.created_at == created_at, Task.id > task_id),
+                )
             )
+        stmt = stmt.order_by(Task.rank_key.desc(), Task.created_at.asc(), Task.id.asc())
+        if limit is not None:
+            stmt = stmt.limit(max(0, int(limit)))
+        return stmt
 
-        enriched.sort(key=lambda x: (-x["effective_priority"], x["created_at"]))
-        return enriched
+    def get_ready_queue(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        READY tasks (unassigned) ordered by effective priority, all fields.
+        """
+        return self.get_ready_queue_page(limit=limit)["queue"]
+
+    def count_ready(self) -> int:
+        stmt = self._ready_where(select(func.count()).select_from(Task))
+        return int(self.session.exec(stmt).one())
+
+    def peek_next_ready_task_id(self, robot_id: Optional[str] = None) -> Optional[int]:
+        """
+        Head of the READY queue (index seek + LIMIT 1), skipping tasks reserved
+        for other robots.
+        """
+        task_id = self.session.exec(self.ready_head_stmt(robot_id)).first()
+        return int(task_id) if task_id is not None else None
+
+    @classmethod
+    def ready_head_stmt(cls, robot_id: Optional[str] = None):
+        return (
+            cls._ready_where(select(Task.id))
+            .where(cls._claimable_by(robot_id))
+            .order_by(Task.rank_key.desc(), Task.created_at.asc(), Task.id.asc())
+            .limit(1)
+        )
+
+    def _count_by_status(self) -> Dict[str, int]:
+        # Live + archived: archiving moves finished tasks, it doesn't un-count them
+        out: Dict[str, int] = {}
+        for model in (Task, TaskArchive):
+            for k, v in self.session.exec(select(model.status, func.count()).group_by(model.status)).all():
+                key = getattr(k, "value", str(k))
+                out[key] = out.get(key, 0) + int(v)
+        return out
+
+    def _stored_counts(self) -> Dict[str, int]:
+        rows = self.session.exec(select(TaskStatusCount.status, TaskStatusCount.count)).all()
+        return {getattr(k, "value", str(k)): int(v) for k, v in rows}
 
     def stats(self) -> Dict[str, int]:
-        all_tasks = list(self.session.exec(select(Task)).all())
+        """
+        Task counts per status, archived tasks included. Read from the
+        trigger-maintained taskstatuscount table (one row per status, O(1) in
+        history size); other dialects fall back to GROUP BY over task + taskarchive.
+        """
+        if task_counters_supported(self.session.get_bind()):
+            counts = self._stored_counts()
+        else:
+            counts = self._count_by_status()
+
         out = {"PENDING": 0, "READY": 0, "ASSIGNED": 0, "DONE": 0, "CANCELED": 0, "TOTAL": 0}
-        for t in all_tasks:
-            key = t.status.value if hasattr(t.status, "value") else str(t.status)
-            out[key] = out.get(key, 0) + 1
-            out["TOTAL"] += 1
+        for key, n in counts.items():
+            out[key] = out.get(key, 0) + n
+            out["TOTAL"] += n
         return out
+
+    def reconcile_stats(self) -> Dict[str, int]:
+        """
+        Recount from the task table and reseed the counters if they drifted
+        (e.g. rows written with triggers disabled / restored backups).
+        Returns the per-status drift that was corrected (empty when in sync).
+        """
+        if not task_counters_supported(self.session.get_bind()):
+            return {}
+        stored = self._stored_counts()
+        actual = self._count_by_status()
+        drift = {
+            k: actual.get(k, 0) - stored.get(k, 0)
+            for k in set(stored) | set(actual)
+            if actual.get(k, 0) != stored.get(k, 0)
+        }
+        if drift:
+            try:
+                # Recount inside the write transaction so concurrent inserts can't slip between
+                for sql in TASK_COUNT_RESEED_SQL:
+                    self.session.exec(text(sql))
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+        return drift
+
+    # ----------------------------
+    # Async variants (for async routes / background loops)
+    # ----------------------------
+    async def tick_promote_due_tasks_async(self) -> int:
+        return await run_in_db(self.tick_promote_due_tasks)
+
+    async def get_ready_queue_async(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await run_in_db(self.get_ready_queue, limit)
+
+    async def stats_async(self) -> Dict[str, int]:
+        return await run_in_db(self.stats)
+
+    async def reconcile_stats_async(self) -> Dict[str, int]:
+        return await run_in_db(self.reconcile_stats)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlmodel import Session
+
+from ..persistence.db import engine, run_in_db
+from .service import QueueManagerService
+
+
+log = logging.getLogger("task-stats")
+
+
+def reconcile_now() -> Dict[str, int]:
+    with Session(engine) as session:
+        return QueueManagerService(session).reconcile_stats()
+
+
+class TaskStatsReconciler:
+    """
+    Periodically recounts tasks per status (GROUP BY) and repairs the
+    trigger-maintained counters behind /queue-manager/stats if they drifted.
+
+    Disable with:
+      TASK_STATS_RECONCILE_ENABLED=0
+
+    Tuning:
+      TASK_STATS_RECONCILE_S (default 300)
+    """
+    def __init__(self) -> None:
+        self.enabled = os.getenv("TASK_STATS_RECONCILE_ENABLED", "1") == "1"
+        self.interval_s = max(10.0, float(os.getenv("TASK_STATS_RECONCILE_S", "300")))
+
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+
+    async def start(self) -> None:
+        if not self.enabled:
+            log.info("TASK_STATS_RECONCILE disabled")
+            return
+        if self._task and not self._task.done():
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._loop())
+        log.info("TASK_STATS_RECONCILE enabled interval=%.0fs", self.interval_s)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=3)
+            except Exception:
+                pass
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop.is_set():
+                break
+
+            try:
+                drift = await run_in_db(reconcile_now)
+                if drift:
+                    log.warning("task counters drifted, reseeded: %s", drift)
+            except Exception as e:
+                log.warning("task stats reconcile error: %s", e)
@@ -1,7 +1,8 @@
 ﻿from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, Set
+import logging
+from typing import Any, Callable, Dict, List, Set
 
 from fastapi import WebSocket
 from starlette.websockets import WebSocketState
@@ -9,15 +10,38 @@ from starlette.websockets import WebSocketState
 from .models import RealtimeEvent
 
 
+log = logging.getLogger("realtime-bus")
+
+# In-process subscribers: called synchronously on publish, must not block.
+EventListener = Callable[[RealtimeEvent], None]
+
+
 class BroadcastBus:
     """
     In-memory WebSocket broadcaster (v0).
     - Holds active websocket connections
     - Broadcasts JSON events to all clients
+    - Notifies in-process listeners (schedulers/runners reacting to events)
     """
     def __init__(self) -> None:
         self._clients: Set[WebSocket] = set()
         self._lock = asyncio.Lock()
+        self._listeners: List[EventListener] = []
+
+    def add_listener(self, fn: EventListener) -> None:
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: EventListener) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def notify_listeners(self, event: RealtimeEvent) -> None:
+        for fn in list(self._listeners):
+            try:
+                fn(event)
+            except Exception as e:
+                log.warning("event listener error type=%s: %s", event.type, e)
 
     async def connect(self, ws: WebSocket) -> None:
         await ws.accept()
@@ -66,6 +90,7 @@ async def publish_event(event_type: str, data: Dict[str, Any] | None = None, sou
     Async publish (best for async routes/services).
     """
     ev = RealtimeEvent(type=event_type, data=data or {}, source=source)
+    bus.notify_listeners(ev)
     return await bus.broadcast(ev)
 
 
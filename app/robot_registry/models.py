@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Robot(SQLModel, table=True):
+    """
+    Robot registry row (replaces the flat ROBOT_IDS list once seeded).
+      - capabilities: comma-separated TaskType values this robot can serve ("" = all)
+      - enabled=False keeps the robot out of assignment, polling and pre-positioning
+    """
+    robot_id: str = Field(primary_key=True)
+
+    name: Optional[str] = None
+    enabled: bool = Field(default=True, index=True)
+    capabilities: str = Field(default="")
+    home_area_id: Optional[str] = Field(default=None, index=True)
+    max_payload_kg: Optional[float] = None
+
+    # Assignment order for the "priority" policy (was ROBOT_IDS order)
+    sort_order: int = Field(default=0, index=True)
+
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now, index=True)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from ..auth_roles.deps import require_role
+from ..persistence.db import get_session
+from ..realtime_bus.bus import publish_event_nowait
+
+from .models import Robot
+from .schemas import RobotRead, RobotUpsertRequest
+from .service import RobotRegistryService, parse_capabilities, robot_registry
+
+router = APIRouter(prefix="/robot-registry", tags=["robot-registry"])
+
+
+def _read(row: Robot) -> RobotRead:
+    return RobotRead(
+        robot_id=row.robot_id,
+        name=row.name,
+        enabled=row.enabled,
+        capabilities=sorted(parse_capabilities(row.capabilities)),
+        home_area_id=row.home_area_id,
+        max_payload_kg=row.max_payload_kg,
+        sort_order=row.sort_order,
+    )
+
+
+@router.get("/robots", response_model=list[RobotRead])
+def list_robots(session: Session = Depends(get_session)):
+    return [_read(r) for r in RobotRegistryService(session).list_all()]
+
+
+@router.get("/snapshot", dependencies=[Depends(require_role("monitor"))])
+def snapshot():
+    """
+    The in-memory registry the assignment engine reads (version bumps on every write).
+    """
+    return robot_registry.snapshot()
+
+
+@router.get("/robots/{robot_id}", response_model=RobotRead)
+def get_robot(robot_id: str, session: Session = Depends(get_session)):
+    row = RobotRegistryService(session).get(robot_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Robot not found")
+    return _read(row)
+
+
+@router.post("/robots", response_model=RobotRead, dependencies=[Depends(require_role("admin"))])
+def upsert_robot(payload: RobotUpsertRequest, session: Session = Depends(get_session)):
+    """
+    Create a robot or merge into an existing one: only fields present in the
+    body change (e.g. {"robot_id": "R1", "home_area_id": "A"} keeps R1's
+    capabilities and enabled flag).
+    """
+    try:
+        row = RobotRegistryService(session).upsert(
+            payload.robot_id, **payload.model_dump(exclude_unset=True, exclude={"robot_id"})
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    publish_event_nowait("robot_registry.updated", {"robot_id": row.robot_id, "enabled": row.enabled}, source="robot-registry")
+    return _read(row)
+
+
+@router.post("/robots/{robot_id}/enable", response_model=RobotRead, dependencies=[Depends(require_role("operator"))])
+def enable_robot(robot_id: str, enabled: bool = True, session: Session = Depends(get_session)):
+    row = RobotRegistryService(session).set_enabled(robot_id, enabled)
+    if not row:
+        raise HTTPException(status_code=404, detail="Robot not found")
+
+    publish_event_nowait("robot_registry.updated", {"robot_id": row.robot_id, "enabled": row.enabled}, source="robot-registry")
+    return _read(row)
+
+
+@router.delete("/robots/{robot_id}", dependencies=[Depends(require_role("admin"))])
+def delete_robot(robot_id: str, session: Session = Depends(get_session)):
+    if not RobotRegistryService(session).delete(robot_id):
+        raise HTTPException(status_code=404, detail="Robot not found")
+
+    publish_event_nowait("robot_registry.updated", {"robot_id": robot_id, "deleted": True}, source="robot-registry")
+    return {"ok": True, "robot_id": robot_id}
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class RobotUpsertRequest(BaseModel):
+    """
+    Create or merge: for an existing robot only the fields sent are changed;
+    the defaults below apply to new robots.
+    """
+    robot_id: str
+    name: Optional[str] = None
+    enabled: bool = True
+    capabilities: List[str] = Field(default_factory=list, examples=[["DELIVERY", "CLEANUP"]], description="Empty = all task types.")
+    home_area_id: Optional[str] = None
+    max_payload_kg: Optional[float] = None
+    sort_order: Optional[int] = None
+
+
+class RobotRead(BaseModel):
+    robot_id: str
+    name: Optional[str] = None
+    enabled: bool
+    capabilities: List[str]
+    home_area_id: Optional[str] = None
+    max_payload_kg: Optional[float] = None
+    sort_order: int
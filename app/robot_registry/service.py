@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from ..persistence.db import engine
+from .models import Robot, utc_now
+
+
+log = logging.getLogger("robot-registry")
+
+
+def env_robot_ids() -> List[str]:
+    """
+    Robot IDs from configuration (seed for an empty registry):
+      - env var ROBOT_IDS="id1,id2,id3"
+      - else app/secrets.py ROBOT_IDS or ROBOT_IDS_CSV
+      - else []
+    """
+    env_csv = os.getenv("ROBOT_IDS", "").strip()
+    if env_csv:
+        return [x.strip() for x in env_csv.split(",") if x.strip()]
+
+    try:
+        from .. import secrets  # type: ignore
+        if hasattr(secrets, "ROBOT_IDS") and isinstance(secrets.ROBOT_IDS, list):
+            return [str(x).strip() for x in secrets.ROBOT_IDS if str(x).strip()]
+        if hasattr(secrets, "ROBOT_IDS_CSV"):
+            csv = str(secrets.ROBOT_IDS_CSV).strip()
+            if csv:
+                return [x.strip() for x in csv.split(",") if x.strip()]
+    except Exception:
+        pass
+
+    return []
+
+
+def parse_capabilities(value: Any) -> FrozenSet[str]:
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    return frozenset(str(getattr(x, "value", x)).strip().upper() for x in items if str(getattr(x, "value", x)).strip())
+
+
+@dataclass(frozen=True)
+class RobotRecord:
+    robot_id: str
+    name: Optional[str]
+    enabled: bool
+    capabilities: FrozenSet[str]  # empty = all task types
+    home_area_id: Optional[str]
+    max_payload_kg: Optional[float]
+    sort_order: int
+
+    def can_serve(self, task_type: Any) -> bool:
+        if not self.capabilities or task_type is None:
+            return True
+        return str(getattr(task_type, "value", task_type)).upper() in self.capabilities
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "robot_id": self.robot_id,
+            "name": self.name,
+            "enabled": self.enabled,
+            "capabilities": sorted(self.capabilities),
+            "home_area_id": self.home_area_id,
+            "max_payload_kg": self.max_payload_kg,
+            "sort_order": self.sort_order,
+        }
+
+
+def _record(row: Robot) -> RobotRecord:
+    return RobotRecord(
+        robot_id=row.robot_id,
+        name=row.name,
+        enabled=bool(row.enabled),
+        capabilities=parse_capabilities(row.capabilities),
+        home_area_id=row.home_area_id,
+        max_payload_kg=row.max_payload_kg,
+        sort_order=int(row.sort_order or 0),
+    )
+
+
+class RobotRegistry:
+    """
+    In-memory snapshot of the Robot table. Reads (assignment, polling, preflight)
+    never touch the DB or the environment; the snapshot is swapped whole after
+    every registry write (RobotRegistryService) and at startup.
+
+    Until the first load, `loaded` is False and robot_ids() falls back to ROBOT_IDS.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._records: Tuple[RobotRecord, ...] = ()
+        self._by_id: Dict[str, RobotRecord] = {}
+        self.loaded = False
+        self.version = 0
+
+    def load(self, session: Session) -> int:
+        rows = session.exec(select(Robot).order_by(Robot.sort_order.asc(), Robot.robot_id.asc())).all()
+        records = tuple(_record(r) for r in rows)
+        with self._lock:
+            self._records = records
+            self._by_id = {r.robot_id: r for r in records}
+            self.loaded = True
+            self.version += 1
+        return len(records)
+
+    def bootstrap(self, eng: Any = None) -> int:
+        """
+        Seed an empty registry from ROBOT_IDS / secrets (all capabilities, config order),
+        then load the snapshot. A non-empty registry is the source of truth.
+        """
+        with Session(eng or engine) as session:
+            if session.exec(select(Robot).limit(1)).first() is None:
+                ids = env_robot_ids()
+                for i, rid in enumerate(ids):
+                    session.add(Robot(robot_id=rid, sort_order=i))
+                session.commit()
+                if ids:
+                    log.info("robot registry seeded from config: %s", ids)
+            return self.load(session)
+
+    # ---- reads ----
+    def robot_ids(self, enabled_only: bool = True) -> List[str]:
+        if not self.loaded:
+            return env_robot_ids()
+        records = self._records
+        return [r.robot_id for r in records if r.enabled or not enabled_only]
+
+    def get(self, robot_id: str) -> Optional[RobotRecord]:
+        return self._by_id.get(robot_id)
+
+    def area_of(self, robot_id: str) -> Optional[str]:
+        rec = self._by_id.get(robot_id)
+        return rec.home_area_id if rec else None
+
+    def can_serve(self, robot_id: str, task_type: Any) -> bool:
+        rec = self._by_id.get(robot_id)
+        # Unknown robot (registry not loaded / env fallback): no restriction
+        return True if rec is None else rec.can_serve(task_type)
+
+    def can_serve_any(self, robot_id: str, task_types: Iterable[Any]) -> bool:
+        rec = self._by_id.get(robot_id)
+        return True if rec is None else any(rec.can_serve(t) for t in task_types)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"loaded": self.loaded, "version": self.version, "robots": [r.to_dict() for r in self._records]}
+
+
+robot_registry = RobotRegistry()
+
+
+_UPSERT_FIELDS = {"name", "enabled", "capabilities", "home_area_id", "max_payload_kg", "sort_order"}
+
+
+class RobotRegistryService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def list_all(self) -> List[Robot]:
+        stmt = select(Robot).order_by(Robot.sort_order.asc(), Robot.robot_id.asc())
+        return list(self.session.exec(stmt).all())
+
+    def get(self, robot_id: str) -> Optional[Robot]:
+        return self.session.get(Robot, robot_id)
+
+    def upsert(self, robot_id: str, **fields: Any) -> Robot:
+        """
+        Create a robot, or update only the given fields of an existing one
+        (omitted fields keep their stored value; new robots get the model
+        defaults and go to the end of the assignment order).
+        Fields: name, enabled, capabilities, home_area_id, max_payload_kg, sort_order.
+        """
+        rid = (robot_id or "").strip()
+        if not rid:
+            raise ValueError("robot_id is required")
+        unknown = set(fields) - _UPSERT_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown robot fields: {sorted(unknown)}")
+
+        row = self.session.get(Robot, rid)
+        if row is None:
+            if fields.get("sort_order") is None:
+                last = self.session.exec(select(Robot.sort_order).order_by(Robot.sort_order.desc()).limit(1)).first()
+                fields["sort_order"] = 0 if last is None else int(last) + 1
+            row = Robot(robot_id=rid)
+        if "name" in fields:
+            row.name = fields["name"]
+        if "enabled" in fields:
+            row.enabled = bool(fields["enabled"])
+        if "capabilities" in fields:
+            row.capabilities = ",".join(sorted(parse_capabilities(fields["capabilities"] or ())))
+        if "home_area_id" in fields:
+            row.home_area_id = fields["home_area_id"]
+        if "max_payload_kg" in fields:
+            row.max_payload_kg = fields["max_payload_kg"]
+        if fields.get("sort_order") is not None:
+            row.sort_order = int(fields["sort_order"])
+        row.updated_at = utc_now()
+
+        self.session.add(row)
+        self.session.commit()
+        self.session.refresh(row)
+        robot_registry.load(self.session)
+        return row
+
+    def set_enabled(self, robot_id: str, enabled: bool) -> Optional[Robot]:
+        row = self.session.get(Robot, robot_id)
+        if row is None:
+            return None
+        row.enabled = bool(enabled)
+        row.updated_at = utc_now()
+        self.session.add(row)
+        self.session.commit()
+        self.session.refresh(row)
+        robot_registry.load(self.session)
+        return row
+
+    def delete(self, robot_id: str) -> bool:
+        row = self.session.get(Robot, robot_id)
+        if row is None:
+            return False
+        self.session.delete(row)
+        self.session.commit()
+        robot_registry.load(self.session)
+        return True
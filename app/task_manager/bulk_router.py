@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import logging
+
+from fastapi import APIRouter, Depends
+
+from ..auth_roles.deps import require_role
+from ..persistence.db import AsyncSession, get_async_session
+from ..realtime_bus.bus import publish_event_nowait
+from .bulk_schemas import BulkCreateRequest, BulkCreateResponse
+from .bulk_service import BulkTaskService
+
+
+router = APIRouter(prefix="/task-manager", tags=["task-manager"])
+logger = logging.getLogger("task-manager")
+
+
+@router.post("/tasks/bulk", response_model=BulkCreateResponse, dependencies=[Depends(require_role("operator"))])
+async def create_tasks_bulk(payload: BulkCreateRequest, session: AsyncSession = Depends(get_async_session)):
+    """
+    Create many tasks in one transaction (JSON body, unlike POST /tasks which uses query params).
+    Publishes a single queue.updated event for the whole batch.
+    """
+    svc = BulkTaskService(session.sync_session)
+    res = await session.run_sync(lambda _s: svc.create_many(payload.tasks))
+    logger.info("task.bulk_created count=%s ready=%s pending=%s", res["created"], res["ready"], res["pending"])
+
+    publish_event_nowait(
+        "queue.updated",
+        {"reason": "bulk_created", "created": res["created"], "ready": res["ready"], "pending": res["pending"]},
+        source="task-manager",
+    )
+
+    return BulkCreateResponse(
+        ok=True,
+        created=res["created"],
+        ready=res["ready"],
+        pending=res["pending"],
+        task_ids=res["task_ids"],
+    )
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from ..persistence.models import TaskType
+
+
+class BulkTaskSpec(BaseModel):
+    title: str
+    task_type: TaskType = TaskType.NAVIGATE
+    target_kind: str = "POI"
+    target_ref: str = ""
+    notes: Optional[str] = None
+    release_at: Optional[datetime] = Field(default=None, description="Future => PENDING until due; empty/past => READY.")
+    created_by: Optional[str] = None
+
+
+class BulkCreateRequest(BaseModel):
+    tasks: List[BulkTaskSpec] = Field(..., min_length=1, max_length=5000)
+
+
+class BulkCreateResponse(BaseModel):
+    ok: bool
+    created: int
+    ready: int
+    pending: int
+    task_ids: List[int]
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from ..persistence.models import Task, TaskStatus
+from ..queue_manager.ranking import rank_key_for
+from .bulk_schemas import BulkTaskSpec
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # Naive timestamps are treated as UTC (same rule as the queue manager)
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+class BulkTaskService:
+    """
+    Bulk task ingestion: one transaction, one executemany INSERT.
+    """
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def build_rows(self, specs: List[BulkTaskSpec]) -> List[Dict[str, Any]]:
+        now = utc_now()
+        rows: List[Dict[str, Any]] = []
+        for spec in specs:
+            release_at = _as_utc(spec.release_at) if spec.release_at is not None else None
+            status = TaskStatus.PENDING if (release_at is not None and release_at > now) else TaskStatus.READY
+            rows.append(
+                {
+                    "created_at": now,
+                    "updated_at": now,
+                    "status": status,
+                    "task_type": spec.task_type,
+                    "title": spec.title,
+                    "notes": spec.notes,
+                    "target_kind": (spec.target_kind or "POI").strip(),
+                    "target_ref": (spec.target_ref or "").strip(),
+                    "release_at": release_at,
+                    "assigned_robot_id": None,
+                    "created_by": spec.created_by or "operator",
+                    # executemany bypasses mapper events, so set the queue key here
+                    "rank_key": rank_key_for(spec.task_type, now),
+                }
+            )
+        return rows
+
+    def create_many(self, specs: List[BulkTaskSpec]) -> Dict[str, Any]:
+        rows = self.build_rows(specs)
+        try:
+            res = self.session.execute(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows)
+            task_ids = [int(r[0]) for r in res.all()]
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        pending = sum(1 for r in rows if r["status"] == TaskStatus.PENDING)
+        return {
+            "created": len(task_ids),
+            "ready": len(task_ids) - pending,
+            "pending": pending,
+            "task_ids": task_ids,
+        }
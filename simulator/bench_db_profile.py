@@ -0,0 +1,282 @@
+"""
+Read/write concurrency benchmark for the SQLite storage profiles.
+
+Two modes:
+  --mode db    (default) offline: replays the /dashboard/overview read queries
+               against the /orchestrator/tick write pattern on a scratch copy
+               of the DB, once per profile ("legacy" vs "production").
+  --mode http  against a running backend: hammers GET /dashboard/overview
+               while POSTing /orchestrator/tick. Run it once with the backend
+               started under DB_PROFILE=legacy and once under DB_PROFILE=production.
+
+Examples:
+  python -m simulator.bench_db_profile --seconds 10
+  python -m simulator.bench_db_profile --mode http --base http://127.0.0.1:8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round((p / 100.0) * (len(values) - 1))))
+    return values[idx]
+
+
+def _summary(name: str, lat_ms: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "ops": len(lat_ms),
+        "ops_per_s": round(len(lat_ms) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(_pct(lat_ms, 50), 2),
+        "p95_ms": round(_pct(lat_ms, 95), 2),
+        "p99_ms": round(_pct(lat_ms, 99), 2),
+        "max_ms": round(max(lat_ms), 2) if lat_ms else 0.0,
+        "mean_ms": round(statistics.fmean(lat_ms), 2) if lat_ms else 0.0,
+        "errors": errors,
+    }
+
+
+# ----------------------------
+# Offline mode (engine level)
+# ----------------------------
+def _seed(eng, tasks: int) -> None:
+    from sqlmodel import Session, SQLModel
+
+    from app.persistence.models import Task, TaskStatus, TaskType, WorkflowRun, WorkflowRunStatus, WorkflowStep, WorkflowStepType
+
+    SQLModel.metadata.create_all(eng)
+    now = datetime.now(timezone.utc)
+    with Session(eng) as s:
+        for i in range(tasks):
+            status = TaskStatus.DONE if i % 3 else TaskStatus.READY
+            t = Task(title=f"bench-{i}", task_type=TaskType.DELIVERY, status=status, created_at=now - timedelta(seconds=i))
+            s.add(t)
+        s.commit()
+        for i in range(tasks // 3):
+            r = WorkflowRun(task_id=i + 1, robot_id=f"R{i % 8}", status=WorkflowRunStatus.DONE, total_steps=4)
+            s.add(r)
+        s.commit()
+        for run_id in range(1, tasks // 3 + 1):
+            for idx in range(4):
+                s.add(WorkflowStep(run_id=run_id, step_index=idx, step_type=WorkflowStepType.NAVIGATE))
+        s.commit()
+
+
+def _dashboard_read(eng) -> None:
+    from sqlmodel import Session, select
+
+    from app.persistence.models import Task, TaskStatus, WorkflowRun, WorkflowRunStatus, WorkflowStep
+
+    with Session(eng) as s:
+        runs = list(s.exec(select(WorkflowRun).where(WorkflowRun.status == WorkflowRunStatus.RUNNING)).all())
+        for r in runs:
+            list(s.exec(select(WorkflowStep).where(WorkflowStep.run_id == r.id)).all())
+        list(s.exec(select(Task).where(Task.status == TaskStatus.READY)).all())
+        list(s.exec(select(Task)).all())  # stats scan
+        list(s.exec(select(Task).order_by(Task.created_at.desc()).limit(200)).all())
+
+
+def _tick_write(eng, robot_n: int) -> None:
+    from sqlalchemy import update
+    from sqlmodel import Session
+
+    from app.persistence.models import Task, TaskStatus, TaskType, WorkflowRun, WorkflowStep, WorkflowStepType
+
+    now = datetime.now(timezone.utc)
+    with Session(eng) as s:
+        # promote + claim + start_run, committed like the real tick does
+        t = Task(title=f"tick-{robot_n}", task_type=TaskType.NAVIGATE, status=TaskStatus.PENDING)
+        s.add(t)
+        s.commit()
+        s.exec(update(Task).where(Task.id == t.id).values(status=TaskStatus.READY, updated_at=now))
+        s.commit()
+        s.exec(update(Task).where(Task.id == t.id).values(status=TaskStatus.ASSIGNED, assigned_robot_id=f"R{robot_n % 8}"))
+        s.commit()
+        run = WorkflowRun(task_id=t.id, robot_id=f"R{robot_n % 8}", total_steps=2)
+        s.add(run)
+        s.commit()
+        s.add(WorkflowStep(run_id=run.id, step_index=0, step_type=WorkflowStepType.NAVIGATE))
+        s.add(WorkflowStep(run_id=run.id, step_index=1, step_type=WorkflowStepType.MANUAL_CONFIRM))
+        s.commit()
+
+
+def run_db_mode(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.persistence.db import make_engine, storage_settings
+
+    results: List[Dict[str, Any]] = []
+    tmpdir = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        for profile in ("legacy", "production"):
+            path = os.path.join(tmpdir, f"{profile}.db")
+            if args.source and os.path.exists(args.source):
+                shutil.copyfile(args.source, path)
+            eng = make_engine(f"sqlite:///{path}", profile=profile)
+            _seed(eng, args.tasks)
+
+            stop = threading.Event()
+            read_lat: List[float] = []
+            write_lat: List[float] = []
+            errs = {"read": 0, "write": 0}
+            lock = threading.Lock()
+
+            def reader() -> None:
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    try:
+                        _dashboard_read(eng)
+                        with lock:
+                            read_lat.append((time.perf_counter() - t0) * 1000.0)
+                    except Exception:
+                        with lock:
+                            errs["read"] += 1
+
+            def writer() -> None:
+                n = 0
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    try:
+                        _tick_write(eng, n)
+                        with lock:
+                            write_lat.append((time.perf_counter() - t0) * 1000.0)
+                    except Exception:
+                        with lock:
+                            errs["write"] += 1
+                    n += 1
+                    time.sleep(args.tick_interval)
+
+            threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+            threads.append(threading.Thread(target=writer))
+            t_start = time.perf_counter()
+            for th in threads:
+                th.start()
+            time.sleep(args.seconds)
+            stop.set()
+            for th in threads:
+                th.join()
+            elapsed = time.perf_counter() - t_start
+
+            results.append({
+                "profile": profile,
+                "storage": storage_settings(eng),
+                "overview": _summary("dashboard.overview (reads)", read_lat, errs["read"], elapsed),
+                "tick": _summary("orchestrator.tick (writes)", write_lat, errs["write"], elapsed),
+            })
+            eng.dispose()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
+
+
+# ----------------------------
+# HTTP mode (running backend)
+# ----------------------------
+def _http(method: str, url: str, api_key: str) -> int:
+    req = urllib.request.Request(url, headers={"X-API-Key": api_key}, method=method)
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        resp.read()
+        return resp.status
+
+
+def run_http_mode(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    base = args.base.rstrip("/")
+    stop = threading.Event()
+    read_lat: List[float] = []
+    write_lat: List[float] = []
+    errs = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def reader() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                _http("GET", f"{base}/dashboard/overview?limit=200", args.api_key)
+                with lock:
+                    read_lat.append((time.perf_counter() - t0) * 1000.0)
+            except Exception:
+                with lock:
+                    errs["read"] += 1
+
+    def writer() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                _http("POST", f"{base}/orchestrator/tick?max_assignments=2", args.api_key)
+                with lock:
+                    write_lat.append((time.perf_counter() - t0) * 1000.0)
+            except Exception:
+                with lock:
+                    errs["write"] += 1
+            time.sleep(args.tick_interval)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads.append(threading.Thread(target=writer))
+    t_start = time.perf_counter()
+    for th in threads:
+        th.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t_start
+
+    storage = None
+    try:
+        req = urllib.request.Request(f"{base}/preflight/check", headers={"X-API-Key": args.api_key})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            storage = (json.loads(resp.read().decode("utf-8", "ignore")).get("db") or {}).get("storage")
+    except Exception:
+        pass
+
+    return [{
+        "profile": (storage or {}).get("profile"),
+        "storage": storage,
+        "overview": _summary("GET /dashboard/overview", read_lat, errs["read"], elapsed),
+        "tick": _summary("POST /orchestrator/tick", write_lat, errs["write"], elapsed),
+    }]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark dashboard reads vs orchestrator tick writes per storage profile.")
+    ap.add_argument("--mode", choices=("db", "http"), default="db")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--readers", type=int, default=4, help="Concurrent dashboard readers")
+    ap.add_argument("--tick-interval", type=float, default=0.05, help="Sleep between tick writes (s)")
+    ap.add_argument("--tasks", type=int, default=3000, help="Seed size for --mode db")
+    ap.add_argument("--source", default="", help="Optional DB file to copy as the starting point for --mode db")
+    ap.add_argument("--base", default="http://127.0.0.1:8000")
+    ap.add_argument("--api-key", default="dev-admin-key")
+    args = ap.parse_args()
+
+    results = run_db_mode(args) if args.mode == "db" else run_http_mode(args)
+    for r in results:
+        print(f"== profile={r['profile']}")
+        for key in ("overview", "tick"):
+            s = r[key]
+            print(
+                f"  {s['name']:<32} ops={s['ops']:<6} ops/s={s['ops_per_s']:<8} "
+                f"p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms max={s['max_ms']}ms errors={s['errors']}"
+            )
+    print(json.dumps(results, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
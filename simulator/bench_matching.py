@@ -0,0 +1,116 @@
+"""
+Benchmark for the min-cost robot/task matching (assignment policy "min_cost").
+
+Random fleet + queue on a restaurant-sized floor; compares the solver
+backends (SciPy, pure-Python Hungarian, and the greedy fallback used above
+ASSIGN_MATCH_MAX_CELLS without SciPy) against the greedy "priority" policy
+(free robots take the queue head in ROBOT_IDS order) on total cost and
+travel distance.
+
+Examples:
+  python -m simulator.bench_matching
+  python -m simulator.bench_matching --robots 50 --tasks 500 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.assignment_engine.matching import (  # noqa: E402
+    MatchingWeights,
+    RobotSlot,
+    TaskSlot,
+    _scipy_lsa,
+    build_cost_matrix,
+    solve_assignment,
+)
+
+
+def _scenario(robots: int, tasks: int, size_m: float, seed: int) -> Tuple[List[RobotSlot], List[TaskSlot]]:
+    rnd = random.Random(seed)
+    fleet = [
+        RobotSlot(robot_id=f"R{i}", x=rnd.uniform(0, size_m), y=rnd.uniform(0, size_m), battery=rnd.uniform(0.1, 1.0))
+        for i in range(robots)
+    ]
+    queue = [
+        TaskSlot(task_id=i + 1, priority=rnd.choice([100, 80, 60, 30, 10, 5]) + rnd.uniform(0, 3), x=rnd.uniform(0, size_m), y=rnd.uniform(0, size_m))
+        for i in range(tasks)
+    ]
+    queue.sort(key=lambda t: -t.priority)
+    return fleet, queue
+
+
+def _score(pairs: List[Tuple[int, int]], cost: List[List[float]], fleet: List[RobotSlot], queue: List[TaskSlot]) -> Dict[str, float]:
+    dist = [math.hypot(fleet[r].x - queue[c].x, fleet[r].y - queue[c].y) for r, c in pairs]
+    return {
+        "total_cost": round(sum(cost[r][c] for r, c in pairs), 2),
+        "mean_distance_m": round(statistics.fmean(dist), 2) if dist else 0.0,
+        "mean_priority": round(statistics.fmean(queue[c].priority for _, c in pairs), 2) if pairs else 0.0,
+    }
+
+
+def _timed(fn, repeat: int) -> Tuple[Any, float]:
+    best = float("inf")
+    out = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, (time.perf_counter() - t0) * 1000.0)
+    return out, round(best, 2)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fleet, queue = _scenario(args.robots, args.tasks, args.size, args.seed)
+    weights = MatchingWeights.from_env()
+
+    cost, build_ms = _timed(lambda: build_cost_matrix(fleet, queue, weights), args.repeat)
+    greedy = [(i, i) for i in range(min(len(fleet), len(queue)))]
+
+    res: Dict[str, Any] = {
+        "robots": args.robots,
+        "tasks": args.tasks,
+        "cost_matrix_ms": build_ms,
+        "greedy_priority": _score(greedy, cost, fleet, queue),
+    }
+
+    pairs, py_ms = _timed(lambda: solve_assignment(cost, backend="python"), args.repeat)
+    res["min_cost_python"] = {"solve_ms": py_ms, **_score(pairs, cost, fleet, queue)}
+
+    gr_pairs, gr_ms = _timed(lambda: solve_assignment(cost, backend="greedy"), args.repeat)
+    res["min_cost_greedy"] = {"solve_ms": gr_ms, **_score(gr_pairs, cost, fleet, queue)}
+
+    if _scipy_lsa is not None:
+        sp_pairs, sp_ms = _timed(lambda: solve_assignment(cost, backend="scipy"), args.repeat)
+        res["min_cost_scipy"] = {"solve_ms": sp_ms, **_score(sp_pairs, cost, fleet, queue)}
+        res["backends_agree"] = abs(res["min_cost_scipy"]["total_cost"] - res["min_cost_python"]["total_cost"]) < 1e-6
+    else:
+        res["min_cost_scipy"] = None
+
+    return res
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark min-cost robot/task matching.")
+    ap.add_argument("--robots", type=int, default=50)
+    ap.add_argument("--tasks", type=int, default=500)
+    ap.add_argument("--size", type=float, default=40.0, help="Floor size (m, square)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+"""
+SQL statement budget check for READY-queue construction.
+
+Seeds a scratch DB with N READY tasks (a share of them with operator
+overrides), builds the queue once, and counts the statements issued.
+The queue must cost a constant number of statements, not one per task.
+Also times the legacy per-task override lookup for comparison.
+
+Exit code is non-zero when the budget is exceeded. The budget itself is
+enforced in tests/test_queue_queries.py; this script is for timings at scale.
+
+Example:
+  python -m simulator.bench_queue_queries --tasks 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class StatementCounter:
+    def __init__(self, eng) -> None:
+        self.eng = eng
+        self.statements: List[str] = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "StatementCounter":
+        from sqlalchemy import event
+
+        event.listen(self.eng, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        from sqlalchemy import event
+
+        event.remove(self.eng, "before_cursor_execute", self._on_execute)
+
+
+def _seed(eng, tasks: int, override_every: int) -> None:
+    from sqlmodel import Session, SQLModel
+
+    from app.persistence.migrations import run_migrations
+    from app.persistence.models import TaskType
+    from app.priority_manager.service import PriorityService
+    from app.task_manager.bulk_schemas import BulkTaskSpec
+    from app.task_manager.bulk_service import BulkTaskService
+
+    SQLModel.metadata.create_all(eng)
+    run_migrations(eng)
+    types = list(TaskType)
+    with Session(eng) as s:
+        specs = [BulkTaskSpec(title=f"q-{i}", task_type=types[i % len(types)]) for i in range(tasks)]
+        ids = BulkTaskService(s).create_many(specs)["task_ids"]
+    with Session(eng) as s:
+        for task_id in ids[::max(1, override_every)]:
+            PriorityService.set_override(s, task_id, 50)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from sqlmodel import Session, select
+
+    from app.persistence.db import make_engine
+    from app.persistence.models import Task, TaskStatus
+    from app.priority_manager.models import TaskPriorityOverride
+    from app.priority_manager.service import PriorityService
+    from app.queue_manager.service import QueueManagerService
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_queue_")
+    try:
+        eng = make_engine(f"sqlite:///{os.path.join(tmpdir, 'queue.db')}")
+        _seed(eng, args.tasks, args.override_every)
+
+        with Session(eng) as s, StatementCounter(eng) as counter:
+            t0 = time.perf_counter()
+            queue = QueueManagerService(s).get_ready_queue()
+            # Per-request cache: repeated lookups after the queue build are free
+            for item in queue:
+                PriorityService.get_override(s, item["task_id"])
+            joined_ms = (time.perf_counter() - t0) * 1000.0
+
+        # Legacy shape: one PK lookup per READY task
+        with Session(eng) as s, StatementCounter(eng) as legacy:
+            t0 = time.perf_counter()
+            tasks = list(s.exec(select(Task).where(Task.status == TaskStatus.READY)).all())
+            for t in tasks:
+                s.get(TaskPriorityOverride, t.id)
+            legacy_ms = (time.perf_counter() - t0) * 1000.0
+
+        eng.dispose()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return {
+        "tasks": args.tasks,
+        "queue_len": len(queue),
+        "statements": len(counter.statements),
+        "budget": args.budget,
+        "ok": len(counter.statements) <= args.budget and len(queue) == args.tasks,
+        "queue_ms": round(joined_ms, 2),
+        "legacy_statements": len(legacy.statements),
+        "legacy_ms": round(legacy_ms, 2),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Count SQL statements issued to build the READY queue.")
+    ap.add_argument("--tasks", type=int, default=1000)
+    ap.add_argument("--override-every", type=int, default=7, help="Give every Nth task an operator override")
+    ap.add_argument("--budget", type=int, default=1, help="Max statements allowed for one queue build")
+    args = ap.parse_args()
+
+    res = run(args)
+    print(json.dumps(res, indent=2))
+    if not res["ok"]:
+        print(f"FAIL: queue build issued {res['statements']} statements (budget {res['budget']})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,6 @@ import argparse
 import json
 import random
 import re
-import urllib.parse
 import urllib.request
 from datetime import datetime, timezone, timedelta
 
@@ -21,6 +20,21 @@ def request(method: str, url: str, api_key: str, body: dict | None = None):
         return resp.status, raw
 
 
+def post_bulk(base: str, api_key: str, specs: list, batch_size: int) -> int:
+    """
+    Create tasks through POST /task-manager/tasks/bulk (one transaction per chunk).
+    """
+    failed = 0
+    step = max(1, batch_size)
+    for i in range(0, len(specs), step):
+        chunk = specs[i:i + step]
+        status, raw = request("POST", f"{base}/task-manager/tasks/bulk", api_key, body={"tasks": chunk})
+        print(status, raw)
+        if status != 200:
+            failed += len(chunk)
+    return failed
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Generate random tasks for queue testing.")
     ap.add_argument("--base", default="http://127.0.0.1:8000", help="App base URL")
@@ -49,6 +63,7 @@ def main() -> int:
     ap.add_argument("--delivery-gap", type=float, default=120.0, help="Seconds after order before delivery")
     ap.add_argument("--cleanup-gap", type=float, default=180.0, help="Seconds after delivery before cleanup")
     ap.add_argument("--target-kind", default="POI", help="Target kind")
+    ap.add_argument("--batch-size", type=int, default=500, help="Tasks per bulk create request")
     args = ap.parse_args()
 
     # fetch POIs
@@ -83,6 +98,8 @@ def main() -> int:
         table_refs = ["1"]
     table_refs = sorted(table_refs, key=lambda x: int(re.sub(r"\\D", "", x) or 0))
 
+    specs = []
+
     if args.restaurant:
         max_tables = args.count if args.count > 0 else len(table_refs)
         table_refs = table_refs[:max_tables]
@@ -97,17 +114,14 @@ def main() -> int:
                 ("DELIVERY", delivery_time),
                 ("CLEANUP", cleanup_time),
             ):
-                params = {
+                specs.append({
                     "title": f"{args.title_prefix}-T{tref}-{task_type}",
                     "task_type": task_type,
                     "target_kind": "TABLE",
                     "target_ref": tref,
                     "release_at": when.isoformat(),
-                }
-                url = f"{args.base}/task-manager/tasks?" + urllib.parse.urlencode(params)
-                status, raw = request("POST", url, args.api_key)
-                print(status, raw)
-        return 0
+                })
+        return 1 if post_bulk(args.base, args.api_key, specs, args.batch_size) else 0
 
     if args.sequence:
         max_tables = args.count if args.count > 0 else len(table_refs)
@@ -118,17 +132,14 @@ def main() -> int:
             for task_type in ("ORDERING", "DELIVERY", "CLEANUP"):
                 release_at = (now + timedelta(seconds=offset)).isoformat()
                 offset += args.sequence_gap
-                params = {
+                specs.append({
                     "title": f"{args.title_prefix}-T{tref}-{task_type}",
                     "task_type": task_type,
                     "target_kind": "TABLE",
                     "target_ref": tref,
                     "release_at": release_at,
-                }
-                url = f"{args.base}/task-manager/tasks?" + urllib.parse.urlencode(params)
-                status, raw = request("POST", url, args.api_key)
-                print(status, raw)
-        return 0
+                })
+        return 1 if post_bulk(args.base, args.api_key, specs, args.batch_size) else 0
 
     types = [t.strip().upper() for t in args.task_types.split(",") if t.strip()]
     if args.task_type and args.task_type.strip():
@@ -143,17 +154,14 @@ def main() -> int:
             target_kind = args.target_kind
             target_ref = random.choice(poi_ids)
         title = f"{args.title_prefix}-{i+1}"
-        params = {
+        specs.append({
             "title": title,
             "task_type": task_type,
             "target_kind": target_kind,
             "target_ref": target_ref,
-        }
-        url = f"{args.base}/task-manager/tasks?" + urllib.parse.urlencode(params)
-        status, raw = request("POST", url, args.api_key)
-        print(status, raw)
+        })
 
-    return 0
+    return 1 if post_bulk(args.base, args.api_key, specs, args.batch_size) else 0
 
 
 if __name__ == "__main__":
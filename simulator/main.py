@@ -542,8 +542,10 @@ def _status_is(value: Any, status: str) -> bool:
 
 
 @app.get("/sim/queue")
-def sim_queue():
-    status, raw = _app_request("GET", "/queue-manager/queue")
+def sim_queue(limit: int = 20):
+    # Only the head is displayed; let the backend page/project it in SQL
+    fields = "task_id,title,task_type,status,effective_priority"
+    status, raw = _app_request("GET", f"/queue-manager/queue?limit={max(1, min(int(limit), 1000))}&fields={fields}")
     if status != 200:
         return {"ok": False, "status": status, "error": raw, "queue": []}
     try:
@@ -660,6 +662,7 @@ def sim_restart(manual: bool = True):
     created = 0
     failed = 0
     last_error = None
+    specs: List[Dict[str, Any]] = []
 
     for i, tref in enumerate(table_refs):
         order_time = now + timedelta(seconds=i * _SIM_RESTART_ARRIVAL_GAP)
@@ -683,21 +686,22 @@ def sim_restart(manual: bool = True):
             else:
                 release_at = when
 
-            params = {
+            specs.append({
                 "title": f"{_SIM_RESTART_TITLE_PREFIX}-T{tref}-{task_type}",
                 "task_type": task_type,
                 "target_kind": "TABLE",
                 "target_ref": tref,
-            }
-            if release_at is not None:
-                params["release_at"] = release_at.isoformat()
-            path = "/task-manager/tasks?" + urllib.parse.urlencode(params)
-            status, raw = _app_request("POST", path)
-            if status == 200:
-                created += 1
-            else:
-                failed += 1
-                last_error = raw
+                "release_at": None if release_at is None else release_at.isoformat(),
+            })
+
+    # One request / one transaction for the whole seed
+    if specs:
+        status, payload = _app_request_json("POST", "/task-manager/tasks/bulk", {"tasks": specs})
+        if status == 200 and isinstance(payload, dict):
+            created = int(payload.get("created") or 0)
+        else:
+            failed = len(specs)
+            last_error = payload
 
     return {
         "ok": failed == 0,
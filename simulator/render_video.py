@@ -113,7 +113,7 @@ def main() -> int:
 
     for _ in range(total_frames):
         state = fetch_json("/sim/state")
-        queue = fetch_json("/sim/queue")
+        queue = fetch_json(f"/sim/queue?limit={MAX_QUEUE}")
         frame = draw_frame(state, queue)
         writer.write(frame)
         time.sleep(1.0 / FPS)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, SQLModel
+
+import app.archive.models  # noqa: F401  (register tables with the metadata)
+import app.poi_mapping.models  # noqa: F401
+import app.priority_manager.models  # noqa: F401
+import app.robot_registry.models  # noqa: F401
+from app.persistence.db import make_engine
+from app.persistence.migrations import run_migrations
+from app.persistence.models import WorkflowRun, WorkflowRunStatus
+from app.robot_registry.service import robot_registry
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Fresh SQLite file DB built the way init_db builds it (create_all + migrations)."""
+    eng = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(eng)
+    run_migrations(eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def session(db_engine):
+    with Session(db_engine) as s:
+        yield s
+
+
+@pytest.fixture
+def registry():
+    """The process-wide robot registry snapshot, reset around the test (ROBOT_IDS until loaded)."""
+    robot_registry.__init__()
+    yield robot_registry
+    robot_registry.__init__()
+
+
+class FakeRobotAPI:
+    """RobotAPIService stand-in serving fixed robot states."""
+    def __init__(self, states):
+        self.states = states
+
+    async def get_state(self, robot_id):
+        return self.states[robot_id]
+
+
+@pytest.fixture
+def fake_robot_api():
+    return FakeRobotAPI
+
+
+class FakeWorkflowEngine:
+    """WorkflowEngineService stand-in: start_run records a RUNNING run, tick advances nothing."""
+    def __init__(self, session, *_args):
+        self.session = session
+
+    async def start_run(self, task_id, robot_id):
+        run = WorkflowRun(task_id=task_id, robot_id=robot_id, status=WorkflowRunStatus.RUNNING, total_steps=1)
+        self.session.add(run)
+        self.session.commit()
+        return SimpleNamespace(id=run.id)
+
+    async def tick(self):
+        return {}
+
+
+@pytest.fixture
+def fake_workflow_engine(monkeypatch):
+    import app.assignment_engine.service as assignment_service
+    import app.orchestrator.service as orchestrator_service
+
+    monkeypatch.setattr(assignment_service, "WorkflowEngineService", FakeWorkflowEngine)
+    monkeypatch.setattr(orchestrator_service, "WorkflowEngineService", FakeWorkflowEngine)
+    return FakeWorkflowEngine
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from sqlmodel import Session, SQLModel, select
+
+from app.archive.service import ArchiveService
+from app.persistence.db import make_engine
+from app.persistence.migrations import run_migrations
+from app.persistence.models import (
+    Task,
+    TaskStatus,
+    TaskType,
+    WorkflowRun,
+    WorkflowRunStatus,
+    WorkflowStep,
+    WorkflowStepType,
+)
+from app.queue_manager.service import QueueManagerService
+
+
+def _task_with_run(session: Session, title: str, status: TaskStatus, run_status: WorkflowRunStatus) -> Task:
+    task = Task(title=title, task_type=TaskType.DELIVERY, status=status, assigned_robot_id="R1")
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+    run = WorkflowRun(task_id=task.id, robot_id="R1", status=run_status, total_steps=1)
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    session.add(WorkflowStep(run_id=run.id, step_index=0, step_type=WorkflowStepType.NAVIGATE, label=title))
+    session.commit()
+    return task
+
+
+def test_history_not_mixed_with_new_task_after_archive_all(session):
+    old = _task_with_run(session, "old", TaskStatus.DONE, WorkflowRunStatus.DONE)
+    old_id = old.id
+
+    res = ArchiveService(session).archive_older_than(timedelta(seconds=-60))
+    assert res["tasks"] == 1 and res["runs"] == 1 and res["steps"] == 1
+    assert session.exec(select(Task)).all() == []
+
+    new = _task_with_run(session, "new", TaskStatus.ASSIGNED, WorkflowRunStatus.RUNNING)
+    assert new.id != old_id
+
+    history = ArchiveService(session).get_task_history(old_id)
+    assert history is not None
+    assert history["task"].title == "old"
+    assert [r["run"].task_id for r in history["runs"]] == [old_id]
+    assert [s.label for r in history["runs"] for s in r["steps"]] == ["old"]
+
+    assert ArchiveService(session).get_task_history(new.id) is None
+
+
+def test_migration_rebuilds_legacy_tables_past_archived_ids(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    # Pre-AUTOINCREMENT schema: task/workflowrun as plain INTEGER PRIMARY KEY tables
+    for table in (Task.__table__, WorkflowRun.__table__):
+        table.dialect_options["sqlite"]["autoincrement"] = False
+    try:
+        SQLModel.metadata.create_all(eng)
+    finally:
+        for table in (Task.__table__, WorkflowRun.__table__):
+            table.dialect_options["sqlite"]["autoincrement"] = True
+
+    with Session(eng) as s:
+        _task_with_run(s, "old", TaskStatus.DONE, WorkflowRunStatus.DONE)
+        ArchiveService(s).archive_older_than(timedelta(seconds=-60))
+
+    assert 5 in run_migrations(eng)
+    with eng.connect() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'task'").scalar()
+    assert "AUTOINCREMENT" in ddl.upper()
+
+    with Session(eng) as s:
+        new = _task_with_run(s, "new", TaskStatus.ASSIGNED, WorkflowRunStatus.RUNNING)
+        assert new.id == 2
+        assert s.exec(select(WorkflowRun)).one().id == 2
+    eng.dispose()
+
+
+def test_stats_unchanged_across_an_archive_pass(session):
+    svc = QueueManagerService(session)
+    _task_with_run(session, "done", TaskStatus.DONE, WorkflowRunStatus.DONE)
+    _task_with_run(session, "canceled", TaskStatus.CANCELED, WorkflowRunStatus.CANCELED)
+    _task_with_run(session, "live", TaskStatus.ASSIGNED, WorkflowRunStatus.RUNNING)
+    before = svc.stats()
+    assert (before["DONE"], before["CANCELED"], before["TOTAL"]) == (1, 1, 3)
+
+    assert ArchiveService(session).archive_older_than(timedelta(seconds=-60))["tasks"] == 2
+    assert svc.stats() == before
+    # The periodic recount agrees with the trigger-maintained counters
+    assert svc.reconcile_stats() == {}
+    assert svc.stats() == before
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import app.assignment_engine.matching as matching
+from app.assignment_engine.matching import solve_assignment
+
+
+def test_python_fallback_is_capped(monkeypatch):
+    monkeypatch.setattr(matching, "_scipy_lsa", None)
+    monkeypatch.setenv("ASSIGN_MATCH_MAX_CELLS", "6")
+    small = [[4.0, 1.0, 3.0], [2.0, 0.0, 5.0]]
+    big = [[4.0, 1.0, 3.0, 9.0], [2.0, 0.0, 5.0, 9.0]]
+
+    # Within the cap: optimal (1 + 2 beats greedy's 0 + 3)
+    assert solve_assignment(small) == [(0, 1), (1, 0)]
+    # Above it: greedy cheapest-pair, still one distinct task per robot
+    assert solve_assignment(big) == [(0, 2), (1, 1)]
+    assert solve_assignment(big, backend="python") == [(0, 1), (1, 0)]
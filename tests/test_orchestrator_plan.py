@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlmodel import select
+
+import app.orchestrator.service as orchestrator_service
+from app.common.fleet_state import fleet_state
+from app.orchestrator.service import OrchestratorService
+from app.persistence.models import Task, TaskStatus, TaskType
+from app.poi_mapping.models import PoiMapping
+from app.robot_registry.service import RobotRegistryService
+
+
+@pytest.fixture
+def sharded_fleet(monkeypatch, db_engine, session, registry, fake_workflow_engine, fake_robot_api):
+    monkeypatch.setenv("ORCHESTRATOR_SHARDING", "1")
+    monkeypatch.setattr(orchestrator_service, "engine", db_engine)
+
+    # Area A has two robots, B one and no work, C work but no robot
+    for rid, area in (("A1", "A"), ("A2", "A"), ("B1", "B")):
+        RobotRegistryService(session).upsert(rid, home_area_id=area)
+    session.add(PoiMapping(kind="TABLE", ref="1", poi_id="p1", area_id="A"))
+    session.add(PoiMapping(kind="TABLE", ref="2", poi_id="p2", area_id="C"))
+    for ref in ("1", "1", "2", "1"):
+        session.add(Task(title="t", task_type=TaskType.DELIVERY, status=TaskStatus.READY, target_kind="TABLE", target_ref=ref))
+    session.commit()
+
+    states = {rid: {"online": True} for rid in ("A1", "A2", "B1")}
+    fleet_state.clear()
+    for rid, state in states.items():
+        fleet_state.put(rid, state)
+    yield fake_robot_api(states)
+    fleet_state.clear()
+
+
+def test_sharded_dry_run_predicts_the_real_tick(session, sharded_fleet):
+    svc = OrchestratorService(sharded_fleet, None)
+
+    async def main():
+        plan = await svc.tick(max_assignments=5, dry_run=True)
+        tick = await svc.tick(max_assignments=5)
+        return plan, tick
+
+    plan, tick = asyncio.run(main())
+
+    planned = sorted((p["task_id"], p["robot_id"]) for p in plan["plan"])
+    session.expire_all()
+    assigned = sorted(
+        (t.id, t.assigned_robot_id) for t in session.exec(select(Task).where(Task.status == TaskStatus.ASSIGNED)).all()
+    )
+    # B1 has nothing in its own area: the catch-all gives it area C's task
+    assert assigned == [(1, "A1"), (2, "A2"), (3, "B1")]
+    assert planned == assigned
+    assert plan["planned"] == tick["assigned"] == 3
+    assert plan["shards"]["other"]["planned"] == 1
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from app.assignment_engine.busy_index import claim_task_stmt
+from app.persistence.migrations import HOT_QUERIES, explain_hot_queries
+from app.queue_manager.service import QueueManagerService, utc_now
+
+
+SERVICE_QUERIES = {"ready_queue", "ready_queue_cursor", "ready_queue_claimable_area", "ready_head", "pending_due", "claim"}
+
+
+def test_hot_queries_never_scan_or_sort(db_engine):
+    plans = explain_hot_queries(db_engine)
+    assert [p["name"] for p in plans] == [q["name"] for q in HOT_QUERIES]
+    assert SERVICE_QUERIES <= {p["name"] for p in plans}
+    for p in plans:
+        assert not any(d.startswith("SCAN") for d in p["plan"]), (p["name"], p["plan"])
+        if p["name"] in SERVICE_QUERIES:
+            assert not any("TEMP B-TREE" in d for d in p["plan"]), (p["name"], p["plan"])
+
+
+def test_promotion_seeks_release_at(db_engine):
+    # O(due), not O(pending): both OR terms seek on (status, release_at)
+    (plan,) = explain_hot_queries(db_engine, ["pending_due"])
+    assert plan["plan"] and all("ix_task_pending_release" in d for d in plan["plan"] if d.startswith("SEARCH"))
+    assert any("release_at<?" in d for d in plan["plan"]), plan["plan"]
+
+
+def test_hot_queries_are_index_backed(db_engine):
+    bad = {p["name"]: p["plan"] for p in explain_hot_queries(db_engine) if not p["ok"]}
+    assert bad == {}
+
+
+def test_statements_issued_by_services_are_index_backed(db_engine, session):
+    # Capture what the services actually send (bound parameters and all), then EXPLAIN it
+    issued = []
+
+    def _capture(_conn, _cursor, statement, parameters, _ctx, _many):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")) and "task" in statement:
+            issued.append((statement, parameters))
+
+    event.listen(db_engine, "before_cursor_execute", _capture)
+    try:
+        svc = QueueManagerService(session)
+        page = svc.get_ready_queue_page(limit=10)
+        svc.get_ready_queue_page(limit=10, cursor=page["next_cursor"] or None)
+        svc.get_ready_queue_page(limit=10, fields=["task_id", "task_type"], for_robot="r1", unreserved_only=True, area_id="A")
+        svc.peek_next_ready_task_id("r1")
+        svc.tick_promote_due_tasks()
+        session.exec(claim_task_stmt(1, "r1", utc_now(), except_created_by="prepositioner"))
+        session.rollback()
+    finally:
+        event.remove(db_engine, "before_cursor_execute", _capture)
+
+    assert len(issued) >= 6
+    with db_engine.connect() as conn:
+        for statement, parameters in issued:
+            plan = [str(r[-1]) for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()]
+            assert not any(d.startswith("SCAN") for d in plan), (statement, plan)
+            assert not any("TEMP B-TREE" in d for d in plan), (statement, plan)
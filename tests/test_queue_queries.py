@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.persistence.models import Task, TaskStatus, TaskType
+from app.priority_manager.service import PriorityService
+from app.queue_manager.service import QueueManagerService, utc_now
+from app.task_manager.bulk_schemas import BulkTaskSpec
+from app.task_manager.bulk_service import BulkTaskService
+
+TASKS = 1000
+SMALL = 10
+OVERRIDE_EVERY = 7
+# One SELECT (tasks + override join) for a whole page, whatever its size
+STATEMENT_BUDGET = 1
+
+
+class StatementCounter:
+    def __init__(self, eng: Any) -> None:
+        self.eng = eng
+        self.statements: List[str] = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "StatementCounter":
+        event.listen(self.eng, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        event.remove(self.eng, "before_cursor_execute", self._on_execute)
+
+
+def _seed(db_engine, count: int, start: int = 0) -> List[int]:
+    types = list(TaskType)
+    with Session(db_engine) as s:
+        specs = [BulkTaskSpec(title=f"q-{i}", task_type=types[i % len(types)]) for i in range(start, start + count)]
+        ids = BulkTaskService(s).create_many(specs)["task_ids"]
+    with Session(db_engine) as s:
+        for task_id in ids[::OVERRIDE_EVERY]:
+            PriorityService.set_override(s, task_id, 50)
+    return ids
+
+
+@pytest.fixture
+def task_ids(db_engine) -> List[int]:
+    return _seed(db_engine, TASKS)
+
+
+def _count_page_statements(db_engine) -> Tuple[Dict[str, Any], Dict[int, int], List[str]]:
+    with Session(db_engine) as s, StatementCounter(db_engine) as counter:
+        page = QueueManagerService(s).get_ready_queue_page()
+        # Overrides come from the page's join: no per-task lookups afterwards
+        overrides = {item["task_id"]: PriorityService.get_override(s, item["task_id"]) for item in page["queue"]}
+    return page, overrides, counter.statements
+
+
+def test_ready_queue_page_statement_budget(db_engine):
+    small_ids = _seed(db_engine, SMALL)
+    small_page, _, small_statements = _count_page_statements(db_engine)
+    assert len(small_page["queue"]) == SMALL
+
+    large_ids = small_ids + _seed(db_engine, TASKS - SMALL, start=SMALL)
+    page, overrides, statements = _count_page_statements(db_engine)
+
+    assert len(page["queue"]) == TASKS
+    assert sum(1 for v in overrides.values() if v == 50) == sum(
+        len(ids[::OVERRIDE_EVERY]) for ids in (small_ids, large_ids[SMALL:])
+    )
+    # Same statements at 10 and 1,000 tasks: nothing scales with the page
+    assert len(statements) == len(small_statements) <= STATEMENT_BUDGET, statements
+
+
+def test_override_cache_sees_writes_from_other_sessions(db_engine, task_ids):
+    task_id = task_ids[1]
+    with Session(db_engine) as long_lived:
+        QueueManagerService(long_lived).get_ready_queue_page()
+        assert PriorityService.get_override(long_lived, task_id) == 0
+
+        with Session(db_engine) as other:
+            PriorityService.set_override(other, task_id, 20)
+        assert PriorityService.get_override(long_lived, task_id) == 20
+
+        with Session(db_engine) as other:
+            PriorityService.clear_override(other, task_id)
+        assert PriorityService.get_override(long_lived, task_id) == 0
+
+
+def test_promote_commits_only_when_something_was_due(db_engine, session):
+    commits: List[int] = []
+
+    def _on_commit(conn) -> None:
+        commits.append(1)
+
+    event.listen(db_engine, "commit", _on_commit)
+    try:
+        assert QueueManagerService(session).tick_promote_due_tasks() == 0
+        assert commits == []
+
+        session.add(Task(title="due", status=TaskStatus.PENDING, release_at=utc_now() - timedelta(seconds=1)))
+        session.add(Task(title="later", status=TaskStatus.PENDING, release_at=utc_now() + timedelta(hours=1)))
+        session.commit()
+        commits.clear()
+        assert QueueManagerService(session).tick_promote_due_tasks() == 1
+        assert commits == [1]
+    finally:
+        event.remove(db_engine, "commit", _on_commit)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.assignment_engine.reservations import ReservationService
+from app.assignment_engine.service import AssignmentEngineService
+from app.common.fleet_state import fleet_state
+from app.persistence.models import Task, TaskStatus, TaskType
+
+
+@pytest.fixture
+def reservations_on(monkeypatch, registry, fake_workflow_engine):
+    monkeypatch.setenv("RESERVATION_ENABLED", "1")
+    monkeypatch.setenv("ROBOT_IDS", "R1,R2")
+    fleet_state.clear()
+    yield
+    fleet_state.clear()
+
+
+def test_reservation_of_an_ineligible_robot_goes_to_another_robot(session, reservations_on, fake_robot_api):
+    # R1's run finished while it held task 1; R1 then went offline
+    session.add(Task(title="t", task_type=TaskType.DELIVERY, status=TaskStatus.READY, reserved_robot_id="R1"))
+    session.commit()
+    api = fake_robot_api({"R1": {"online": False}, "R2": {"online": True}})
+
+    res = asyncio.run(AssignmentEngineService(session, api, None).assign_many(max_assignments=1))
+
+    assert [(a["task_id"], a["robot_id"]) for a in res["assignments"]] == [(1, "R2")]
+    assert res["skipped_robots"] == {"R1": "robot offline"}
+    assert ReservationService(session).snapshot() == {}
+
+
+def test_stale_reservations_are_released_when_nobody_can_assign(session, reservations_on, fake_robot_api):
+    session.add(Task(title="t", task_type=TaskType.DELIVERY, status=TaskStatus.READY, reserved_robot_id="R1"))
+    session.commit()
+    api = fake_robot_api({"R1": {"online": False}, "R2": {"online": False}})
+
+    res = asyncio.run(AssignmentEngineService(session, api, None).assign_many(max_assignments=1))
+
+    assert res["assigned"] == 0
+    assert res["reservations"] == {}
+    assert session.get(Task, 1).reserved_robot_id is None
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app.robot_registry.schemas import RobotUpsertRequest
+from app.robot_registry.service import RobotRegistryService
+
+
+def _upsert(session, body):
+    payload = RobotUpsertRequest.model_validate(body)
+    return RobotRegistryService(session).upsert(
+        payload.robot_id, **payload.model_dump(exclude_unset=True, exclude={"robot_id"})
+    )
+
+
+def test_upsert_merges_only_supplied_fields(session):
+    _upsert(session, {"robot_id": "R1", "capabilities": ["DELIVERY"], "enabled": False, "home_area_id": "A"})
+    row = _upsert(session, {"robot_id": "R1", "name": "one"})
+
+    assert row.name == "one"
+    assert row.enabled is False
+    assert row.capabilities == "DELIVERY"
+    assert row.home_area_id == "A"
+
+
+def test_upsert_new_robot_gets_defaults_and_next_sort_order(session):
+    _upsert(session, {"robot_id": "R1"})
+    row = _upsert(session, {"robot_id": "R2"})
+
+    assert row.enabled is True
+    assert row.capabilities == ""
+    assert row.sort_order == 1
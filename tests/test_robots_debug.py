@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.assignment_engine.service import AssignmentEngineService
+from app.common.fleet_state import fleet_state
+
+
+def test_robots_dropped_by_the_deadline_show_as_timeouts(monkeypatch, session, registry, fake_robot_api):
+    monkeypatch.setenv("ROBOT_IDS", "R1,R2,R3")
+    monkeypatch.setenv("ROBOTS_FANOUT_CONCURRENCY", "2")
+
+    class SlowR2(fake_robot_api):
+        async def get_state(self, robot_id):
+            if robot_id == "R2":
+                await asyncio.sleep(5)
+            return await super().get_state(robot_id)
+
+    api = SlowR2({rid: {"online": True} for rid in ("R1", "R2", "R3")})
+    fleet_state.clear()
+    try:
+        robots, debug = asyncio.run(AssignmentEngineService(session, api, None).list_robots_debug(deadline_s=0.1))
+    finally:
+        fleet_state.clear()
+
+    assert [r["status"] for r in robots] == ["ok", "unknown", "ok"]
+    assert debug["timed_out"] == ["R2"]
+    assert debug["latency_ms"]["R2"] == "timeout"
+    assert isinstance(debug["latency_ms"]["R1"], float) and isinstance(debug["latency_ms"]["R3"], float)
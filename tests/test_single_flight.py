@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.common.single_flight import TickSingleFlight
+
+
+def test_followers_coalesce_onto_the_queued_pass():
+    async def main():
+        flight = TickSingleFlight()
+        calls = []
+
+        async def tick():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return {"pass": len(calls)}
+
+        running = asyncio.ensure_future(flight.run("k", tick))
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(flight.run("k", tick)) for _ in range(3)]
+        return await running, await asyncio.gather(*queued), flight.snapshot()
+
+    first, rest, snap = asyncio.run(main())
+    assert first == {"pass": 1}
+    assert rest == [{"pass": 2}, {"pass": 2, "coalesced": True}, {"pass": 2, "coalesced": True}]
+    assert snap["passes"] == 2 and snap["coalesced"] == 2
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def main():
+        flight = TickSingleFlight()
+        finished = asyncio.Event()
+
+        async def tick():
+            await asyncio.sleep(0.05)
+            finished.set()
+            return {"ok": True}
+
+        running = asyncio.ensure_future(flight.run("other", tick))
+        await asyncio.sleep(0)
+        # Queued pass: its leader is cancelled while the follower waits on it
+        leader = asyncio.ensure_future(flight.run("k", tick))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run("k", tick))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await running
+        finished.clear()
+        return await follower, finished.is_set()
+
+    res, finished = asyncio.run(main())
+    assert res == {"ok": True, "coalesced": True}
+    assert finished
+
+
+def test_failed_pass_raises_for_every_caller():
+    async def main():
+        flight = TickSingleFlight()
+
+        async def tick():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("vendor down")
+
+        calls = [asyncio.ensure_future(flight.run("k", tick)) for _ in range(2)]
+        return await asyncio.gather(*calls, return_exceptions=True), flight.snapshot()
+
+    results, snap = asyncio.run(main())
+    assert [str(r) for r in results] == ["vendor down", "vendor down"]
+    assert snap["pending"] == 0 and not snap["running"]
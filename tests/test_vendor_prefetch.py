@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.common.vendor_resilience import PrefetchedTaskClient, is_stale_task_state
+
+
+class SlowVendor:
+    def __init__(self, slow: str) -> None:
+        self.slow = slow
+        self.calls = []
+
+    async def task_state_v2(self, task_id: str):
+        self.calls.append(task_id)
+        if task_id == self.slow:
+            await asyncio.sleep(5)
+        return {"taskId": task_id, "state": "RUNNING"}
+
+
+def test_deadline_skipped_ids_are_not_polled_live():
+    async def main():
+        vendor = SlowVendor("v2")
+        first = PrefetchedTaskClient(vendor)
+        await first.prefetch(["v1", "v2"], concurrency=4, deadline_s=0.05)
+        v2 = await asyncio.wait_for(first.task_state_v2("v2"), timeout=0.5)
+
+        # Another client keeps its own last states
+        other = PrefetchedTaskClient(SlowVendor("v1"))
+        await other.prefetch(["v1"], concurrency=4, deadline_s=0.05)
+
+        vendor.slow = "v1"
+        second = PrefetchedTaskClient(vendor)
+        await second.prefetch(["v1", "v2"], concurrency=4, deadline_s=0.05)
+        v1 = await asyncio.wait_for(second.task_state_v2("v1"), timeout=0.5)
+        return v2, v1, vendor.calls, other
+
+    v2, v1, calls, other = asyncio.run(main())
+    # No earlier state: stale marker, the run stays RUNNING until the next tick
+    assert is_stale_task_state(v2)
+    # Earlier state known: answered from it, not from the other client's cache
+    assert v1 == {"taskId": "v1", "state": "RUNNING"}
+    assert calls == ["v1", "v2", "v1", "v2"]
+    assert other.stats["skipped_deadline"] == 1